@@ -0,0 +1,490 @@
+# api_server.py - Локальный HTTP/JSON API к задачам и расписанию (asyncio, без Qt)
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from file_storage import file_signature
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Дней на одну порцию потокового экспорта
+STREAM_CHUNK_DAYS = 31
+
+
+class ApiError(Exception):
+    """Ошибка запроса с HTTP-статусом"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """Разобранный HTTP-запрос"""
+
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        parts = urlsplit(target)
+        self.path = [unquote(part) for part in parts.path.strip("/").split("/") if part]
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Тело запроса как JSON-объект"""
+        try:
+            data = json.loads(self.body.decode("utf-8") or "{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Тело запроса - не JSON")
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Ожидается JSON-объект")
+        return data
+
+    def date_arg(self, name, default=None):
+        value = self.query.get(name)
+        if value is None:
+            return default
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Неверная дата {name}: {value}")
+
+    def int_arg(self, name, default, minimum=0, maximum=None):
+        value = self.query.get(name)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Неверное число {name}: {value}")
+        number = max(minimum, number)
+        return min(number, maximum) if maximum is not None else number
+
+
+class Response:
+    """Ответ: JSON-тело или поток порций (chunked)"""
+
+    def __init__(self, status=HTTPStatus.OK, data=None, etag=None, stream=None):
+        self.status = status
+        self.data = data
+        self.etag = etag
+        self.stream = stream
+
+
+def json_bytes(data):
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def parse_datetime(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Неверное время {name}: {value}")
+
+
+class ApiServer:
+    """Встроенный HTTP/JSON сервер поверх TaskManager и PremiumDataManager
+
+    Обработчики не блокируют цикл событий: операции с задачами и операции,
+    меняющие манифест дней (запись, статистика), выполняются в своих
+    однопоточных исполнителях - менеджеры не потокобезопасны; чтение
+    дней идет в пуле потоков. GET-ответы снабжаются ETag и отвечают
+    304 на If-None-Match; экспорт больших периодов отдается потоком
+    (Transfer-Encoding: chunked, NDJSON по дню на строку).
+
+    Маршруты:
+        GET    /api/tasks?date_from&date_to&status&priority&offset&limit
+        POST   /api/tasks
+        GET    /api/tasks/<id>
+        PATCH  /api/tasks/<id>
+        DELETE /api/tasks/<id>
+        POST   /api/tasks/<id>/complete
+        GET    /api/days/<YYYY-MM-DD>
+        PUT    /api/days/<YYYY-MM-DD>
+        GET    /api/stats?from&to
+        GET    /api/export?from&to
+    """
+
+    def __init__(self, task_manager, data_manager, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 io_workers=4):
+        self.task_manager = task_manager
+        self.data_manager = data_manager
+        self.host = host
+        self.port = port
+        self.task_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-tasks")
+        self.store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-store")
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="api-io")
+        self.server = None
+
+    # --- Исполнители ---
+
+    async def in_tasks(self, func, *args):
+        """Выполнение операции с задачами (с подхватом изменений других процессов)"""
+        def call():
+            self.task_manager.sync_from_disk()
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.task_executor, call)
+
+    async def in_store(self, func, *args):
+        """Операция, меняющая манифест или файлы дней"""
+        return await asyncio.get_running_loop().run_in_executor(self.store_executor, func, *args)
+
+    async def in_io(self, func, *args):
+        """Чтение без изменения общего состояния"""
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, func, *args)
+
+    # --- Жизненный цикл ---
+
+    async def start(self):
+        """Запуск сервера в текущем цикле событий"""
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=MAX_HEADER_BYTES)
+        return self.server
+
+    async def serve_forever(self):
+        """Запуск и обслуживание до отмены"""
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Остановка сервера и исполнителей"""
+        if self.server is not None:
+            self.server.close()
+        self.task_executor.shutdown(wait=False)
+        self.store_executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
+
+    # --- HTTP ---
+
+    async def read_request(self, reader):
+        """Чтение одного запроса (None - клиент закрыл соединение)"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Слишком большие заголовки")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Неверная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Неверный Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def handle_connection(self, reader, writer):
+        """Обслуживание соединения (keep-alive)"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    response = await self.dispatch(request)
+                except ApiError as e:
+                    request = None
+                    response = Response(e.status, {"error": e.message})
+                except Exception as e:
+                    request = None
+                    print(f"Ошибка обработки запроса API: {e}")
+                    response = Response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+                keep_alive = request is not None and \
+                    request.headers.get("connection", "").lower() != "close"
+                sent = await self.write_response(writer, request, response, keep_alive)
+                if not sent or not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, request, response, keep_alive):
+        """Отправка ответа: 304 по ETag, JSON с Content-Length или chunked-поток.
+
+        Возвращает False, если поток оборвался после отправки заголовков -
+        ответ неполон, и соединение нужно закрыть.
+        """
+        status = HTTPStatus(response.status)
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Connection": "keep-alive" if keep_alive else "close"
+        }
+
+        body = None
+        if response.stream is None:
+            body = json_bytes(response.data) if response.data is not None else b""
+            if response.etag is None and request is not None and request.method == "GET" \
+                    and status == HTTPStatus.OK:
+                response.etag = '"%s"' % hashlib.sha1(body).hexdigest()
+
+        if response.etag:
+            headers["ETag"] = response.etag
+            if request is not None and request.headers.get("if-none-match") == response.etag:
+                status, body, response.stream = HTTPStatus.NOT_MODIFIED, b"", None
+
+        if response.stream is not None:
+            headers["Content-Type"] = "application/x-ndjson; charset=utf-8"
+            headers["Transfer-Encoding"] = "chunked"
+        else:
+            headers["Content-Length"] = str(len(body))
+
+        head = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+        if response.stream is None:
+            writer.write(body)
+        else:
+            try:
+                async for chunk in response.stream:
+                    if chunk:
+                        writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                        await writer.drain()
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # Статус уже отправлен: без завершающего чанка клиент увидит обрыв
+                print(f"Ошибка потоковой выдачи ответа: {e}")
+                return False
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    async def dispatch(self, request):
+        """Маршрутизация запроса"""
+        path = request.path
+        if not path or path[0] != "api" or len(path) < 2:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Неизвестный адрес")
+        resource, rest, method = path[1], path[2:], request.method
+
+        if resource == "tasks":
+            if not rest:
+                if method == "GET":
+                    return await self.list_tasks(request)
+                if method == "POST":
+                    return await self.create_task(request)
+            elif len(rest) == 1:
+                if method == "GET":
+                    return await self.get_task(rest[0])
+                if method == "PATCH":
+                    return await self.update_task(rest[0], request)
+                if method == "DELETE":
+                    return await self.delete_task(rest[0])
+            elif len(rest) == 2 and rest[1] == "complete" and method == "POST":
+                return await self.complete_task(rest[0])
+        elif resource == "days" and len(rest) == 1:
+            try:
+                day = date.fromisoformat(rest[0])
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Неверная дата: {rest[0]}")
+            if method == "GET":
+                return await self.get_day(day, request)
+            if method == "PUT":
+                return await self.put_day(day, request)
+        elif resource == "stats" and not rest and method == "GET":
+            return await self.get_stats(request)
+        elif resource == "export" and not rest and method == "GET":
+            return self.export(request)
+        else:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Неизвестный адрес")
+        raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"Метод {method} не поддерживается")
+
+    # --- Задачи ---
+
+    @staticmethod
+    def task_json(task):
+        return task.to_dict()
+
+    async def list_tasks(self, request):
+        """Страница задач, отсортированных по началу"""
+        date_from = request.date_arg("date_from")
+        date_to = request.date_arg("date_to", date_from)
+        if date_to and not date_from:
+            date_from = date_to
+        status = request.query.get("status")
+        priority = request.query.get("priority")
+        offset = request.int_arg("offset", 0)
+        limit = request.int_arg("limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+
+        def query(snapshot):
+            if date_from:
+                tasks = snapshot.get_tasks_in_range(date_from, date_to)
+            else:
+                tasks = list(snapshot)
+            tasks = [task for task in tasks
+                     if (status is None or task.status.value == status)
+                     and (priority is None or str(task.priority.value) == priority)]
+            tasks.sort(key=lambda task: (task.start_ts, task.id))
+            return {
+                "items": [self.task_json(task) for task in tasks[offset:offset + limit]],
+                "total": len(tasks),
+                "offset": offset,
+                "limit": limit
+            }
+
+        # Версия снимка + параметры запроса: повторный запрос без изменений не вычисляется.
+        # Выборка идет по неизменяемому снимку в пуле чтения и не задерживает правки задач
+        snapshot = await self.in_tasks(self.task_manager.snapshot)
+        key = json.dumps([snapshot.version, sorted(request.query.items())])
+        etag = 'W/"tasks-%s"' % hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        if request.headers.get("if-none-match") == etag:
+            return Response(etag=etag)
+        return Response(data=await self.in_io(query, snapshot), etag=etag)
+
+    async def get_task(self, task_id):
+        snapshot = await self.in_tasks(self.task_manager.snapshot)
+        task = snapshot.get_task_by_id(task_id)
+        if task is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Задача не найдена")
+        return Response(data=self.task_json(task))
+
+    def task_fields(self, data, required):
+        """Поля задачи из тела запроса"""
+        from task_manager import TaskPriority, TaskStatus
+
+        fields = {}
+        for name in ("title", "description"):
+            if name in data:
+                fields[name] = str(data[name])
+        for name in ("start_time", "end_time"):
+            if name in data:
+                fields[name] = parse_datetime(data[name], name)
+        try:
+            if "priority" in data:
+                fields["priority"] = TaskPriority(data["priority"])
+            if "status" in data:
+                fields["status"] = TaskStatus(data["status"])
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+
+        missing = [name for name in required if name not in fields]
+        if missing:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Не указаны поля: {', '.join(missing)}")
+        if "start_time" in fields and "end_time" in fields and \
+                fields["end_time"] <= fields["start_time"]:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Конец задачи раньше начала")
+        return fields
+
+    async def create_task(self, request):
+        fields = self.task_fields(request.json(), ("title", "start_time", "end_time"))
+        fields.pop("status", None)
+        fields.setdefault("description", "")
+        task = await self.in_tasks(lambda: self.task_manager.create_task(**fields))
+        return Response(HTTPStatus.CREATED, self.task_json(task))
+
+    async def update_task(self, task_id, request):
+        fields = self.task_fields(request.json(), ())
+        task = await self.in_tasks(lambda: self.task_manager.update_task(task_id, **fields))
+        if task is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Задача не найдена")
+        return Response(data=self.task_json(task))
+
+    async def delete_task(self, task_id):
+        if not await self.in_tasks(self.task_manager.delete_task, task_id):
+            raise ApiError(HTTPStatus.NOT_FOUND, "Задача не найдена")
+        return Response(HTTPStatus.NO_CONTENT)
+
+    async def complete_task(self, task_id):
+        task = await self.in_tasks(self.task_manager.complete_task, task_id)
+        if task is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Задача не найдена")
+        return Response(data=self.task_json(task))
+
+    # --- Дни и статистика ---
+
+    def day_etag(self, day):
+        """ETag дня по подписи файла (или записи архива) - без чтения содержимого"""
+        filename = os.path.join(self.data_manager.data_dir, f"schedule_{day.isoformat()}.json")
+        signature = file_signature(filename)
+        if signature is None:
+            signature = self.data_manager.archive.day_range(day)
+        return 'W/"day-%s-%s"' % (day.isoformat(), hashlib.sha1(repr(signature).encode()).hexdigest()[:16])
+
+    async def get_day(self, day, request):
+        etag = await self.in_io(self.day_etag, day)
+        if request.headers.get("if-none-match") == etag:
+            return Response(etag=etag)
+        blocks = await self.in_io(self.data_manager.load_day, day)
+        return Response(data={"date": day.isoformat(), "blocks": blocks}, etag=etag)
+
+    async def put_day(self, day, request):
+        blocks = request.json().get("blocks")
+        if not isinstance(blocks, list):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Ожидается поле blocks со списком блоков")
+        for block in blocks:
+            if not isinstance(block, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Блок должен быть объектом")
+            parse_datetime(block.get("start_time"), "start_time")
+            parse_datetime(block.get("end_time"), "end_time")
+            block.setdefault("title", "")
+        if not await self.in_store(self.data_manager.write_day_data, blocks, day):
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, "Не удалось сохранить день")
+        return Response(data={"date": day.isoformat(), "blocks": blocks})
+
+    def range_args(self, request):
+        end = request.date_arg("to", date.today())
+        start = request.date_arg("from", end - timedelta(days=30))
+        if start > end:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Начало периода позже конца")
+        return start, end
+
+    async def get_stats(self, request):
+        start, end = self.range_args(request)
+        statistics = await self.in_store(self.data_manager.get_statistics, start, end)
+        return Response(data=statistics)
+
+    def nonempty_days(self, start, end):
+        return [day for day, entry in self.data_manager.refresh_manifest().entries_in_range(start, end)
+                if entry["total_blocks"]]
+
+    def export(self, request):
+        """Потоковый экспорт периода: NDJSON, по строке на непустой день"""
+        start, end = self.range_args(request)
+
+        async def stream():
+            days = await self.in_store(self.nonempty_days, start, end)
+            for i in range(0, len(days), STREAM_CHUNK_DAYS):
+                chunk = await self.in_io(self.data_manager.load_days,
+                                         days[i:i + STREAM_CHUNK_DAYS])
+                yield b"".join(json_bytes({"date": day.isoformat(), "blocks": blocks}) + b"\n"
+                               for day, raw, blocks, summary in chunk)
+
+        return Response(stream=stream())
+
+
+def run_server(task_manager, data_manager, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Запуск сервера до прерывания (Ctrl+C)"""
+    server = ApiServer(task_manager, data_manager, host, port)
+    print(f"API доступно на http://{host}:{port}/api/")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
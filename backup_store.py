@@ -0,0 +1,205 @@
+# backup_store.py - Дедуплицирующее хранилище резервных копий с адресацией по содержимому
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+# Поля, которые меняются при каждом сохранении и не влияют на содержимое дня
+VOLATILE_DAY_FIELDS = ("saved_at",)
+VOLATILE_BLOCK_FIELDS = ("updated_at",)
+
+
+class BackupStore:
+    """Хранилище резервных копий: сжатые объекты по хешу + индекс на каждую дату
+
+    Структура каталога:
+        objects/<ab>/<hash>.gz  - сжатое содержимое снимка
+        index/<YYYY-MM-DD>.json - список снимков даты (от старых к новым)
+
+    Одинаковые подряд снимки не сохраняются повторно, а ротация и
+    восстановление читают только индекс нужной даты, без обхода каталога.
+    """
+
+    def __init__(self, backup_dir, max_per_day=10, decoder=None):
+        self.backup_dir = backup_dir
+        self.decoder = decoder
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.index_dir = os.path.join(backup_dir, "index")
+        self.max_per_day = max_per_day
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    # --- Ключи и пути ---
+
+    def content_key(self, raw):
+        """Хеш содержимого снимка без изменчивых полей (saved_at, updated_at)"""
+        try:
+            data = self.decoder(raw) if self.decoder else json.loads(raw.decode("utf-8"))
+        except Exception:
+            return hashlib.sha256(raw).hexdigest()
+
+        if isinstance(data, dict):
+            for field in VOLATILE_DAY_FIELDS:
+                data.pop(field, None)
+            for block in data.get("time_blocks", []) or []:
+                if isinstance(block, dict):
+                    for field in VOLATILE_BLOCK_FIELDS:
+                        block.pop(field, None)
+
+        canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def object_path(self, key):
+        """Путь к сжатому объекту"""
+        return os.path.join(self.objects_dir, key[:2], f"{key}.gz")
+
+    def index_path(self, date):
+        """Путь к индексу даты"""
+        return os.path.join(self.index_dir, f"{date.strftime('%Y-%m-%d')}.json")
+
+    # --- Индекс ---
+
+    def load_index(self, date):
+        """Загрузка индекса даты (с однократной миграцией старых копий)"""
+        path = self.index_path(date)
+        if not os.path.exists(path):
+            return self.migrate_legacy_backups(date)
+
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("entries", [])
+
+    def save_index(self, date, entries):
+        """Атомарная запись индекса даты"""
+        data = {"date": date.isoformat(), "entries": entries}
+        self._atomic_write(self.index_path(date),
+                           json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    # --- Основные операции ---
+
+    def put(self, date, raw, created_at=None):
+        """Сохранение снимка. Возвращает ключ или None, если снимок не изменился"""
+        entries = self.load_index(date)
+        key = self.content_key(raw)
+
+        if entries and entries[-1]["hash"] == key:
+            return None
+
+        path = self.object_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._atomic_write(path, gzip.compress(raw))
+
+        entries.append({
+            "hash": key,
+            "created_at": (created_at or datetime.now()).isoformat(),
+            "size": len(raw)
+        })
+        self.save_index(date, self.apply_retention(entries))
+        return key
+
+    def apply_retention(self, entries):
+        """Ограничение количества снимков; удаляет объекты, на которые больше нет ссылок"""
+        if len(entries) <= self.max_per_day:
+            return entries
+
+        removed, kept = entries[:-self.max_per_day], entries[-self.max_per_day:]
+        kept_keys = {entry["hash"] for entry in kept}
+        for entry in removed:
+            if entry["hash"] not in kept_keys:
+                try:
+                    os.remove(self.object_path(entry["hash"]))
+                except FileNotFoundError:
+                    pass
+        return kept
+
+    def latest(self, date):
+        """Содержимое самого свежего снимка даты или None"""
+        entries = self.load_index(date)
+        if not entries:
+            return None
+        return self.read_object(entries[-1]["hash"])
+
+    def read_object(self, key):
+        """Чтение и распаковка объекта"""
+        with open(self.object_path(key), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def list_snapshots(self, date):
+        """Список снимков даты (от старых к новым)"""
+        return list(self.load_index(date))
+
+    def verify(self):
+        """Проверка целостности всех объектов. Возвращает список проблем"""
+        problems = []
+        for name in sorted(os.listdir(self.index_dir)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.index_dir, name), "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+            for entry in entries:
+                key = entry["hash"]
+                try:
+                    raw = self.read_object(key)
+                except (OSError, EOFError) as e:
+                    problems.append(f"{name}: объект {key[:12]} недоступен ({e})")
+                    continue
+                if self.content_key(raw) != key:
+                    problems.append(f"{name}: объект {key[:12]} поврежден")
+        return problems
+
+    # --- Совместимость со старым форматом ---
+
+    def migrate_legacy_backups(self, date):
+        """Перенос старых копий backup_<дата>_<время>.json в хранилище
+
+        Выполняется один раз на дату: после миграции создается индекс
+        (даже пустой), и каталог больше не сканируется.
+        """
+        prefix = f"backup_{date.strftime('%Y-%m-%d')}_"
+        legacy = []
+        try:
+            for name in os.listdir(self.backup_dir):
+                if name.startswith(prefix) and name.endswith(".json"):
+                    path = os.path.join(self.backup_dir, name)
+                    legacy.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            pass
+
+        entries = []
+        for mtime, path in sorted(legacy):
+            with open(path, "rb") as f:
+                raw = f.read()
+            key = self.content_key(raw)
+            if entries and entries[-1]["hash"] == key:
+                continue
+            object_path = self.object_path(key)
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                self._atomic_write(object_path, gzip.compress(raw))
+            entries.append({
+                "hash": key,
+                "created_at": datetime.fromtimestamp(mtime).isoformat(),
+                "size": len(raw)
+            })
+
+        entries = self.apply_retention(entries)
+        self.save_index(date, entries)
+
+        for _, path in legacy:
+            os.remove(path)
+
+        return entries
+
+    def _atomic_write(self, path, data):
+        """Запись через временный файл и переименование"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
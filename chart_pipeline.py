@@ -0,0 +1,133 @@
+# chart_pipeline.py - Подготовка рядов статистики для графиков (без Qt)
+from datetime import date, timedelta
+
+BUCKET_DAY = "day"
+BUCKET_WEEK = "week"
+BUCKET_MONTH = "month"
+BUCKETS = (BUCKET_DAY, BUCKET_WEEK, BUCKET_MONTH)
+# Автовыбор корзины: точек не больше, чем ширина графика в пикселях * MAX_BUCKETS_PER_PIXEL
+MAX_BUCKETS_PER_PIXEL = 0.5
+
+
+def bucket_start(day, bucket):
+    """Начало корзины, в которую попадает день"""
+    if bucket == BUCKET_WEEK:
+        return day - timedelta(days=day.weekday())
+    if bucket == BUCKET_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def aggregate(points, bucket):
+    """Средние значения по корзинам: points - [(date, value)] по возрастанию дат
+
+    Возвращает [(начало корзины, среднее)]. Проход один, без словарей.
+    """
+    if bucket == BUCKET_DAY:
+        return list(points)
+    result = []
+    current = None
+    total = count = 0
+    for day, value in points:
+        start = bucket_start(day, bucket)
+        if start != current:
+            if count:
+                result.append((current, total / count))
+            current, total, count = start, 0, 0
+        total += value
+        count += 1
+    if count:
+        result.append((current, total / count))
+    return result
+
+
+def choose_bucket(start, end, width):
+    """Самая мелкая корзина, при которой точек не больше половины ширины в пикселях"""
+    span = (end - start).days + 1
+    limit = max(1, width * MAX_BUCKETS_PER_PIXEL)
+    if span <= limit:
+        return BUCKET_DAY
+    if span / 7 <= limit:
+        return BUCKET_WEEK
+    return BUCKET_MONTH
+
+
+def lttb(points, threshold):
+    """Прореживание Largest-Triangle-Three-Buckets с сохранением формы ряда
+
+    points - [(x, y)] по возрастанию x; возвращает не больше threshold
+    точек, первая и последняя сохраняются. Пики и провалы остаются,
+    в отличие от простого усреднения.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Среднее следующей корзины - третья вершина треугольника
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(points[j][0] for j in range(next_start, next_end)) / span
+        avg_y = sum(points[j][1] for j in range(next_start, next_end)) / span
+
+        # Точка текущей корзины с наибольшей площадью треугольника
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+class TrendSeries:
+    """Ряд для графика: агрегирование по корзинам и прореживание под ширину
+
+    version меняется только при изменении исходных точек - по нему виджет
+    решает, перерисовывать ли закэшированное изображение.
+    """
+
+    def __init__(self, points=(), start=None, end=None):
+        self.version = 0
+        self.points = []
+        self.start = start
+        self.end = end
+        self.set_points(points, start, end)
+
+    def set_points(self, points, start=None, end=None):
+        """Новые точки [(date, value)]; False - данные не изменились"""
+        points = sorted(points)
+        start = start or (points[0][0] if points else None)
+        end = end or (points[-1][0] if points else None)
+        if points == self.points and (start, end) == (self.start, self.end):
+            return False
+        self.points, self.start, self.end = points, start, end
+        self.version += 1
+        return True
+
+    def render_points(self, width, bucket=None):
+        """Точки [(порядковый номер дня, значение)] для ширины width пикселей
+
+        bucket=None - корзина выбирается по длине периода.
+        """
+        if not self.points:
+            return [], bucket or BUCKET_DAY
+        bucket = bucket or choose_bucket(self.start, self.end, width)
+        series = [(day.toordinal(), value) for day, value in aggregate(self.points, bucket)]
+        return lttb(series, max(3, int(width))), bucket
+
+
+def ordinal_to_date(value):
+    return date.fromordinal(int(value))
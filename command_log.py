@@ -0,0 +1,219 @@
+# command_log.py - Журнал команд для отмены и повтора изменений блоков
+import json
+from collections import deque
+
+# Поля блока, которые отслеживает журнал (created_at - чтобы отмена удаления вернула блок как был)
+BLOCK_FIELDS = ("title", "start_time", "end_time", "color", "notify", "progress", "created_at")
+
+ADD = "add"
+DELETE = "delete"
+UPDATE = "update"
+BATCH = "batch"
+
+
+class Command:
+    """Компактная дельта: добавление/удаление хранит состояние блока,
+    изменение - только отличающиеся поля, пакет - вложенные команды"""
+
+    __slots__ = ("kind", "block_id", "before", "after", "index", "items", "size")
+
+    def __init__(self, kind, block_id=None, before=None, after=None, index=None, items=None):
+        self.kind = kind
+        self.block_id = block_id
+        self.before = before
+        self.after = after
+        self.index = index
+        self.items = items
+        self.size = 0
+
+    def inverse(self):
+        """Обратная команда"""
+        if self.kind == ADD:
+            return Command(DELETE, self.block_id, before=self.after, index=self.index)
+        if self.kind == DELETE:
+            return Command(ADD, self.block_id, after=self.before, index=self.index)
+        if self.kind == UPDATE:
+            return Command(UPDATE, self.block_id, before=self.after, after=self.before)
+        return Command(BATCH, items=[item.inverse() for item in reversed(self.items)])
+
+    def to_dict(self):
+        """Сериализуемое представление дельты"""
+        if self.kind == BATCH:
+            return {"kind": BATCH, "items": [item.to_dict() for item in self.items]}
+        data = {"kind": self.kind, "id": self.block_id}
+        for key in ("before", "after", "index"):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        return data
+
+    def estimate_size(self):
+        """Приблизительный размер дельты в байтах"""
+        return len(json.dumps(self.to_dict(), ensure_ascii=False, default=str))
+
+
+class CommandLog:
+    """Ограниченный журнал отмены/повтора
+
+    Хранит последние max_commands команд суммарным размером не больше
+    max_bytes; старые вытесняются. Отмена и повтор применяют дельту к
+    target без чтения с диска. target реализует insert_block(index, state),
+    remove_block(block_id) и update_block(block_id, fields); state в
+    insert_block содержит id блока.
+
+    Журнал также копит итоговые изменения блоков со времени последнего
+    take_changes() - по ним можно сохранять только измененное.
+    """
+
+    def __init__(self, max_commands=200, max_bytes=256 * 1024):
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.total_bytes = 0
+        self.states = {}
+        self.changes = {}
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Подписка на изменение журнала: callback()"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def notify_listeners(self):
+        for callback in list(self.listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Ошибка обработчика журнала команд: {e}")
+
+    @staticmethod
+    def snapshot(state):
+        """Отслеживаемые поля блока"""
+        return {key: state[key] for key in BLOCK_FIELDS if key in state}
+
+    # --- Состояние ---
+
+    def reset(self, states=()):
+        """Новый набор блоков (загрузка дня): журнал и изменения очищаются"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.total_bytes = 0
+        self.changes = {}
+        self.states = {block_id: self.snapshot(state) for block_id, state in states}
+        self.notify_listeners()
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def track_external(self, block_id, state):
+        """Учет изменения, пришедшего извне (другой процесс): без команды в журнале"""
+        if state is None:
+            self.states.pop(block_id, None)
+        else:
+            self.states[block_id] = self.snapshot(state)
+    
+    def take_changes(self):
+        """Итоговые изменения с прошлого вызова: {block_id: состояние или None (удален)}"""
+        changes, self.changes = self.changes, {}
+        return changes
+
+    # --- Запись ---
+
+    def record_add(self, block_id, state, index):
+        """Блок добавлен в позицию index"""
+        self._push(Command(ADD, block_id, after=self.snapshot(state), index=index))
+
+    def record_delete(self, block_id, index):
+        """Блок удален из позиции index"""
+        self._push(self._delete_command(block_id, index))
+
+    def record_update(self, block_id, state):
+        """Блок изменен: в журнал попадают только отличающиеся поля"""
+        old = self.states.get(block_id, {})
+        new = self.snapshot(state)
+        changed = [key for key in new if old.get(key) != new[key]]
+        if not changed:
+            return
+        self._push(Command(UPDATE, block_id,
+                           before={key: old.get(key) for key in changed},
+                           after={key: new[key] for key in changed}))
+
+    def record_clear(self, block_ids):
+        """Удалены все блоки (block_ids - в порядке позиций)"""
+        # Удаляем с конца, чтобы позиции оставались верными при отмене
+        items = [self._delete_command(block_id, index)
+                 for index, block_id in reversed(list(enumerate(block_ids)))]
+        if items:
+            self._push(Command(BATCH, items=items))
+
+    def _delete_command(self, block_id, index):
+        return Command(DELETE, block_id, before=dict(self.states.get(block_id, {})), index=index)
+
+    def _push(self, command):
+        self._track(command)
+        command.size = command.estimate_size()
+        self.undo_stack.append(command)
+        self.total_bytes += command.size
+        self.total_bytes -= sum(item.size for item in self.redo_stack)
+        self.redo_stack.clear()
+
+        # Вытеснение старых команд (последняя остается всегда)
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_commands
+                                            or self.total_bytes > self.max_bytes):
+            self.total_bytes -= self.undo_stack.popleft().size
+        self.notify_listeners()
+
+    def _track(self, command):
+        """Учет команды в известных состояниях и накопленных изменениях"""
+        if command.kind == BATCH:
+            for item in command.items:
+                self._track(item)
+        elif command.kind == ADD:
+            self.states[command.block_id] = dict(command.after)
+            self.changes[command.block_id] = dict(command.after)
+        elif command.kind == DELETE:
+            self.states.pop(command.block_id, None)
+            self.changes[command.block_id] = None
+        else:
+            state = self.states.setdefault(command.block_id, {})
+            state.update(command.after)
+            self.changes[command.block_id] = dict(state)
+
+    # --- Отмена и повтор ---
+
+    def undo(self, target):
+        """Отмена последней команды; False - нечего отменять"""
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        self._apply(command.inverse(), target)
+        self.redo_stack.append(command)
+        self.notify_listeners()
+        return True
+
+    def redo(self, target):
+        """Повтор отмененной команды; False - нечего повторять"""
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        self._apply(command, target)
+        self.undo_stack.append(command)
+        self.notify_listeners()
+        return True
+
+    def _apply(self, command, target):
+        if command.kind == BATCH:
+            for item in command.items:
+                self._apply(item, target)
+            return
+        if command.kind == ADD:
+            target.insert_block(command.index, dict(command.after, id=command.block_id))
+        elif command.kind == DELETE:
+            target.remove_block(command.block_id)
+        else:
+            target.update_block(command.block_id, dict(command.after))
+        self._track(command)
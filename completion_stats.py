@@ -0,0 +1,108 @@
+# completion_stats.py - Общая основа статистик, обучаемых на выполненных задачах
+import atexit
+import json
+import os
+import time
+
+from data_manager import DEFAULT_DATA_DIR
+from file_storage import atomic_write, read_bytes
+from time_layer import time_layer
+
+# Состояние пишется не чаще раза в SAVE_INTERVAL секунд (и при выходе)
+SAVE_INTERVAL = 30.0
+
+
+def state_path(data_dir, filename):
+    """Путь файла состояния в каталоге данных"""
+    return os.path.join(data_dir or DEFAULT_DATA_DIR, filename)
+
+
+class CompletionStats:
+    """Статистика по выполненным задачам с отложенным сохранением
+
+    Подкласс задает reset(), to_state()/from_state(state) и учет задач:
+    record_task(task, save) и forget_task(task_id, save) (снятие отметки о
+    выполнении или удаление). label - название для сообщений об ошибках.
+    """
+
+    label = "статистики"
+
+    def __init__(self, state_path, save_interval=SAVE_INTERVAL):
+        self.state_path = state_path
+        self.save_interval = save_interval
+        self._dirty = False
+        self._saved_at = 0.0
+        self.reset()
+        self.loaded = self.load()
+
+    # --- Сохранение ---
+
+    def load(self):
+        raw = read_bytes(self.state_path)
+        if not raw:
+            return False
+        try:
+            self.from_state(json.loads(raw.decode("utf-8")))
+            return True
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ошибка загрузки {self.label}: {e}")
+            self.reset()
+            return False
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            atomic_write(self.state_path, json.dumps(self.to_state(), ensure_ascii=False))
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        except OSError as e:
+            print(f"Ошибка сохранения {self.label}: {e}")
+
+    def save_later(self):
+        """Отложенное сохранение: пишет, только если прошло save_interval секунд"""
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def flush(self):
+        """Запись отложенных изменений"""
+        if self._dirty:
+            self.save()
+
+    # --- События задач ---
+
+    def record_task(self, task, save=True):
+        raise NotImplementedError
+
+    def forget_task(self, task_id, save=True):
+        return False
+
+    def on_task_event(self, event, task):
+        """Обработчик событий TaskManager"""
+        if event != "deleted" and task.status.value == "completed":
+            self.record_task(task)
+        else:
+            self.forget_task(task.id)
+
+    def rebuild(self, tasks):
+        """Начальное заполнение по выполненным задачам (в порядке выполнения)"""
+        self.reset()
+        completed = sorted((task for task in tasks if task.status.value == "completed" and task.completed_at),
+                           key=lambda task: time_layer.to_epoch(task.completed_at))
+        for task in completed:
+            self.record_task(task, save=False)
+        self.save()
+
+
+def attach_to_tasks(stats):
+    """Подписка на события глобального task_manager и запись при выходе
+
+    Без сохраненного состояния статистика заполняется по текущим задачам.
+    """
+    from task_manager import task_manager
+
+    task_manager.add_listener(stats.on_task_event)
+    atexit.register(stats.flush)
+    if not stats.loaded:
+        stats.rebuild(task_manager.snapshot())
+    return stats
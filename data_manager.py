@@ -1,17 +1,51 @@
 # data_manager.py - Улучшенный менеджер данных с резервным копированием
 import json
 import os
-import shutil
 from datetime import datetime, timedelta
-from PyQt5.QtWidgets import QMessageBox
 import hashlib
+from backup_store import BackupStore
+from day_manifest import DayManifest, summarize_blocks
+from tracing import traced
+from day_format import (FORMAT_JSON, SUPPORTED_FORMATS, detect_format,
+                        encode_day, decode_day, validate_day, convert_directory)
+from parallel_loader import ParallelDayLoader, DEFAULT_CHUNK_SIZE
+from day_archive import DayArchive
+from file_storage import file_lock, atomic_write, DirectoryWatcher
+from productivity import (productivity_scorer, score_metrics, metrics_from_blocks,
+                          metrics_from_data, DAY_FORMULA)
+
+DEFAULT_DATA_DIR = "time_blocking_premium_data"
+
+
+def print_notifier(level, title, message):
+    """Уведомление по умолчанию - вывод в консоль"""
+    print(f"{title}: {message}")
+
 
 class PremiumDataManager:
-    """Менеджер данных премиум-класса с шифрованием и резервными копиями"""
-    def __init__(self):
-        self.data_dir = "time_blocking_premium_data"
+    """Менеджер данных премиум-класса с шифрованием и резервными копиями
+    
+    Не зависит от Qt: сообщения передаются в notifier(level, title, message),
+    где level - "warning" или "information". Приложение подставляет
+    notifier с диалогами, консольные утилиты - вывод в консоль. При
+    raise_errors=True ошибки чтения и записи пробрасываются вызывающему.
+    """
+    def __init__(self, storage_format=FORMAT_JSON, data_dir=DEFAULT_DATA_DIR,
+                 notifier=None, raise_errors=False):
+        self.data_dir = data_dir
+        self.notifier = notifier or print_notifier
+        self.raise_errors = raise_errors
+        # Параллельная загрузка диапазонов: None - по числу ядер, 1 - последовательно
+        self.load_workers = None
+        self.load_chunk_size = DEFAULT_CHUNK_SIZE
         self.backup_dir = os.path.join(self.data_dir, "backups")
+        self.storage_format = storage_format if storage_format in SUPPORTED_FORMATS else FORMAT_JSON
         self.ensure_directories()
+        self.backup_store = BackupStore(self.backup_dir, max_per_day=10,
+                                        decoder=self.deserialize_day)
+        self.manifest = DayManifest(self.data_dir)
+        self.archive = DayArchive(self.data_dir)
+        self.day_listeners = []
         self.encryption_key = self.generate_encryption_key()
     
     def ensure_directories(self):
@@ -19,62 +53,84 @@ class PremiumDataManager:
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
     
+    def add_day_listener(self, callback):
+        """Подписка на сохранение дня: callback(date, blocks_data)"""
+        if callback not in self.day_listeners:
+            self.day_listeners.append(callback)
+    
     def generate_encryption_key(self):
         """Генерация ключа шифрования (упрощенная версия)"""
         # В реальном приложении используйте надежное шифрование
         return hashlib.sha256(b"time_blocking_premium_key").hexdigest()[:32]
     
+    @traced("data.save_day", "io")
     def save_day(self, time_blocks, date=None, create_backup=True):
         """Сохранение дня с созданием резервной копии"""
+        blocks_data = []
+        for block in time_blocks:
+            blocks_data.append({
+                "id": block.block_id,
+                "title": block.title,
+                "start_time": block.start_time.isoformat(),
+                "end_time": block.end_time.isoformat(),
+                "color": block.color,
+                "notify": block.notify,
+                "progress": getattr(block, 'progress', 0),
+                "created_at": getattr(block, 'created_at', datetime.now().isoformat()),
+                "updated_at": datetime.now().isoformat()
+            })
+        return self.write_day_data(blocks_data, date, create_backup)
+    
+    def write_day_data(self, blocks_data, date=None, create_backup=True):
+        """Сохранение дня из словарей блоков (формат файла дня)"""
         try:
             if date is None:
                 date = datetime.now().date()
             
             filename = os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}.json")
             
-            # Создание резервной копии если файл существует
-            if create_backup and os.path.exists(filename):
-                self.create_backup(filename, date)
-            
+            summary = self.summarize_blocks_data(blocks_data)
             data = {
                 "version": "2.0",
                 "date": date.isoformat(),
                 "saved_at": datetime.now().isoformat(),
-                "time_blocks": [],
+                "time_blocks": list(blocks_data),
                 "metadata": {
-                    "total_blocks": len(time_blocks),
-                    "total_minutes": sum(block.get_duration_minutes() for block in time_blocks),
-                    "productivity_score": self.calculate_productivity_score(time_blocks)
+                    "total_blocks": summary["total_blocks"],
+                    "total_minutes": summary["total_minutes"],
+                    "productivity_score": summary["productivity_score"]
                 }
             }
             
-            for block in time_blocks:
-                block_data = {
-                    "id": block.block_id,
-                    "title": block.title,
-                    "start_time": block.start_time.isoformat(),
-                    "end_time": block.end_time.isoformat(),
-                    "color": block.color,
-                    "notify": block.notify,
-                    "progress": getattr(block, 'progress', 0),
-                    "created_at": getattr(block, 'created_at', datetime.now().isoformat()),
-                    "updated_at": datetime.now().isoformat()
-                }
-                data["time_blocks"].append(block_data)
+            encrypted_data = self.serialize_day(data)
             
-            # "Шифрование" данных (в реальном приложении используйте настоящие методы)
-            encrypted_data = self.simple_encrypt(json.dumps(data, indent=2, ensure_ascii=False))
+            # Блокировка дня: резервная копия, запись и запись манифеста (в том же
+            # каталоге) не перемежаются с другими процессами
+            with file_lock(filename):
+                if create_backup and os.path.exists(filename):
+                    self.create_backup(filename, date)
+                atomic_write(filename, encrypted_data)
+                # Сводка дня для статистики без разбора блоков
+                self.manifest.update(date, summary, filename, encrypted_data)
+            # Оценка уже посчитана - кладем в кэш под новой контрольной суммой
+            self.day_score(date, self.manifest.days[date.isoformat()])
             
-            with open(filename, 'wb') as f:
-                f.write(encrypted_data)
+            for callback in list(self.day_listeners):
+                try:
+                    callback(date, data["time_blocks"])
+                except Exception as e:
+                    print(f"Ошибка обработчика сохранения дня: {e}")
             
             return True
             
         except Exception as e:
-            QMessageBox.warning(None, "Ошибка сохранения", 
-                              f"Не удалось сохранить данные: {str(e)}")
+            if self.raise_errors:
+                raise
+            self.notifier("warning", "Ошибка сохранения",
+                          f"Не удалось сохранить данные: {str(e)}")
             return False
     
+    @traced("data.load_day", "io")
     def load_day(self, date=None):
         """Загрузка дня с проверкой целостности"""
         try:
@@ -84,27 +140,77 @@ class PremiumDataManager:
             filename = os.path.join(self.data_dir, f"schedule_{date.strftime('%Y-%m-%d')}.json")
             
             if not os.path.exists(filename):
-                return []
+                # Закрытые дни могут быть перенесены в архив
+                archived = self.archive.read_day(date)
+                return archived["time_blocks"] if archived else []
             
             with open(filename, 'rb') as f:
                 encrypted_data = f.read()
             
-            # "Расшифровка" данных
-            decrypted_data = self.simple_decrypt(encrypted_data)
-            data = json.loads(decrypted_data)
+            data = self.deserialize_day(encrypted_data)
             
             # Проверка версии и целостности
             if not self.validate_data(data):
+                if self.raise_errors:
+                    raise ValueError(f"Поврежден файл дня: {filename}")
                 # Попытка загрузки из резервной копии
                 return self.restore_from_backup(date)
             
             return data["time_blocks"]
             
         except Exception as e:
-            QMessageBox.warning(None, "Ошибка загрузки", 
-                              f"Не удалось загрузить данные: {str(e)}")
+            if self.raise_errors:
+                raise
+            self.notifier("warning", "Ошибка загрузки",
+                          f"Не удалось загрузить данные: {str(e)}")
             return self.restore_from_backup(date) or []
     
+    def create_watcher(self, dates=None):
+        """Наблюдатель за файлами дней, измененными другими процессами
+
+        dates - необязательная функция, возвращающая интересующие даты:
+        тогда опрашиваются только их файлы, а не весь каталог.
+        """
+        names = None
+        if dates is not None:
+            names = lambda: [f"schedule_{date.strftime('%Y-%m-%d')}.json" for date in dates()]
+        return DirectoryWatcher(
+            self.data_dir,
+            accept=lambda name: name.startswith("schedule_") and name.endswith(".json"),
+            names=names
+        )
+    
+    @staticmethod
+    def date_from_filename(path):
+        """Дата из имени файла дня (None для других файлов)"""
+        name = os.path.basename(path)
+        if not (name.startswith("schedule_") and name.endswith(".json")):
+            return None
+        try:
+            return datetime.strptime(name[len("schedule_"):-len(".json")], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    
+    def serialize_day(self, data):
+        """Сериализация дня в выбранном формате хранения"""
+        if self.storage_format == FORMAT_JSON:
+            # "Шифрование" данных (в реальном приложении используйте настоящие методы)
+            return self.simple_encrypt(json.dumps(data, indent=2, ensure_ascii=False))
+        return encode_day(data, self.storage_format)
+    
+    def deserialize_day(self, raw):
+        """Десериализация дня с определением формата по заголовку"""
+        if detect_format(raw) == FORMAT_JSON:
+            # "Расшифровка" данных
+            return json.loads(self.simple_decrypt(raw))
+        return decode_day(raw)
+    
+    def convert_storage(self, target_format):
+        """Перевод всех сохраненных дней в другой формат хранения"""
+        converted = convert_directory(self.data_dir, target_format)
+        self.storage_format = target_format
+        return converted
+    
     def simple_encrypt(self, data):
         """Упрощенное "шифрование" (для демонстрации)"""
         return data.encode('utf-8')
@@ -115,66 +221,32 @@ class PremiumDataManager:
     
     def validate_data(self, data):
         """Проверка целостности данных"""
-        required_fields = ["version", "date", "time_blocks"]
-        return all(field in data for field in required_fields)
+        return validate_day(data)
     
     def create_backup(self, original_file, date):
-        """Создание резервной копии"""
+        """Создание резервной копии (идентичные снимки не дублируются)"""
         try:
-            backup_name = f"backup_{date.strftime('%Y-%m-%d')}_{datetime.now().strftime('%H-%M-%S')}.json"
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            shutil.copy2(original_file, backup_path)
+            with open(original_file, 'rb') as f:
+                raw = f.read()
             
-            # Ограничение количества резервных копий (максимум 10)
-            self.cleanup_old_backups(date)
+            # Ротация (максимум 10 копий) выполняется хранилищем по индексу даты
+            self.backup_store.put(date, raw)
             
         except Exception as e:
             print(f"Ошибка создания резервной копии: {e}")
     
-    def cleanup_old_backups(self, date):
-        """Очистка старых резервных копий"""
-        try:
-            backup_pattern = f"backup_{date.strftime('%Y-%m-%d')}_*.json"
-            backups = []
-            
-            for file in os.listdir(self.backup_dir):
-                if file.startswith(f"backup_{date.strftime('%Y-%m-%d')}"):
-                    file_path = os.path.join(self.backup_dir, file)
-                    backups.append((file_path, os.path.getctime(file_path)))
-            
-            # Сортируем по дате создания (новые сначала)
-            backups.sort(key=lambda x: x[1], reverse=True)
-            
-            # Удаляем старые копии (оставляем 10 последних)
-            for backup_path, _ in backups[10:]:
-                os.remove(backup_path)
-                
-        except Exception as e:
-            print(f"Ошибка очистки резервных копий: {e}")
-    
     def restore_from_backup(self, date):
         """Восстановление из резервной копии"""
         try:
-            backups = []
-            for file in os.listdir(self.backup_dir):
-                if file.startswith(f"backup_{date.strftime('%Y-%m-%d')}"):
-                    file_path = os.path.join(self.backup_dir, file)
-                    backups.append((file_path, os.path.getctime(file_path)))
-            
-            if not backups:
+            # Берем самую свежую резервную копию из индекса даты
+            encrypted_data = self.backup_store.latest(date)
+            if encrypted_data is None:
                 return None
             
-            # Берем самую свежую резервную копию
-            latest_backup = max(backups, key=lambda x: x[1])[0]
-            
-            with open(latest_backup, 'rb') as f:
-                encrypted_data = f.read()
+            data = self.deserialize_day(encrypted_data)
             
-            decrypted_data = self.simple_decrypt(encrypted_data)
-            data = json.loads(decrypted_data)
-            
-            QMessageBox.information(None, "Восстановление", 
-                                  "Данные восстановлены из резервной копии")
+            self.notifier("information", "Восстановление",
+                          "Данные восстановлены из резервной копии")
             
             return data["time_blocks"]
             
@@ -183,23 +255,66 @@ class PremiumDataManager:
             return None
     
     def calculate_productivity_score(self, time_blocks):
-        """Расчет показателя продуктивности"""
-        if not time_blocks:
-            return 0
-        
-        total_minutes = sum(block.get_duration_minutes() for block in time_blocks)
-        # Максимальная продуктивность - 8 часов работы
-        max_productivity = 8 * 60
-        score = min(100, int((total_minutes / max_productivity) * 100))
+        """Расчет показателя продуктивности (с бонусом за разнообразие задач)"""
+        return score_metrics(metrics_from_blocks(time_blocks), DAY_FORMULA)
+    
+    def day_version(self, date):
+        """Версия содержимого дня - контрольная сумма файла из манифеста (None, если нет записи)"""
+        return self.manifest.load().get(date.isoformat(), {}).get("checksum")
+    
+    def day_score(self, day, entry):
+        """Оценка дня по записи манифеста; кэш общий с окном - по контрольной сумме файла"""
+        return productivity_scorer.cached((day, DAY_FORMULA), entry.get("checksum"),
+                                          lambda: entry.get("productivity_score", 0))
+    
+    def summarize_blocks_data(self, blocks_data):
+        """Сводные метрики дня для манифеста"""
+        return summarize_blocks(blocks_data)
+    
+    def load_days(self, dates, with_data=True):
+        """Загрузка нескольких дней (сводки больших диапазонов - в пуле процессов)
         
-        # Бонус за разнообразие задач
-        unique_tasks = len(set(block.title for block in time_blocks))
-        diversity_bonus = min(20, unique_tasks * 2)
+        Возвращает список (date, raw, blocks, summary) в порядке дат только
+        для существующих дней. Дни, которые не удалось разобрать, повторно
+        загружаются через load_day (с восстановлением из резервной копии).
+        Дни без файла берутся из архива (raw для них - пустые байты).
+        С with_data загрузка последовательная, параллельно считаются только
+        сводки (with_data=False) - см. ParallelDayLoader.
+        """
+        loader = ParallelDayLoader(self.data_dir, self.load_workers, self.load_chunk_size)
+        days = []
+        for day, raw, data, summary, error in loader.load(dates, with_data):
+            if raw is None:
+                archived = self.archive.read_day(day)
+                if archived is not None:
+                    blocks = archived["time_blocks"]
+                    days.append((day, b"", blocks if with_data else [],
+                                 self.summarize_blocks_data(blocks)))
+                continue
+            if data is None:
+                blocks = self.load_day(day) or []
+                summary = self.summarize_blocks_data(blocks)
+            else:
+                blocks = data.get("time_blocks", [])
+            days.append((day, raw, blocks, summary))
+        return days
+    
+    def refresh_manifest(self):
+        """Обновление устаревших записей манифеста (читаются только изменившиеся дни)"""
+        stale_dates = self.manifest.find_stale()
+        for stale_date, raw, blocks, summary in self.load_days(stale_dates, with_data=False):
+            filename = os.path.join(self.data_dir, f"schedule_{stale_date.strftime('%Y-%m-%d')}.json")
+            try:
+                self.manifest.update(stale_date, summary, filename, raw, save=False)
+            except Exception as e:
+                print(f"Ошибка обновления манифеста для {stale_date}: {e}")
         
-        return min(100, score + diversity_bonus)
+        if stale_dates:
+            self.manifest.save()
+        return self.manifest
     
     def get_statistics(self, start_date, end_date):
-        """Получение статистики за период"""
+        """Получение статистики за период (по манифесту, без разбора блоков)"""
         statistics = {
             "total_days": 0,
             "total_blocks": 0,
@@ -207,28 +322,26 @@ class PremiumDataManager:
             "average_blocks_per_day": 0,
             "average_hours_per_day": 0,
             "productivity_trend": [],
+            # Ряды [(date, значение)] по непустым дням - для графиков трендов
+            "productivity_series": [],
+            "hours_series": [],
             "most_productive_day": None
         }
         
-        current_date = start_date
         daily_stats = []
         
-        while current_date <= end_date:
-            blocks = self.load_day(current_date)
-            if blocks:
-                total_minutes = sum((datetime.fromisoformat(block["end_time"]) - 
-                                   datetime.fromisoformat(block["start_time"])).total_seconds() / 60 
-                                   for block in blocks)
+        for day, entry in self.refresh_manifest().entries_in_range(start_date, end_date):
+            if entry["total_blocks"]:
+                total_minutes = entry["total_seconds"] / 60
                 
                 day_stat = {
-                    "date": current_date,
-                    "blocks": len(blocks),
+                    "date": day,
+                    "blocks": entry["total_blocks"],
                     "hours": total_minutes / 60,
-                    "productivity": self.calculate_productivity_score_from_data(blocks)
+                    # Оценка дня пересчитывается, только когда меняется его файл
+                    "productivity": self.day_score(day, entry)
                 }
                 daily_stats.append(day_stat)
-            
-            current_date += timedelta(days=1)
         
         if daily_stats:
             statistics["total_days"] = len(daily_stats)
@@ -237,22 +350,15 @@ class PremiumDataManager:
             statistics["average_blocks_per_day"] = statistics["total_blocks"] / statistics["total_days"]
             statistics["average_hours_per_day"] = statistics["total_hours"] / statistics["total_days"]
             statistics["productivity_trend"] = [day["productivity"] for day in daily_stats]
+            statistics["productivity_series"] = [(day["date"], day["productivity"]) for day in daily_stats]
+            statistics["hours_series"] = [(day["date"], day["hours"]) for day in daily_stats]
             statistics["most_productive_day"] = max(daily_stats, key=lambda x: x["productivity"])
         
         return statistics
     
     def calculate_productivity_score_from_data(self, blocks_data):
         """Расчет продуктивности из данных блоков"""
-        if not blocks_data:
-            return 0
-        
-        total_minutes = 0
-        for block in blocks_data:
-            start = datetime.fromisoformat(block["start_time"])
-            end = datetime.fromisoformat(block["end_time"])
-            total_minutes += (end - start).total_seconds() / 60
-        
-        return min(100, int((total_minutes / (8 * 60)) * 100))
+        return score_metrics(metrics_from_data(blocks_data), DAY_FORMULA)
     
     def export_data(self, start_date, end_date, format='json'):
         """Экспорт данных в различных форматах"""
@@ -268,15 +374,15 @@ class PremiumDataManager:
             "schedules": []
         }
         
-        current_date = start_date
-        while current_date <= end_date:
-            blocks = self.load_day(current_date)
+        # Читаются только непустые дни периода (по манифесту)
+        days = [day for day, entry in self.refresh_manifest().entries_in_range(start_date, end_date)
+                if entry["total_blocks"]]
+        for day, raw, blocks, summary in self.load_days(days):
             if blocks:
                 data["schedules"].append({
-                    "date": current_date.isoformat(),
+                    "date": day.isoformat(),
                     "blocks": blocks
                 })
-            current_date += timedelta(days=1)
         
         if format == 'json':
             return json.dumps(data, indent=2, ensure_ascii=False)
@@ -285,6 +391,18 @@ class PremiumDataManager:
         else:
             raise ValueError(f"Unsupported format: {format}")
     
+    def import_data(self, data, create_backup=True):
+        """Импорт данных в формате export_data (json). Возвращает число дней"""
+        if isinstance(data, (str, bytes)):
+            data = json.loads(data)
+        
+        imported = 0
+        for schedule in data.get("schedules", []):
+            day = datetime.fromisoformat(schedule["date"]).date()
+            if self.write_day_data(schedule.get("blocks", []), day, create_backup):
+                imported += 1
+        return imported
+    
     def convert_to_csv(self, data):
         """Конвертация в CSV формат"""
         csv_lines = ["Date,Start Time,End Time,Title,Color,Duration (min)"]
@@ -0,0 +1,387 @@
+# day_archive.py - Колоночный архив закрытых дней с отображением файлов в память
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from datetime import datetime, date as date_cls, timedelta
+
+from day_format import validate_day
+
+ARCHIVE_VERSION = 1
+ARCHIVE_DIR_NAME = "archive"
+
+# Колонки фиксированной ширины: имя -> код struct / memoryview.cast
+COLUMNS = (
+    ("start", "q"),        # микросекунды от EPOCH
+    ("end", "q"),
+    ("color", "I"),        # 0xRRGGBB
+    ("flags", "B"),        # бит 0 - notify, бит 7 - блок целиком в extras
+    ("progress", "B"),
+    ("title_off", "Q"),    # смещение и длина названия в куче строк
+    ("title_len", "I"),
+    ("extra_off", "Q"),    # смещение и длина JSON прочих полей
+    ("extra_len", "I"),
+)
+COLUMN_CODES = dict(COLUMNS)
+
+EPOCH = datetime(1970, 1, 1)
+FLAG_NOTIFY = 0x01
+FLAG_RAW = 0x80
+
+# Поля, хранящиеся в колонках (остальные - в extras)
+COLUMN_FIELDS = ("title", "start_time", "end_time", "color", "notify", "progress")
+
+
+def _to_micros(value):
+    """ISO-время -> микросекунды от EPOCH (None, если без потерь не получится)"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None:
+        return None
+    micros = (moment - EPOCH) // timedelta(microseconds=1)
+    return micros if _from_micros(micros) == value else None
+
+
+def _from_micros(micros):
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _to_rgb(value):
+    """'#RRGGBB' -> int (None, если цвет не в этом виде)"""
+    if isinstance(value, str) and len(value) == 7 and value[0] == "#":
+        try:
+            rgb = int(value[1:], 16)
+        except ValueError:
+            return None
+        return rgb if _from_rgb(rgb) == value else None
+    return None
+
+
+def _from_rgb(rgb):
+    return f"#{rgb:06X}"
+
+
+class DayArchive:
+    """Архив закрытых дней: колонки фиксированной ширины + кучи строк
+
+    Каждая колонка - отдельный файл, который только дописывается; чтение
+    идет через mmap и memoryview.cast без копирования. Индекс дат
+    (index.json) указывает диапазон строк дня и записывается последним,
+    поэтому незавершенная запись никогда не видна читателям. Повторная
+    архивация даты дописывает новые строки и переключает индекс на них.
+    Методы можно вызывать из нескольких потоков; срезы, возвращенные
+    column, действительны до следующего перечитывания индекса.
+    """
+
+    def __init__(self, data_dir):
+        self.archive_dir = os.path.join(data_dir, ARCHIVE_DIR_NAME)
+        self.index_path = os.path.join(self.archive_dir, "index.json")
+        self.index = {"version": ARCHIVE_VERSION, "rows": 0,
+                      "titles_size": 0, "extras_size": 0, "days": {}}
+        self._maps = {}
+        self._index_mtime = None
+        # Перечитывание индекса закрывает отображения - чтение и запись идут под блокировкой
+        self._lock = threading.RLock()
+        self.load_index()
+
+    # --- Индекс ---
+
+    def load_index(self):
+        """Загрузка индекса (повторно - только если файл изменился)"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.index_path).st_mtime_ns
+            except FileNotFoundError:
+                return self.index
+            if mtime != self._index_mtime:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("version") == ARCHIVE_VERSION:
+                    self.close()
+                    self.index = index
+                self._index_mtime = mtime
+            return self.index
+
+    def _save_index(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def contains(self, day):
+        """Есть ли дата в архиве"""
+        return day.isoformat() in self.load_index()["days"]
+
+    def dates(self):
+        """Архивированные даты по порядку"""
+        return sorted(date_cls.fromisoformat(key) for key in self.load_index()["days"])
+
+    # --- Файлы колонок ---
+
+    def _path(self, name):
+        return os.path.join(self.archive_dir, name)
+
+    def _committed_sizes(self):
+        """Размеры файлов, соответствующие индексу"""
+        rows = self.index["rows"]
+        sizes = {f"{name}.col": rows * struct.calcsize(code) for name, code in COLUMNS}
+        sizes["titles.heap"] = self.index["titles_size"]
+        sizes["extras.heap"] = self.index["extras_size"]
+        return sizes
+
+    def _map(self, filename):
+        """Отображение файла в память (только чтение)"""
+        mapped = self._maps.get(filename)
+        if mapped is None:
+            size = self._committed_sizes()[filename]
+            if size == 0:
+                return memoryview(b"")
+            with open(self._path(filename), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._maps[filename] = mapped
+        return memoryview(mapped)
+
+    def column(self, name, row=0, count=None):
+        """Срез колонки без копирования (memoryview нужного типа)"""
+        with self._lock:
+            self.load_index()
+            view = self._map(f"{name}.col").cast(COLUMN_CODES[name])
+            end = len(view) if count is None else row + count
+            return view[row:end]
+
+    def close(self):
+        """Закрытие отображений"""
+        with self._lock:
+            for mapped in self._maps.values():
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # еще есть живые срезы; закроется сборщиком мусора
+            self._maps = {}
+
+    # --- Запись ---
+
+    def append_days(self, days):
+        """Архивация дней: days - список (date, data) с данными файла дня"""
+        with self._lock:
+            if not days:
+                return 0
+            os.makedirs(self.archive_dir, exist_ok=True)
+            self.load_index()
+            self.close()
+
+            # Отрезаем хвосты незавершенной прошлой записи
+            sizes = self._committed_sizes()
+            files = {}
+            try:
+                for filename, size in sizes.items():
+                    f = open(self._path(filename), "ab+")
+                    f.truncate(size)
+                    f.seek(size)
+                    files[filename] = f
+
+                rows = self.index["rows"]
+                titles_size = self.index["titles_size"]
+                extras_size = self.index["extras_size"]
+                new_days = {}
+
+                for day, data in sorted(days, key=lambda item: item[0]):
+                    blocks = data.get("time_blocks", [])
+                    columns = {name: [] for name, _ in COLUMNS}
+                    for block in blocks:
+                        values, title, extra = self._encode_block(block)
+                        title_bytes = title.encode("utf-8")
+                        extra_bytes = json.dumps(extra, ensure_ascii=False,
+                                                 separators=(",", ":")).encode("utf-8") if extra else b""
+                        values.update({
+                            "title_off": titles_size, "title_len": len(title_bytes),
+                            "extra_off": extras_size, "extra_len": len(extra_bytes)
+                        })
+                        files["titles.heap"].write(title_bytes)
+                        files["extras.heap"].write(extra_bytes)
+                        titles_size += len(title_bytes)
+                        extras_size += len(extra_bytes)
+                        for name, _ in COLUMNS:
+                            columns[name].append(values[name])
+
+                    for name, code in COLUMNS:
+                        values = columns[name]
+                        files[f"{name}.col"].write(struct.pack(f"<{len(values)}{code}", *values))
+
+                    meta = {key: value for key, value in data.items() if key != "time_blocks"}
+                    new_days[day.isoformat()] = {"row": rows, "count": len(blocks), "meta": meta}
+                    rows += len(blocks)
+
+                for f in files.values():
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                for f in files.values():
+                    f.close()
+
+            # Индекс - последним: до этого новые строки не видны
+            self.index["rows"] = rows
+            self.index["titles_size"] = titles_size
+            self.index["extras_size"] = extras_size
+            self.index["days"].update(new_days)
+            self._save_index()
+            return len(new_days)
+
+    @staticmethod
+    def _encode_block(block):
+        """Значения колонок, название и словарь полей вне колонок"""
+        values = {"start": 0, "end": 0, "color": 0, "flags": 0, "progress": 0}
+        extra = {key: value for key, value in block.items() if key not in COLUMN_FIELDS}
+        title = block.get("title")
+
+        start = _to_micros(block.get("start_time"))
+        end = _to_micros(block.get("end_time"))
+        if not isinstance(title, str) or start is None or end is None:
+            # Нестандартный блок хранится целиком
+            values["flags"] = FLAG_RAW
+            return values, "", dict(block)
+
+        values["start"], values["end"] = start, end
+
+        color = _to_rgb(block.get("color"))
+        if color is None:
+            if "color" in block:
+                extra["color"] = block["color"]
+        else:
+            values["color"] = color
+
+        notify = block.get("notify")
+        if isinstance(notify, bool):
+            values["flags"] |= FLAG_NOTIFY if notify else 0
+        else:
+            extra["notify"] = notify
+
+        progress = block.get("progress", 0)
+        if isinstance(progress, int) and not isinstance(progress, bool) and 0 <= progress <= 255:
+            values["progress"] = progress
+        else:
+            extra["progress"] = progress
+        return values, title, extra
+
+    # --- Чтение ---
+
+    def day_range(self, day):
+        """(первая строка, число строк) дня или None"""
+        with self._lock:
+            entry = self.load_index()["days"].get(day.isoformat())
+            return (entry["row"], entry["count"]) if entry else None
+
+    def read_day(self, day):
+        """Данные дня в формате файла дня или None"""
+        with self._lock:
+            entry = self.load_index()["days"].get(day.isoformat())
+            if entry is None:
+                return None
+
+            row, count = entry["row"], entry["count"]
+            cols = {name: self.column(name, row, count) for name, _ in COLUMNS}
+            titles = self._map("titles.heap")
+            extras = self._map("extras.heap")
+
+            blocks = []
+            for i in range(count):
+                extra_len = cols["extra_len"][i]
+                extra = {}
+                if extra_len:
+                    offset = cols["extra_off"][i]
+                    extra = json.loads(bytes(extras[offset:offset + extra_len]).decode("utf-8"))
+                flags = cols["flags"][i]
+                if flags & FLAG_RAW:
+                    blocks.append(extra)
+                    continue
+
+                offset = cols["title_off"][i]
+                block = {
+                    "title": bytes(titles[offset:offset + cols["title_len"][i]]).decode("utf-8"),
+                    "start_time": _from_micros(cols["start"][i]),
+                    "end_time": _from_micros(cols["end"][i]),
+                    "color": _from_rgb(cols["color"][i]),
+                    "notify": bool(flags & FLAG_NOTIFY),
+                    "progress": cols["progress"][i]
+                }
+                block.update(extra)
+                blocks.append(block)
+
+            data = dict(entry["meta"])
+            data["time_blocks"] = blocks
+            return data
+
+    def range_seconds(self, start_date, end_date):
+        """Суммарная длительность блоков по дням периода - только по колонкам start/end"""
+        with self._lock:
+            result = []
+            for key in sorted(self.load_index()["days"]):
+                if not start_date.isoformat() <= key <= end_date.isoformat():
+                    continue
+                row, count = self.index["days"][key]["row"], self.index["days"][key]["count"]
+                starts = self.column("start", row, count)
+                ends = self.column("end", row, count)
+                flags = self.column("flags", row, count)
+                micros = sum(ends[i] - starts[i] for i in range(count) if not flags[i] & FLAG_RAW)
+                result.append((date_cls.fromisoformat(key), micros / 1e6))
+            return result
+
+
+def archive_closed_days(data_manager, before=None, remove_files=True):
+    """Перенос закрытых дней (раньше before, по умолчанию - сегодня) в архив
+
+    Файл дня удаляется только после записи индекса архива; записи
+    манифеста сохраняются с пометкой archived. Возвращает число дней.
+    """
+    before = before or date_cls.today()
+    archive = data_manager.archive
+    days = []
+    files = []
+    for name in sorted(os.listdir(data_manager.data_dir)):
+        if not (name.startswith("schedule_") and name.endswith(".json")):
+            continue
+        try:
+            day = date_cls.fromisoformat(name[len("schedule_"):-len(".json")])
+        except ValueError:
+            continue
+        if day >= before:
+            continue
+
+        path = os.path.join(data_manager.data_dir, name)
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            data = data_manager.deserialize_day(raw)
+        except Exception as e:
+            print(f"Ошибка архивации {name}: {e}")
+            continue
+        if not validate_day(data):
+            print(f"Ошибка архивации {name}: поврежден файл дня")
+            continue
+        days.append((day, data))
+        files.append((day, path))
+
+    archived = archive.append_days(days)
+
+    # Манифест: сводки архивированных дней остаются, файлы больше не проверяются
+    data_manager.refresh_manifest()
+    manifest = data_manager.manifest
+    for day, path in files:
+        entry = manifest.days.get(day.isoformat())
+        if entry is not None:
+            entry["archived"] = True
+        if remove_files:
+            os.remove(path)
+    manifest.save()
+    return archived
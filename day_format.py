@@ -0,0 +1,121 @@
+# day_format.py - Форматы файлов дня: JSON (по умолчанию) и компактный сжатый
+import json
+import os
+import tempfile
+import zlib
+
+FORMAT_JSON = "json"
+FORMAT_COMPACT = "compact"
+SUPPORTED_FORMATS = (FORMAT_JSON, FORMAT_COMPACT)
+
+# Заголовок компактного формата: сигнатура + версия
+COMPACT_MAGIC = b"TBC1"
+
+# Порядок полей блока в компактной записи
+BLOCK_FIELDS = ("id", "title", "start_time", "end_time", "color", "notify", "progress", "created_at")
+
+# Обязательные поля файла дня
+REQUIRED_DAY_FIELDS = ("version", "date", "time_blocks")
+
+
+def validate_day(data):
+    """Проверка целостности данных дня"""
+    return isinstance(data, dict) and all(field in data for field in REQUIRED_DAY_FIELDS)
+
+
+def detect_format(raw):
+    """Определение формата по заголовку файла"""
+    if raw[:len(COMPACT_MAGIC)] == COMPACT_MAGIC:
+        return FORMAT_COMPACT
+    return FORMAT_JSON
+
+
+def encode_day(data, fmt=FORMAT_JSON):
+    """Сериализация данных дня в байты выбранного формата"""
+    if fmt == FORMAT_COMPACT:
+        payload = json.dumps(_pack(data), ensure_ascii=False, separators=(",", ":"))
+        return COMPACT_MAGIC + zlib.compress(payload.encode("utf-8"), 6)
+    if fmt == FORMAT_JSON:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    raise ValueError(f"Unsupported storage format: {fmt}")
+
+
+def decode_day(raw):
+    """Десериализация файла дня с автоопределением формата"""
+    if detect_format(raw) == FORMAT_COMPACT:
+        payload = zlib.decompress(raw[len(COMPACT_MAGIC):])
+        return _unpack(json.loads(payload.decode("utf-8")))
+    return json.loads(raw.decode("utf-8"))
+
+
+def _pack(data):
+    """Компактное представление: блоки - позиционные массивы без updated_at"""
+    packed = {"x": {k: v for k, v in data.items() if k != "time_blocks"}}
+
+    blocks = data.get("time_blocks")
+    if blocks is None:
+        return packed
+
+    rows = []
+    for block in blocks:
+        row = [block.get(field) for field in BLOCK_FIELDS]
+        # updated_at совпадает с saved_at и не хранится; прочие поля сохраняются как есть
+        extra = {k: v for k, v in block.items() if k not in BLOCK_FIELDS and k != "updated_at"}
+        if extra:
+            row.append(extra)
+        rows.append(row)
+    packed["b"] = rows
+    return packed
+
+
+def _unpack(packed):
+    """Восстановление словаря дня из компактного представления"""
+    data = dict(packed.get("x", {}))
+    if "b" not in packed:
+        return data
+
+    saved_at = data.get("saved_at")
+    field_count = len(BLOCK_FIELDS)
+    blocks = []
+    for row in packed["b"]:
+        block = dict(zip(BLOCK_FIELDS, row))
+        block["updated_at"] = saved_at
+        if len(row) > field_count:
+            block.update(row[field_count])
+        blocks.append(block)
+    data["time_blocks"] = blocks
+    return data
+
+
+def convert_directory(data_dir, target_format):
+    """Перезапись всех файлов дней каталога в указанный формат
+
+    Возвращает количество преобразованных файлов.
+    """
+    if target_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported storage format: {target_format}")
+
+    converted = 0
+    for name in sorted(os.listdir(data_dir)):
+        if not (name.startswith("schedule_") and name.endswith(".json")):
+            continue
+
+        path = os.path.join(data_dir, name)
+        with open(path, "rb") as f:
+            raw = f.read()
+        if detect_format(raw) == target_format:
+            continue
+
+        encoded = encode_day(decode_day(raw), target_format)
+        fd, tmp_path = tempfile.mkstemp(dir=data_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        converted += 1
+
+    return converted
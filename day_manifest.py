@@ -0,0 +1,150 @@
+# day_manifest.py - Сводный индекс дней для быстрой статистики
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date as date_cls, datetime
+
+from productivity import DayMetrics, DAY_FORMULA, score_metrics
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def summarize_blocks(blocks_data):
+    """Сводные метрики дня по словарям блоков"""
+    total_seconds = 0
+    total_minutes = 0
+    for block in blocks_data:
+        seconds = (datetime.fromisoformat(block["end_time"]) - 
+                   datetime.fromisoformat(block["start_time"])).total_seconds()
+        total_seconds += seconds
+        total_minutes += int(seconds / 60)
+    
+    metrics = DayMetrics(len(blocks_data), total_minutes,
+                         len(set(block["title"] for block in blocks_data)))
+    score = score_metrics(metrics, DAY_FORMULA)
+    
+    return {
+        "total_blocks": len(blocks_data),
+        "total_minutes": total_minutes,
+        "total_seconds": total_seconds,
+        "productivity_score": score
+    }
+
+
+class DayManifest:
+    """Сводка по каждому сохраненному дню: метрики, размер, mtime и контрольная сумма
+
+    Поддерживается при каждом сохранении дня. Статистика за период читает
+    только манифест; файлы дней открываются, лишь если запись устарела
+    (размер или mtime файла не совпадают с записанными).
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, MANIFEST_NAME)
+        self.days = {}
+        self._loaded_mtime = None
+
+    def load(self):
+        """Загрузка манифеста (повторно - только если файл изменился)"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            # Файл удален извне - сбрасываем ранее прочитанное; несохраненные записи остаются
+            if self._loaded_mtime is not None:
+                self.days = {}
+                self._loaded_mtime = None
+            return self.days
+
+        if mtime != self._loaded_mtime:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.days = data.get("days", {}) if data.get("version") == MANIFEST_VERSION else {}
+            except (OSError, ValueError):
+                self.days = {}
+            self._loaded_mtime = mtime
+        return self.days
+
+    def save(self):
+        """Атомарная запись манифеста
+
+        Блокировку не берет: update вызывается под file_lock файла дня из
+        того же каталога, и вложенная блокировка ждала бы саму себя.
+        """
+        data = {"version": MANIFEST_VERSION, "days": self.days}
+        fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def make_entry(self, summary, filename, raw):
+        """Запись манифеста для файла дня"""
+        stat = os.stat(filename)
+        entry = dict(summary)
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["checksum"] = hashlib.sha256(raw).hexdigest()
+        return entry
+
+    def update(self, date, summary, filename, raw, save=True):
+        """Обновление записи дня после сохранения"""
+        self.load()
+        self.days[date.isoformat()] = self.make_entry(summary, filename, raw)
+        if save:
+            self.save()
+
+    def find_stale(self):
+        """Даты, у которых запись отсутствует или не совпадает с файлом
+
+        Использует только метаданные каталога (scandir), файлы не читаются.
+        Записи удаленных файлов убираются из манифеста, кроме перенесенных
+        в архив (archived) - их сводки остаются актуальными.
+        """
+        self.load()
+        stale = []
+        present = set()
+
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not (name.startswith("schedule_") and name.endswith(".json")):
+                    continue
+                key = name[len("schedule_"):-len(".json")]
+                try:
+                    day = date_cls.fromisoformat(key)
+                except ValueError:
+                    continue
+
+                present.add(key)
+                stat = entry.stat()
+                record = self.days.get(key)
+                if (record is None or record.get("size") != stat.st_size
+                        or record.get("mtime_ns") != stat.st_mtime_ns):
+                    stale.append(day)
+
+        removed = [key for key, record in self.days.items()
+                   if key not in present and not record.get("archived")]
+        for key in removed:
+            del self.days[key]
+        if removed and not stale:
+            self.save()
+
+        return sorted(stale)
+
+    def entries_in_range(self, start_date, end_date):
+        """Записи манифеста за период в порядке дат"""
+        start_key, end_key = start_date.isoformat(), end_date.isoformat()
+        return [
+            (date_cls.fromisoformat(key), self.days[key])
+            for key in sorted(self.days)
+            if start_key <= key <= end_key
+        ]
@@ -0,0 +1,193 @@
+# duration_estimator.py - Оценка длительности задач по истории выполнения
+import re
+from collections import OrderedDict
+from datetime import timedelta
+
+from completion_stats import CompletionStats, SAVE_INTERVAL, attach_to_tasks, state_path
+from time_layer import time_layer
+
+STATE_FILE = "duration_estimates.json"
+DEFAULT_MINUTES = 60
+MIN_MINUTES = 5
+MAX_MINUTES = 12 * 60
+ROUND_MINUTES = 5
+# После ALPHA_COUNT выполнений среднее становится экспоненциальным с ALPHA
+ALPHA = 0.2
+ALPHA_COUNT = int(1 / ALPHA)
+# Сколько выполнений нужно ключу для полного доверия
+FULL_CONFIDENCE = 5
+MAX_TOKENS = 6
+STEM_LENGTH = 5
+
+TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+
+def normalize_tokens(title):
+    """Токены названия: нижний регистр, без коротких слов, с грубым стеммингом
+
+    Усечение до STEM_LENGTH символов сводит формы слова ("отчет",
+    "отчета", "отчетом") к одному ключу без словарей.
+    """
+    tokens = []
+    for word in TOKEN_RE.findall(title.lower().replace("ё", "е")):
+        if len(word) < 3:
+            continue
+        stem = word[:STEM_LENGTH]
+        if stem not in tokens:
+            tokens.append(stem)
+            if len(tokens) == MAX_TOKENS:
+                break
+    return tuple(tokens)
+
+
+def actual_minutes(task):
+    """Фактическая длительность выполненной задачи в минутах
+
+    Считается от начала до отметки о выполнении; если задачу отметили до
+    начала или заметно позже (забыли отметить), берется плановая длительность.
+    """
+    planned = (task.end_ts - task.start_ts) / 60
+    if task.completed_at is None:
+        return planned
+    spent = (time_layer.to_epoch(task.completed_at) - task.start_ts) / 60
+    if spent < MIN_MINUTES or spent > max(planned * 3, planned + 120):
+        return planned
+    return spent
+
+
+class DurationEstimator(CompletionStats):
+    """Инкрементальная оценка длительности по токенам названия и приоритету
+
+    Для каждого ключа (токен, приоритет, общий) хранится [среднее, число]:
+    первые выполнения усредняются, дальше - экспоненциальное среднее,
+    поэтому обновление O(1) и оценка следует за изменением привычек.
+    Число ключей ограничено (вытесняются давно не использованные), ответы
+    кэшируются до следующего обновления. Экспоненциальное среднее нельзя
+    откатить, поэтому снятие отметки о выполнении на оценки не влияет.
+    """
+
+    label = "оценок длительности"
+
+    def __init__(self, path=None, max_keys=4000, max_recorded=5000,
+                 cache_size=512, save_interval=SAVE_INTERVAL):
+        self.max_keys = max_keys
+        self.max_recorded = max_recorded
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        super().__init__(path or state_path(None, STATE_FILE), save_interval)
+
+    def reset(self):
+        self.stats = OrderedDict()
+        self.recorded = OrderedDict()   # ID недавно учтенных задач (без повторного учета)
+        self._cache.clear()
+
+    # --- Сохранение ---
+
+    def from_state(self, state):
+        self.stats = OrderedDict((key, list(value)) for key, value in state["stats"])
+        self.recorded = OrderedDict.fromkeys(state["recorded"])
+
+    def to_state(self):
+        return {"stats": list(self.stats.items()), "recorded": list(self.recorded)}
+
+    # --- Ключи ---
+
+    @staticmethod
+    def keys_for(tokens, priority):
+        keys = ["*"]
+        if priority:
+            keys.append(f"p:{priority}")
+        keys.extend(f"t:{token}" for token in tokens)
+        return keys
+
+    def _update(self, key, minutes):
+        entry = self.stats.get(key)
+        if entry is None:
+            self.stats[key] = [minutes, 1]
+            if len(self.stats) > self.max_keys:
+                self.stats.popitem(last=False)
+            return
+        self.stats.move_to_end(key)
+        mean, count = entry
+        count += 1
+        alpha = 1.0 / count if count <= ALPHA_COUNT else ALPHA
+        entry[0] = mean + alpha * (minutes - mean)
+        entry[1] = count
+
+    # --- Обучение ---
+
+    def record(self, title, priority, minutes, save=True):
+        """Учет фактической длительности (минуты)"""
+        minutes = min(MAX_MINUTES, max(MIN_MINUTES, minutes))
+        for key in self.keys_for(normalize_tokens(title), priority):
+            self._update(key, minutes)
+        self._cache.clear()
+        if save:
+            self.save_later()
+
+    def record_task(self, task, save=True):
+        """Учет выполненной задачи (каждая задача - один раз)"""
+        if task.id in self.recorded:
+            return False
+        self.recorded[task.id] = None
+        if len(self.recorded) > self.max_recorded:
+            self.recorded.popitem(last=False)
+        self.record(task.title, task.priority.value, actual_minutes(task), save)
+        return True
+
+    # --- Оценка ---
+
+    def estimate(self, title, priority=None, default=DEFAULT_MINUTES):
+        """Оценка длительности в минутах (кратно ROUND_MINUTES)
+
+        Оценки токенов взвешиваются по числу наблюдений; если их мало,
+        оценка тянется к среднему по приоритету, затем к общему.
+        """
+        tokens = normalize_tokens(title or "")
+        cache_key = (tokens, priority, default)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        base = default
+        for key in ("*", f"p:{priority}" if priority else None):
+            entry = self.stats.get(key) if key else None
+            if entry:
+                confidence = min(1.0, entry[1] / FULL_CONFIDENCE)
+                base += (entry[0] - base) * confidence
+
+        weighted = total = 0.0
+        for token in tokens:
+            entry = self.stats.get(f"t:{token}")
+            if entry:
+                confidence = min(1.0, entry[1] / FULL_CONFIDENCE)
+                weighted += entry[0] * confidence
+                total += confidence
+        if total:
+            coverage = min(1.0, total)
+            minutes = base + (weighted / total - base) * coverage
+        else:
+            minutes = base
+
+        result = max(MIN_MINUTES, int(round(minutes / ROUND_MINUTES)) * ROUND_MINUTES)
+        self._cache[cache_key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def suggest_end(self, start, title, priority=None):
+        """Предлагаемое окончание для задачи или блока, начинающегося в start"""
+        return start + timedelta(minutes=self.estimate(title, priority))
+
+
+_duration_estimator = None
+
+
+def get_duration_estimator(data_dir=None):
+    """Глобальная оценка в каталоге данных, подписанная на события задач"""
+    global _duration_estimator
+
+    if _duration_estimator is None:
+        _duration_estimator = attach_to_tasks(DurationEstimator(state_path(data_dir, STATE_FILE)))
+    return _duration_estimator
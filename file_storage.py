@@ -0,0 +1,265 @@
+# file_storage.py - Безопасная запись общих файлов данных несколькими процессами
+import os
+import tempfile
+import time
+from contextlib import contextmanager, ExitStack
+
+# Подпись (mtime_ns, size) файлов, записанных этим процессом: наблюдатель их пропускает
+_own_writes = {}
+
+# Windows не блокирует каталоги - там используется один файл блокировки на каталог
+LOCK_NAME = ".timeblock.lock"
+DEFAULT_LOCK_TIMEOUT = 10.0
+
+
+class LockTimeout(OSError):
+    """Не удалось получить блокировку за отведенное время"""
+
+
+def _lock_fd(fd, exclusive, blocking):
+    """Рекомендательная блокировка файла (fcntl на POSIX, msvcrt на Windows)"""
+    if os.name == "nt":
+        import msvcrt
+        # В msvcrt нет разделяемых блокировок - используется исключительная
+        mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, mode, 1)
+    else:
+        import fcntl
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        fcntl.flock(fd, flags)
+
+
+def _unlock_fd(fd):
+    if os.name == "nt":
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _open_lock(path):
+    """Дескриптор для блокировки: каталог файла (POSIX) или общий файл каталога"""
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.name == "nt":
+        return os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    return os.open(directory, os.O_RDONLY)
+
+
+@contextmanager
+def file_lock(path, exclusive=True, timeout=DEFAULT_LOCK_TIMEOUT):
+    """Блокировка файла данных через его каталог
+
+    Блокируется каталог, а не сам файл данных: данные заменяются
+    переименованием, и блокировка на старом inode ничего бы не защищала.
+    Одна блокировка на каталог не оставляет соседних файлов и сериализует
+    запись всех файлов каталога - записи короткие, а вложенных
+    блокировок код не берет (повторная блокировка в том же потоке
+    ждала бы саму себя до таймаута).
+    """
+    fd = _open_lock(path)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _lock_fd(fd, exclusive, blocking=False)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"Файл занят другим процессом: {path}")
+                time.sleep(0.02)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_locks(paths, exclusive=True, timeout=DEFAULT_LOCK_TIMEOUT):
+    """Блокировка нескольких файлов: каждый каталог блокируется один раз
+
+    Файлы одного каталога делят блокировку, и вложенные file_lock на них
+    ждали бы сами себя. Каталоги блокируются в порядке путей - два
+    процесса с одним набором файлов не блокируют друг друга навстречу.
+    """
+    directories = {}
+    for path in paths:
+        directories.setdefault(os.path.dirname(os.path.abspath(path)), path)
+    with ExitStack() as stack:
+        for directory in sorted(directories):
+            stack.enter_context(file_lock(directories[directory], exclusive, timeout))
+        yield
+
+
+def file_signature(path):
+    """(mtime_ns, size) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def atomic_open(path, mode="wb", **kwargs):
+    """Потоковая атомарная запись: временный файл в том же каталоге + os.replace
+
+    Файл заменяется при выходе из блока без ошибок; при ошибке временный
+    файл удаляется, а старое содержимое остается. Вызывать под file_lock,
+    если файл могут одновременно менять другие процессы.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _own_writes[os.path.abspath(path)] = file_signature(path)
+
+
+def atomic_write(path, data):
+    """Атомарная запись данных целиком (см. atomic_open)
+
+    Читатели видят либо старое, либо новое содержимое целиком.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+def read_bytes(path):
+    """Чтение файла целиком (None, если файла нет)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _load_inotify():
+    """Необязательная зависимость inotify_simple (только Linux)"""
+    try:
+        from inotify_simple import INotify, flags
+        return INotify, flags
+    except ImportError:
+        return None, None
+
+
+class DirectoryWatcher:
+    """Наблюдение за файлами каталога, измененными другими процессами
+
+    poll() возвращает список путей, созданных, измененных или удаленных с
+    прошлого вызова; собственные записи процесса (atomic_write) не
+    сообщаются. С inotify_simple опрос читает события ядра без обхода
+    каталога, иначе сравнивает подписи файлов через scandir. poll()
+    не блокирует - приложение вызывает его по таймеру своего потока.
+
+    names - необязательная функция, возвращающая имена файлов, которые
+    сейчас интересны приложению: тогда опрос проверяет только их, а не
+    весь каталог. Файл, впервые попавший в names, запоминается без
+    сообщения об изменении.
+    """
+
+    def __init__(self, directory, accept=None, use_inotify=True, names=None):
+        self.directory = os.path.abspath(directory)
+        self.accept = accept or (lambda name: not name.endswith(".tmp") and name != LOCK_NAME)
+        self.names = names
+        self.watched = set()
+        self.signatures = {}
+        self.inotify = None
+
+        INotify, flags = _load_inotify() if use_inotify else (None, None)
+        if INotify is not None:
+            try:
+                self.inotify = INotify()
+                self.inotify.add_watch(self.directory, flags.CLOSE_WRITE | flags.MOVED_TO |
+                                       flags.DELETE | flags.MOVED_FROM)
+            except OSError as e:
+                print(f"inotify недоступен, используется опрос каталога: {e}")
+                self.inotify = None
+        self.signatures = self._scan()
+
+    def _watched_names(self):
+        return {name for name in self.names() if self.accept(name)}
+
+    def _scan(self):
+        signatures = {}
+        if self.names is not None:
+            self.watched = self._watched_names()
+            for name in self.watched:
+                signature = file_signature(os.path.join(self.directory, name))
+                if signature is not None:
+                    signatures[name] = signature
+            return signatures
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and self.accept(entry.name):
+                        stat = entry.stat()
+                        signatures[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return signatures
+
+    def _candidates(self):
+        """Имена файлов, которые могли измениться"""
+        if self.inotify is not None:
+            names = {event.name for event in self.inotify.read(timeout=0)
+                     if event.name and self.accept(event.name)}
+            if self.names is not None:
+                names &= self._watched_names()
+            return names
+        if self.names is not None:
+            previous = self.watched
+            current = self._scan()
+            # Новые имена (например, после смены дня) - только базовая подпись
+            for name in self.watched - previous:
+                if name in current:
+                    self.signatures[name] = current[name]
+                else:
+                    self.signatures.pop(name, None)
+            for name in previous - self.watched:
+                self.signatures.pop(name, None)
+            return {name for name in self.watched
+                    if self.signatures.get(name) != current.get(name)}
+        current = self._scan()
+        names = {name for name, signature in current.items()
+                 if self.signatures.get(name) != signature}
+        names.update(name for name in self.signatures if name not in current)
+        return names
+
+    def poll(self):
+        """Пути файлов, измененных другими процессами с прошлого вызова"""
+        changed = []
+        for name in sorted(self._candidates()):
+            path = os.path.join(self.directory, name)
+            signature = file_signature(path)
+            if signature == self.signatures.get(name):
+                continue
+            if signature is None:
+                self.signatures.pop(name, None)
+            else:
+                self.signatures[name] = signature
+            if signature is not None and _own_writes.get(path) == signature:
+                continue
+            changed.append(path)
+        return changed
+
+    def close(self):
+        """Освобождение дескриптора inotify"""
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
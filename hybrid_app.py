@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                              QWidget, QPushButton, QLabel, QTextEdit, QTabWidget,
                              QLineEdit, QComboBox, QTimeEdit, QDialog, QFormLayout,
-                             QDialogButtonBox, QMessageBox, QListWidget, QListWidgetItem)
+                             QDialogButtonBox, QMessageBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QTime
 from PyQt5.QtGui import QFont
 
@@ -20,11 +20,17 @@ except ImportError:
     print("PyQtWebEngine не доступен, используется упрощенная версия dashboard")
     QWebEngineView = None
     WEBENGINE_AVAILABLE = False
-import pytz
 
 # Импорты наших модулей
 from localization_system import localization, _
-from task_manager import task_manager, Task, TaskStatus, TaskPriority
+from task_manager import task_manager, Task, TaskStatus, TaskPriority, RecurrenceRule, RecurrenceFrequency
+from task_list_model import TaskListModel, TaskListView
+from search_index import get_search_index
+from work_patterns import get_work_patterns
+from duration_estimator import get_duration_estimator
+from productivity import DayMetrics, score_metrics
+from tracing import traced, tracer
+from time_layer import time_layer
 
 class PerformanceModule:
     """Интерфейс для модуля производительности на C++"""
@@ -54,6 +60,7 @@ class PerformanceModule:
             # Python реализация
             return self._python_calculate_productivity(blocks_data)
     
+    @traced("native.cpp_calculate_productivity", "native")
     def _cpp_calculate_productivity(self, blocks_data):
         """C++ реализация расчета продуктивности"""
         try:
@@ -70,13 +77,9 @@ class PerformanceModule:
             return self._python_calculate_productivity(blocks_data)
     
     def _python_calculate_productivity(self, blocks_data):
-        """Python реализация расчета продуктивности"""
-        if not blocks_data:
-            return 0.0
-        
+        """Python реализация расчета продуктивности (та же формула, что в C++)"""
         total_minutes = sum(block.get('duration', 0) for block in blocks_data)
-        # 8 часов = 100% продуктивности
-        return min(100.0, (total_minutes / 480.0) * 100.0)
+        return float(score_metrics(DayMetrics(len(blocks_data), total_minutes, 0), "planning"))
 
 class RustDataProcessor:
     """Интерфейс для обработки данных на Rust"""
@@ -103,6 +106,7 @@ class RustDataProcessor:
         else:
             return self._python_process_blocks(blocks_data)
     
+    @traced("native.rust_process_blocks", "native")
     def _rust_process_blocks(self, blocks_data):
         """Rust реализация обработки блоков"""
         try:
@@ -519,6 +523,7 @@ class JavaScriptUIComponent(QWidget if not WEBENGINE_AVAILABLE else QWebEngineVi
         
         self.setHtml(html_content)
     
+    @traced("ui.update_dashboard_data", "ui")
     def update_dashboard_data(self):
         """Обновление данных dashboard"""
         if not self.parent_app:
@@ -659,6 +664,12 @@ class TaskDialog(QDialog):
         self.priority_combo.setCurrentIndex(1)  # Medium по умолчанию
         layout.addRow(_("priority") + ":", self.priority_combo)
         
+        # Повторение (только для новой задачи)
+        if not self.is_edit_mode:
+            self.recurrence_combo = QComboBox()
+            self.recurrence_combo.addItems(["Не повторять", "Ежедневно", "По будням", "Еженедельно"])
+            layout.addRow("Повтор:", self.recurrence_combo)
+        
         # Статус (только для редактирования)
         if self.is_edit_mode:
             self.status_combo = QComboBox()
@@ -688,6 +699,15 @@ class TaskDialog(QDialog):
         # Заполняем данные при редактировании
         if self.is_edit_mode and self.task:
             self.fill_task_data()
+        else:
+            # Окончание новой задачи подбирается по истории, пока его не изменили вручную
+            self.end_edited = False
+            self.suggesting = False
+            self.title_edit.textChanged.connect(self.suggest_end_time)
+            self.priority_combo.currentIndexChanged.connect(self.suggest_end_time)
+            self.start_time_edit.timeChanged.connect(self.suggest_end_time)
+            self.end_time_edit.timeChanged.connect(self.on_end_time_edited)
+            self.suggest_end_time()
         
         # Стили
         self.setStyleSheet("""
@@ -730,6 +750,20 @@ class TaskDialog(QDialog):
             }
         """)
     
+    def suggest_end_time(self):
+        """Окончание = начало + оценка длительности по названию и приоритету"""
+        if self.end_edited:
+            return
+        priority = ["low", "medium", "high", "urgent"][self.priority_combo.currentIndex()]
+        minutes = get_duration_estimator().estimate(self.title_edit.text(), priority)
+        self.suggesting = True
+        self.end_time_edit.setTime(self.start_time_edit.time().addSecs(minutes * 60))
+        self.suggesting = False
+    
+    def on_end_time_edited(self):
+        if not self.suggesting:
+            self.end_edited = True
+    
     def fill_task_data(self):
         """Заполнение данных задачи при редактировании"""
         if not self.task:
@@ -788,13 +822,25 @@ class TaskDialog(QDialog):
             status_map = [TaskStatus.PLANNED, TaskStatus.IN_PROGRESS, TaskStatus.COMPLETED, TaskStatus.CANCELLED]
             status = status_map[self.status_combo.currentIndex()]
         
+        # Правило повторения (если создаем)
+        recurrence = None
+        if hasattr(self, 'recurrence_combo'):
+            choice = self.recurrence_combo.currentIndex()
+            if choice == 1:
+                recurrence = RecurrenceRule(RecurrenceFrequency.DAILY)
+            elif choice == 2:
+                recurrence = RecurrenceRule(RecurrenceFrequency.WEEKLY, weekdays=[0, 1, 2, 3, 4])
+            elif choice == 3:
+                recurrence = RecurrenceRule(RecurrenceFrequency.WEEKLY)
+        
         return {
             'title': self.title_edit.text().strip(),
             'description': self.description_edit.toPlainText().strip(),
             'start_time': start_time,
             'end_time': end_time,
             'priority': priority,
-            'status': status
+            'status': status,
+            'recurrence': recurrence
         }
 
 class HybridTimeBlockingApp(QMainWindow):
@@ -810,6 +856,11 @@ class HybridTimeBlockingApp(QMainWindow):
         # Данные приложения
         self.time_blocks = []
         
+        # Поисковый индекс обновляется по событиям task_manager
+        self.search_index = get_search_index()
+        self.work_patterns = get_work_patterns()
+        self.duration_estimator = get_duration_estimator()
+        
         self.init_ui()
         self.setup_timers()
     
@@ -953,36 +1004,29 @@ class HybridTimeBlockingApp(QMainWindow):
         refresh_btn = QPushButton("Обновить")
         refresh_btn.clicked.connect(self.refresh_tasks)
         
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Поиск задач...")
+        self.search_edit.returnPressed.connect(self.search_tasks)
+        
         buttons_layout.addWidget(add_task_btn)
         buttons_layout.addWidget(refresh_btn)
+        buttons_layout.addWidget(self.search_edit)
         buttons_layout.addStretch()
         
         header_layout.addLayout(buttons_layout)
         layout.addLayout(header_layout)
         
         # Список задач
-        self.tasks_list = QListWidget()
+        self.tasks_model = TaskListModel(self.format_task_item, self.is_task_for_today, self)
+        self.tasks_list = TaskListView(_("no_tasks"))
+        self.tasks_list.setModel(self.tasks_model)
         self.tasks_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background: #2D2D2D;
                 border: 2px solid #FF2B43;
                 border-radius: 8px;
                 padding: 10px;
             }
-            QListWidget::item {
-                background: #1E1E1E;
-                border: 1px solid #444;
-                border-radius: 6px;
-                padding: 10px;
-                margin: 5px;
-                color: white;
-            }
-            QListWidget::item:selected {
-                background: #FF2B43;
-            }
-            QListWidget::item:hover {
-                background: #3D3D3D;
-            }
         """)
         
         layout.addWidget(self.tasks_list)
@@ -1065,6 +1109,17 @@ class HybridTimeBlockingApp(QMainWindow):
         test_btn.clicked.connect(self.run_performance_test)
         layout.addWidget(test_btn)
         
+        # Сводка трассировки горячих участков
+        trace_btn = QPushButton("Сводка трассировки")
+        trace_btn.clicked.connect(lambda: self.performance_results.setPlainText(tracer.format_summary()))
+        layout.addWidget(trace_btn)
+        
+        # Паттерны работы по выполненным задачам (обновляются при каждом выполнении)
+        patterns_btn = QPushButton("Паттерны работы")
+        patterns_btn.clicked.connect(
+            lambda: self.performance_results.setPlainText(self.work_patterns.format_summary()))
+        layout.addWidget(patterns_btn)
+        
         widget.setLayout(layout)
         return widget
     
@@ -1090,6 +1145,11 @@ class HybridTimeBlockingApp(QMainWindow):
         self.stats_timer = QTimer()
         self.stats_timer.timeout.connect(self.update_statistics)
         self.stats_timer.start(5000)  # Каждые 5 секунд
+        
+        # Изменения файла задач другими процессами (другой экземпляр, demo_tasks.py)
+        self.sync_timer = QTimer()
+        self.sync_timer.timeout.connect(self.sync_external_changes)
+        self.sync_timer.start(2000)
     
     def add_time_block(self):
         """Добавление временного блока"""
@@ -1187,8 +1247,9 @@ class HybridTimeBlockingApp(QMainWindow):
             if hasattr(self, 'js_dashboard'):
                 self.js_dashboard.update_translations()
             
-            # Обновляем список задач
-            self.refresh_tasks()
+            # Обновляем тексты списка задач
+            self.tasks_list.placeholder = _("no_tasks")
+            self.tasks_model.retranslate()
             
             # Показываем сообщение
             QMessageBox.information(self, _("language"), _("language_changed", localization.get_supported_languages()[selected_code]))
@@ -1209,23 +1270,26 @@ class HybridTimeBlockingApp(QMainWindow):
                 description=task_data['description'],
                 start_time=task_data['start_time'],
                 end_time=task_data['end_time'],
-                priority=task_data['priority']
+                priority=task_data['priority'],
+                recurrence=task_data['recurrence']
             )
             
-            # Обновляем список
-            self.refresh_tasks()
+            # Обновляем только строку новой задачи (для серии - сегодняшнее повторение)
+            if task.recurrence:
+                task = task_manager.get_task_by_id(f"{task.id}:{task.local_date().isoformat()}")
+            if task:
+                self.tasks_model.upsert_task(task)
             
             # Показываем сообщение
             QMessageBox.information(self, _("add_task"), _("task_added"))
     
     def edit_selected_task(self):
         """Редактирование выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.current_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("edit"), "Выберите задачу для редактирования")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.get_task_by_id(task_id)
         
         if not task:
@@ -1241,7 +1305,7 @@ class HybridTimeBlockingApp(QMainWindow):
                 return
             
             # Обновляем задачу
-            task_manager.update_task(
+            task = task_manager.update_task(
                 task_id,
                 title=task_data['title'],
                 description=task_data['description'],
@@ -1251,35 +1315,34 @@ class HybridTimeBlockingApp(QMainWindow):
                 status=task_data['status']
             )
             
-            # Обновляем список
-            self.refresh_tasks()
+            # Обновляем только строку измененной задачи
+            if task:
+                self.tasks_model.upsert_task(task)
             
             QMessageBox.information(self, _("edit"), "Задача обновлена")
     
     def complete_selected_task(self):
         """Завершение выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.current_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("complete"), "Выберите задачу для завершения")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.complete_task(task_id)
         
         if task:
-            self.refresh_tasks()
+            self.tasks_model.upsert_task(task)
             QMessageBox.information(self, _("complete"), _("task_completed"))
         else:
             QMessageBox.warning(self, _("complete"), "Не удалось завершить задачу")
     
     def delete_selected_task(self):
         """Удаление выбранной задачи"""
-        current_item = self.tasks_list.currentItem()
-        if not current_item:
+        task_id = self.tasks_list.current_task_id()
+        if not task_id:
             QMessageBox.warning(self, _("delete"), "Выберите задачу для удаления")
             return
         
-        task_id = current_item.data(Qt.UserRole)
         task = task_manager.get_task_by_id(task_id)
         
         if not task:
@@ -1296,48 +1359,66 @@ class HybridTimeBlockingApp(QMainWindow):
         
         if reply == QMessageBox.Yes:
             if task_manager.delete_task(task_id):
-                self.refresh_tasks()
+                self.tasks_model.remove_task(task_id)
                 QMessageBox.information(self, _("delete"), _("task_deleted"))
             else:
                 QMessageBox.warning(self, _("delete"), "Не удалось удалить задачу")
     
-    def refresh_tasks(self):
-        """Обновление списка задач"""
-        self.tasks_list.clear()
+    def search_tasks(self):
+        """Поиск по всем задачам (включая прошлые дни)"""
+        query = self.search_edit.text().strip()
+        if not query:
+            return
         
-        today_tasks = task_manager.get_tasks_for_today()
+        results = self.search_index.search(query, kind="task", limit=20)
+        if not results:
+            QMessageBox.information(self, "Поиск", f"По запросу «{query}» ничего не найдено")
+            return
         
-        if not today_tasks:
-            item = QListWidgetItem(_("no_tasks"))
-            item.setFlags(item.flags() & ~Qt.ItemIsSelectable)
-            self.tasks_list.addItem(item)
+        lines = []
+        for doc_id, doc, score in results:
+            status_text = self.get_status_text(TaskStatus(doc["status"]))
+            lines.append(f"{doc['date']}  [{status_text}] {doc['title']}")
+        QMessageBox.information(self, "Поиск", "\n".join(lines))
+    
+    def sync_external_changes(self):
+        """Подхват задач, измененных другими процессами (только измененные строки)"""
+        events = task_manager.sync_from_disk()
+        if any(task.recurrence for event, task in events):
+            # Серии разворачиваются в повторения - проще перестроить список
+            self.refresh_tasks()
             return
+        for event, task in events:
+            if event == "deleted":
+                self.tasks_model.remove_task(task.id)
+            else:
+                self.tasks_model.upsert_task(task)
+    
+    @traced("ui.refresh_tasks", "ui")
+    def refresh_tasks(self):
+        """Полная перезагрузка списка задач с сохранением выделения"""
+        selected_id = self.tasks_list.current_task_id()
+        self.tasks_model.reset_tasks(task_manager.get_tasks_for_today())
+        if selected_id:
+            self.tasks_list.select_task(selected_id)
+    
+    def is_task_for_today(self, task: Task) -> bool:
+        """Попадает ли задача в список на сегодня"""
+        return task.local_date() == time_layer.today()
+    
+    def format_task_item(self, task: Task):
+        """Текст и цвет строки задачи (вызывается моделью при отрисовке)"""
+        status_text = self.get_status_text(task.status)
+        priority_text = self.get_priority_text(task.priority)
+        time_text = f"{task.start_time.strftime('%H:%M')} - {task.end_time.strftime('%H:%M')}"
         
-        # Сортируем задачи по времени начала
-        today_tasks.sort(key=lambda t: t.start_time)
+        item_text = f"[{status_text}] {task.title}\n"
+        item_text += f"⏰ {time_text} | 🎯 {priority_text}"
         
-        for task in today_tasks:
-            # Формируем текст элемента
-            status_text = self.get_status_text(task.status)
-            priority_text = self.get_priority_text(task.priority)
-            time_text = f"{task.start_time.strftime('%H:%M')} - {task.end_time.strftime('%H:%M')}"
-            
-            # Определяем цвет статуса
-            status_color = self.get_status_color(task.status)
-            
-            item_text = f"[{status_text}] {task.title}\n"
-            item_text += f"⏰ {time_text} | 🎯 {priority_text}\n"
-            
-            if task.description:
-                item_text += f"📝 {task.description[:50]}{'...' if len(task.description) > 50 else ''}"
-            
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, task.id)
-            
-            # Устанавливаем цвет в зависимости от статуса
-            item.setBackground(status_color)
-            
-            self.tasks_list.addItem(item)
+        if task.description:
+            item_text += f"\n📝 {task.description[:50]}{'...' if len(task.description) > 50 else ''}"
+        
+        return item_text, self.get_status_color(task.status)
     
     def get_status_text(self, status: TaskStatus) -> str:
         """Получение текста статуса на текущем языке"""
@@ -0,0 +1,579 @@
+# ical_sync.py - Потоковый импорт/экспорт iCalendar с инкрементальной синхронизацией
+import hashlib
+import itertools
+import json
+import os
+from contextlib import ExitStack
+from datetime import datetime, date, time, timedelta
+
+import pytz
+
+from file_storage import atomic_open, atomic_write, file_locks, file_signature, read_bytes
+from time_layer import time_layer
+
+PRODID = "-//PremiumSoft//TimeBlockingPlanner//RU"
+UID_DOMAIN = "timeblocking"
+STATE_VERSION = 1
+SYNC_DIR_NAME = "calendar"
+DEFAULT_CALENDAR_NAME = "timeblocking.ics"
+# Дни читаются для экспорта пачками, а не все сразу
+EXPORT_BATCH_DAYS = 64
+# Максимальная длина строки iCalendar в октетах (RFC 5545, 3.1)
+MAX_LINE_OCTETS = 75
+
+# STATUS у VEVENT ограничен тремя значениями - точный статус задачи
+# передается в X-TIMEBLOCK-STATUS
+TASK_STATUS_TO_ICS = {"planned": "TENTATIVE", "in_progress": "CONFIRMED",
+                      "completed": "CONFIRMED", "cancelled": "CANCELLED"}
+ICS_STATUS_TO_TASK = {"TENTATIVE": "planned", "CONFIRMED": "in_progress"}
+TASK_PRIORITY_TO_ICS = {"urgent": 1, "high": 3, "medium": 5, "low": 9}
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+# --- Форматирование ---
+
+def escape_text(value):
+    """Экранирование TEXT-значения"""
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def unescape_text(value):
+    """Обратное экранирование TEXT-значения"""
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            result.append("\n" if char in ("n", "N") else char)
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def fold_line(line):
+    """Перенос строки длиннее 75 октетов (без разрыва символов UTF-8)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    limit = MAX_LINE_OCTETS
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = MAX_LINE_OCTETS - 1  # продолжение начинается с пробела
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def format_utc(moment):
+    """Момент (datetime или epoch) -> 20250101T090000Z"""
+    epoch = time_layer.to_epoch(moment)
+    return (datetime(1970, 1, 1) + timedelta(seconds=epoch)).strftime("%Y%m%dT%H%M%SZ")
+
+
+def parse_ics_datetime(value, params):
+    """DTSTART/DTEND -> наивное местное время зоны пользователя"""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.combine(datetime.strptime(value[:8], "%Y%m%d").date(), time())
+    moment = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        epoch = time_layer.to_epoch(pytz.utc.localize(moment))
+        return time_layer.to_naive_local(epoch)
+    if "TZID" in params:
+        try:
+            zone = pytz.timezone(params["TZID"])
+        except pytz.UnknownTimeZoneError:
+            return moment
+        return time_layer.to_naive_local(time_layer.to_epoch(zone.localize(moment)))
+    return moment  # "плавающее" время - как есть
+
+
+# --- События ---
+
+def task_uid(task_id):
+    return f"task-{task_id}@{UID_DOMAIN}"
+
+
+def block_uid(block_id):
+    return f"block-{block_id}@{UID_DOMAIN}"
+
+
+def parse_uid(uid):
+    """('task'|'block', id) для своих UID или (None, uid) для чужих"""
+    local, _, domain = uid.rpartition("@")
+    if domain == UID_DOMAIN:
+        kind, _, item_id = local.partition("-")
+        if kind in ("task", "block") and item_id:
+            return kind, item_id
+    return None, uid
+
+
+def recurrence_lines(rule):
+    """RRULE и EXDATE для правила повторения"""
+    parts = [f"FREQ={rule.frequency.value.upper()}", f"INTERVAL={max(1, rule.interval)}"]
+    if rule.weekdays:
+        parts.append("BYDAY=" + ",".join(WEEKDAY_CODES[day] for day in sorted(rule.weekdays)))
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    elif rule.until is not None:
+        parts.append(f"UNTIL={rule.until.strftime('%Y%m%d')}")
+    lines = ["RRULE:" + ";".join(parts)]
+    if rule.exceptions:
+        lines.append("EXDATE;VALUE=DATE:" + ",".join(day.replace("-", "") for day in rule.exceptions))
+    return lines
+
+
+def parse_recurrence(props):
+    """RRULE/EXDATE -> RecurrenceRule (None для правил, которые планировщик не поддерживает)"""
+    from task_manager import RecurrenceFrequency, RecurrenceRule
+
+    if "RRULE" not in props:
+        return None
+    parts = dict(part.partition("=")[::2] for part in props["RRULE"][1].split(";"))
+    frequency = parts.get("FREQ", "").lower()
+    if frequency not in ("daily", "weekly"):
+        return None
+    weekdays = [WEEKDAY_CODES.index(code[-2:]) for code in parts.get("BYDAY", "").split(",")
+                if code[-2:] in WEEKDAY_CODES]
+    until = parts.get("UNTIL")
+    exdates = props.get("EXDATE", ({}, ""))[1]
+    return RecurrenceRule(
+        frequency=RecurrenceFrequency(frequency),
+        interval=int(parts.get("INTERVAL", 1)),
+        weekdays=weekdays,
+        until=datetime.strptime(until[:8], "%Y%m%d").date() if until else None,
+        count=int(parts["COUNT"]) if "COUNT" in parts else None,
+        exceptions=[f"{value[:4]}-{value[4:6]}-{value[6:8]}" for value in exdates.split(",") if value]
+    )
+
+
+def task_event(task, uid=None):
+    """Строки свойств VEVENT задачи (без DTSTAMP)"""
+    lines = [
+        f"UID:{uid or task_uid(task.id)}",
+        f"DTSTART:{format_utc(task.start_ts)}",
+        f"DTEND:{format_utc(task.end_ts)}",
+        f"SUMMARY:{escape_text(task.title)}",
+        f"STATUS:{TASK_STATUS_TO_ICS.get(task.status.value, 'CONFIRMED')}",
+        f"X-TIMEBLOCK-STATUS:{task.status.value}",
+        f"PRIORITY:{TASK_PRIORITY_TO_ICS.get(task.priority.value, 0)}",
+        f"LAST-MODIFIED:{format_utc(task.updated_at)}",
+        "CATEGORIES:TASK"
+    ]
+    if task.description:
+        lines.append(f"DESCRIPTION:{escape_text(task.description)}")
+    if task.recurrence:
+        lines.extend(recurrence_lines(task.recurrence))
+    return lines
+
+
+def block_event(block):
+    """Строки свойств VEVENT блока (без DTSTAMP)"""
+    start = datetime.fromisoformat(block["start_time"])
+    end = datetime.fromisoformat(block["end_time"])
+    lines = [
+        f"UID:{block_uid(block['id'])}",
+        f"DTSTART:{format_utc(start)}",
+        f"DTEND:{format_utc(end)}",
+        f"SUMMARY:{escape_text(block.get('title', ''))}",
+        "CATEGORIES:TIME-BLOCK",
+        f"X-TIMEBLOCK-COLOR:{block.get('color', '')}"
+    ]
+    if not block.get("notify", True):
+        lines.append("X-TIMEBLOCK-NOTIFY:FALSE")
+    return lines
+
+
+def cancelled_event(uid, sequence):
+    """Отмена удаленного события"""
+    return [f"UID:{uid}", "STATUS:CANCELLED", f"SEQUENCE:{sequence}"]
+
+
+def event_hash(lines):
+    """Отпечаток содержимого события (служебные DTSTAMP, SEQUENCE и LAST-MODIFIED не входят)"""
+    content = "\n".join(sorted(line for line in lines
+                               if not line.startswith(("DTSTAMP", "SEQUENCE", "LAST-MODIFIED"))))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class CalendarWriter:
+    """Потоковая запись VCALENDAR: заголовок сразу, события по одному, close() - конец
+
+    Позволяет писать несколько календарей за один проход по событиям.
+    """
+
+    def __init__(self, stream, sync_token=None):
+        self.stream = stream
+        self.stamp = format_utc(time_layer.now())
+        self.count = 0
+        stream.write(fold_line("BEGIN:VCALENDAR"))
+        stream.write(fold_line("VERSION:2.0"))
+        stream.write(fold_line(f"PRODID:{PRODID}"))
+        stream.write(fold_line("METHOD:PUBLISH"))
+        if sync_token is not None:
+            stream.write(fold_line(f"X-TIMEBLOCK-SYNC-TOKEN:{sync_token}"))
+
+    def write_event(self, lines):
+        self.stream.write("BEGIN:VEVENT\r\n")
+        self.stream.write(fold_line(f"DTSTAMP:{self.stamp}"))
+        for line in lines:
+            self.stream.write(fold_line(line))
+        self.stream.write("END:VEVENT\r\n")
+        self.count += 1
+
+    def close(self):
+        self.stream.write("END:VCALENDAR\r\n")
+
+
+def write_calendar(stream, events, sync_token=None):
+    """Потоковая запись VCALENDAR: events - итератор списков строк свойств
+
+    События пишутся по одному - документ целиком в памяти не собирается.
+    Возвращает число записанных событий.
+    """
+    writer = CalendarWriter(stream, sync_token)
+    for lines in events:
+        writer.write_event(lines)
+    writer.close()
+    return writer.count
+
+
+def iter_unfolded(stream):
+    """Логические строки файла (с объединением переносов)"""
+    current = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_property(line):
+    """'NAME;P=V:value' -> (NAME, {P: V}, value)"""
+    head, _, value = line.partition(":")
+    name, *params = head.split(";")
+    return name.upper(), dict(param.partition("=")[::2] for param in params), value
+
+
+def iter_events(stream):
+    """Потоковый разбор: по одному VEVENT как (строки, {имя: (параметры, значение)})"""
+    lines = None
+    for line in iter_unfolded(stream):
+        if line == "BEGIN:VEVENT":
+            lines = []
+        elif line == "END:VEVENT":
+            if lines is not None:
+                props = {}
+                for item in lines:
+                    name, params, value = parse_property(item)
+                    if name == "EXDATE" and name in props:
+                        # Исключения могут идти несколькими строками
+                        value = props[name][1] + "," + value
+                        props[name] = (params, value)
+                    props.setdefault(name, (params, value))
+                yield lines, props
+            lines = None
+        elif lines is not None and not line.startswith("BEGIN:VALARM") and line:
+            lines.append(line)
+
+
+class CalendarSync:
+    """Синхронизация задач и блоков с локальным файлом .ics
+
+    Состояние (calendar/sync_state.json) хранит номер синхронизации,
+    отпечатки отправленных событий и контрольные суммы дней из манифеста.
+    Экспорт всегда пишет в файл весь календарь; по отпечаткам определяется
+    лишь, какие события изменились (SEQUENCE и необязательный файл
+    изменений), а по контрольным суммам - нужно ли вообще перезаписывать
+    файл. Импорт идет потоком и обновляет записи по UID, пропуская
+    события, отпечаток которых уже известен.
+    """
+
+    def __init__(self, data_manager, task_manager):
+        self.data_manager = data_manager
+        self.task_manager = task_manager
+        self.sync_dir = os.path.join(data_manager.data_dir, SYNC_DIR_NAME)
+        self.state_path = os.path.join(self.sync_dir, "sync_state.json")
+        self.state = self.load_state()
+
+    @property
+    def default_path(self):
+        return os.path.join(self.sync_dir, DEFAULT_CALENDAR_NAME)
+
+    # --- Состояние ---
+
+    def load_state(self):
+        raw = read_bytes(self.state_path)
+        if raw:
+            try:
+                state = json.loads(raw.decode("utf-8"))
+                if state.get("version") == STATE_VERSION:
+                    return state
+            except ValueError as e:
+                print(f"Ошибка чтения состояния синхронизации: {e}")
+        return {"version": STATE_VERSION, "token": 0, "events": {}, "sequences": {},
+                "days": {}, "links": {}, "imported": {}}
+
+    def save_state(self):
+        os.makedirs(self.sync_dir, exist_ok=True)
+        atomic_write(self.state_path, json.dumps(self.state, ensure_ascii=False))
+
+    # --- Экспорт ---
+
+    def _task_events(self):
+        """(uid, строки) событий всех задач"""
+        # Задачи, созданные импортом, экспортируются под исходным UID
+        linked = {task_id: uid for uid, task_id in self.state["links"].items()}
+        events = []
+        for task in self.task_manager.snapshot():
+            uid = linked.get(task.id, task_uid(task.id))
+            events.append((uid, task_event(task, uid)))
+        return events
+
+    def _day_checksums(self):
+        """{ISO-дата: контрольная сумма} всех дней из манифеста (файлы не читаются)"""
+        checksums = {}
+        for day, entry in self.data_manager.refresh_manifest().entries_in_range(date.min, date.max):
+            checksums[day.isoformat()] = entry.get("checksum") or json.dumps(entry, sort_keys=True)
+        return checksums
+
+    def _block_events(self, day_checksums):
+        """(uid, строки) событий блоков всех дней; дни читаются пачками
+
+        Попутно обновляет в состоянии контрольные суммы и UID блоков дней.
+        """
+        days = sorted(date.fromisoformat(key) for key in day_checksums)
+        for offset in range(0, len(days), EXPORT_BATCH_DAYS):
+            for day, raw, blocks, summary in self.data_manager.load_days(
+                    days[offset:offset + EXPORT_BATCH_DAYS]):
+                key = day.isoformat()
+                blocks = [block for block in blocks if "id" in block]
+                self.state["days"][key] = {"checksum": day_checksums[key],
+                                           "uids": [block_uid(block["id"]) for block in blocks]}
+                for block in blocks:
+                    yield block_uid(block["id"]), block_event(block)
+
+    def is_up_to_date(self, path, task_events, day_checksums):
+        """Файл совпадает с последним экспортом, а задачи и дни с тех пор не менялись"""
+        signature = file_signature(path)
+        if signature is None or list(signature) != self.state.get("exported_signature"):
+            return False
+        known = self.state["events"]
+        task_uids = set()
+        for uid, lines in task_events:
+            task_uids.add(uid)
+            if known.get(uid) != event_hash(lines):
+                return False
+        # Удаленные задачи: известный UID задачи, которой больше нет
+        if any(parse_uid(uid)[0] != "block" and uid not in task_uids for uid in known):
+            return False
+        days = self.state["days"]
+        return days.keys() == day_checksums.keys() and \
+            all(days[key].get("checksum") == checksum for key, checksum in day_checksums.items())
+
+    def export_changes(self, path=None, full=False, delta_path=None):
+        """Экспорт календаря; возвращает (число изменившихся событий, номер синхронизации)
+
+        Файл path всегда содержит весь календарь. Отпечатки из состояния
+        определяют только, какие события изменились: у них растет SEQUENCE,
+        и они (вместе с отменами удаленных) пишутся в delta_path, если он
+        указан. Если с прошлого экспорта не изменились ни задачи, ни дни,
+        ни сам файл, файл не перезаписывается. full - считать измененными
+        все события.
+        """
+        path = path or self.default_path
+        task_events = self._task_events()
+        day_checksums = self._day_checksums()
+        if not full and self.is_up_to_date(path, task_events, day_checksums):
+            return 0, self.state["token"]
+
+        known = self.state["events"]
+        sequences = self.state["sequences"]
+        current = set()
+        self.state["token"] += 1
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        changed = 0
+
+        def full_calendar(delta):
+            nonlocal changed
+            for uid, lines in itertools.chain(task_events, self._block_events(day_checksums)):
+                current.add(uid)
+                digest = event_hash(lines)
+                if full or known.get(uid) != digest:
+                    if uid in known:
+                        sequences[uid] = sequences.get(uid, 0) + 1
+                    known[uid] = digest
+                    changed += 1
+                    event = lines + [f"SEQUENCE:{sequences.get(uid, 0)}"]
+                    if delta:
+                        delta.write_event(event)
+                    yield event
+                else:
+                    yield lines + [f"SEQUENCE:{sequences.get(uid, 0)}"]
+
+        # Календарь и дельта заменяются под блокировкой своих каталогов;
+        # изменения пишутся в дельту тем же проходом - в памяти не копятся
+        with file_locks([path, delta_path] if delta_path else [path]), ExitStack() as stack:
+            delta = None
+            if delta_path:
+                delta_file = stack.enter_context(atomic_open(delta_path, "w", encoding="utf-8", newline=""))
+                delta = CalendarWriter(delta_file, self.state["token"])
+            with atomic_open(path, "w", encoding="utf-8", newline="") as f:
+                write_calendar(f, full_calendar(delta), self.state["token"])
+
+            # Удаленные события в полном календаре просто отсутствуют, в дельте - отменяются
+            for uid in sorted(set(known) - current):
+                del known[uid]
+                self.state["links"].pop(uid, None)
+                changed += 1
+                if delta:
+                    delta.write_event(cancelled_event(uid, sequences.pop(uid, 0) + 1))
+                else:
+                    sequences.pop(uid, None)
+            if delta:
+                delta.close()
+        for key in [key for key in self.state["days"] if key not in day_checksums]:
+            del self.state["days"][key]
+
+        self.state["exported_signature"] = list(file_signature(path))
+        self.save_state()
+        return changed, self.state["token"]
+
+    # --- Импорт ---
+
+    def import_file(self, path=None):
+        """Импорт событий с обновлением по UID; возвращает число примененных"""
+        path = path or self.default_path
+        signature = file_signature(path)
+        if signature is None:
+            return 0
+        # Файл не менялся с нашего последнего экспорта/импорта
+        if list(signature) in (self.state.get("exported_signature"), self.state.get("imported_signature")):
+            return 0
+
+        applied = 0
+        day_updates = {}
+        # Файл задач пишется один раз на весь импорт
+        with open(path, "r", encoding="utf-8", newline="") as f, self.task_manager.batch():
+            for lines, props in iter_events(f):
+                uid = props.get("UID", ({}, ""))[1]
+                if not uid:
+                    continue
+                digest = event_hash(lines)
+                if self.state["imported"].get(uid) == digest or self.state["events"].get(uid) == digest:
+                    continue
+                try:
+                    if self._apply_event(uid, props, digest, day_updates):
+                        applied += 1
+                    self.state["imported"][uid] = digest
+                except (ValueError, KeyError) as e:
+                    print(f"Ошибка импорта события {uid}: {e}")
+
+        for day, changes in day_updates.items():
+            self._apply_day(day, changes)
+
+        self.state["imported_signature"] = list(signature)
+        self.save_state()
+        return applied
+
+    def _apply_event(self, uid, props, digest, day_updates):
+        """Применение события к задачам или блокам
+
+        Принятое событие запоминается как отправленное с тем же отпечатком,
+        чтобы следующий экспорт не вернул его обратно без изменений.
+        """
+        events = self.state["events"]
+        from task_manager import TaskPriority, TaskStatus
+
+        kind, item_id = parse_uid(uid)
+        exact_status = props.get("X-TIMEBLOCK-STATUS", ({}, ""))[1]
+        # Отмененная задача планировщика остается задачей, чужое отмененное событие удаляется
+        cancelled = (props.get("STATUS", ({}, ""))[1].upper() == "CANCELLED"
+                     and exact_status != "cancelled")
+
+        if kind == "block":
+            if cancelled:
+                events.pop(uid, None)
+                # День блока неизвестен без поиска - берем из состояния экспорта
+                for key, info in self.state["days"].items():
+                    if uid in info.get("uids", []):
+                        day_updates.setdefault(date.fromisoformat(key), {})[item_id] = None
+                        return True
+                return False
+            start = parse_ics_datetime(props["DTSTART"][1], props["DTSTART"][0])
+            end = parse_ics_datetime(props["DTEND"][1], props["DTEND"][0]) if "DTEND" in props \
+                else start + timedelta(hours=1)
+            block = {
+                "id": item_id,
+                "title": unescape_text(props.get("SUMMARY", ({}, ""))[1]),
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+                "color": props.get("X-TIMEBLOCK-COLOR", ({}, ""))[1] or "#FF2B43",
+                "notify": props.get("X-TIMEBLOCK-NOTIFY", ({}, "TRUE"))[1].upper() != "FALSE"
+            }
+            day_updates.setdefault(start.date(), {})[item_id] = block
+            events[uid] = digest
+            return True
+
+        task_id = self.state["links"].get(uid) or (item_id if kind == "task" else None)
+        task = self.task_manager.get_task_by_id(task_id) if task_id else None
+        if cancelled:
+            events.pop(uid, None)
+            self.state["links"].pop(uid, None)
+            return bool(task) and self.task_manager.delete_task(task.id)
+
+        start = parse_ics_datetime(props["DTSTART"][1], props["DTSTART"][0])
+        end = parse_ics_datetime(props["DTEND"][1], props["DTEND"][0]) if "DTEND" in props \
+            else start + timedelta(hours=1)
+        fields = {
+            "title": unescape_text(props.get("SUMMARY", ({}, ""))[1]),
+            "description": unescape_text(props.get("DESCRIPTION", ({}, ""))[1]),
+            "start_time": start,
+            "end_time": end
+        }
+        priority = props.get("PRIORITY", ({}, ""))[1]
+        if priority.isdigit() and int(priority):
+            value = int(priority)
+            fields["priority"] = (TaskPriority.URGENT if value <= 2 else TaskPriority.HIGH if value <= 4
+                                  else TaskPriority.MEDIUM if value <= 6 else TaskPriority.LOW)
+
+        status = exact_status or ICS_STATUS_TO_TASK.get(props.get("STATUS", ({}, ""))[1].upper())
+        if status:
+            fields["status"] = TaskStatus(status)
+        fields["recurrence"] = parse_recurrence(props)
+        if task is None:
+            task = self.task_manager.create_task(**fields)
+            self.state["links"][uid] = task.id
+        else:
+            self.task_manager.update_task(task.id, **fields)
+        events[uid] = digest
+        return True
+
+    def _apply_day(self, day, changes):
+        """Слияние импортированных блоков с днем (по ID блока)"""
+        blocks = list(self.data_manager.load_day(day) or [])
+        positions = {block.get("id"): index for index, block in enumerate(blocks)}
+        for block_id, block in changes.items():
+            index = positions.get(block_id)
+            if block is None:
+                if index is not None:
+                    blocks[index] = None
+            elif index is None:
+                blocks.append(block)
+            else:
+                blocks[index] = dict(blocks[index], **block)
+        self.data_manager.write_day_data([block for block in blocks if block is not None], day)
+
+    def sync(self, path=None):
+        """Импорт изменений из файла, затем экспорт своих изменений в него"""
+        imported = self.import_file(path)
+        exported, token = self.export_changes(path)
+        return imported, exported, token
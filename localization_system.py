@@ -3,7 +3,7 @@ import json
 import os
 from typing import Dict, Any
 from datetime import datetime
-import pytz
+from time_layer import time_layer
 
 class LocalizationManager:
     """Менеджер локализации для многоязычного интерфейса"""
@@ -16,9 +16,6 @@ class LocalizationManager:
             "de": "Deutsch"
         }
         self.translations = self.load_translations()
-        
-        # Московская временная зона
-        self.moscow_tz = pytz.timezone('Europe/Moscow')
     
     def load_translations(self) -> Dict[str, Dict[str, str]]:
         """Загрузка переводов для всех языков"""
@@ -247,8 +244,8 @@ class LocalizationManager:
         return False
     
     def get_moscow_time(self) -> datetime:
-        """Получение московского времени"""
-        return datetime.now(self.moscow_tz)
+        """Текущее время в часовом поясе пользователя (по умолчанию - московское)"""
+        return time_layer.now_local()
     
     def format_moscow_time(self, format_str: str = "%H:%M:%S") -> str:
         """Форматирование московского времени"""
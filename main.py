@@ -7,19 +7,26 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
                              QWidget, QPushButton, QLabel, QScrollArea, QMessageBox,
                              QInputDialog, QMenuBar, QAction, QFileDialog, QDialog,
                              QSplitter, QSizePolicy, QFrame, QStackedWidget, QTabWidget,
-                             QGraphicsDropShadowEffect, QSystemTrayIcon, QMenu, QStatusBar)
+                             QGraphicsDropShadowEffect, QSystemTrayIcon, QMenu, QStatusBar,
+                             QComboBox)
 from PyQt5.QtCore import Qt, QTimer, QPoint, QPropertyAnimation, QEasingCurve, QSize, QTimer
 from PyQt5.QtGui import QIcon, QPainter, QPalette, QLinearGradient, QFont, QFontDatabase, QColor
 
 from styles import PremiumTheme
 from animations import (FadeAnimation, SlideAnimation, NotificationAnimator, 
                         BouncyAnimation, PulseAnimation, SlideStackedAnimation)
-from modern_widgets import PremiumButton, GlassFrame, GradientLabel, StatisticsCard, NavigationBar
+from modern_widgets import (PremiumButton, GlassFrame, GradientLabel, StatisticsCard, NavigationBar,
+                            TrendChartWidget)
 from time_block import PremiumTimeBlock
 from time_scale import PremiumTimeScale
 from data_manager import PremiumDataManager
 from notification_manager import PremiumNotificationManager
 from settings import SettingsDialog, get_settings
+from search_index import get_search_index
+from tracing import traced, tracer
+from time_layer import time_layer
+from command_log import CommandLog
+from productivity import productivity_scorer, score_metrics, metrics_from_blocks, DAY_FORMULA
 
 class SplashScreen(QDialog):
     """Экран загрузки приложения"""
@@ -139,12 +146,20 @@ class MainWindow(QMainWindow):
         
         # Инициализация компонентов
         self.time_blocks = []
-        self.current_date = datetime.now().date()
         self.settings_manager = get_settings()
+        time_layer.set_zone(self.settings_manager.get("behavior/timezone"))
+        self.current_date = time_layer.today()
         
         # Менеджеры
-        self.data_manager = PremiumDataManager()
+        self.data_manager = PremiumDataManager(
+            storage_format=self.settings_manager.get("behavior/storage_format"),
+            notifier=self.show_data_message
+        )
         self.notification_manager = PremiumNotificationManager(self)
+        self.search_index = get_search_index(self.data_manager)
+        self.command_log = CommandLog()
+        self.command_log.add_listener(self.update_undo_actions)
+        self.command_log.add_listener(self.sync_notifications)
         
         # Загрузка настроек
         self.load_settings()
@@ -434,14 +449,56 @@ class MainWindow(QMainWindow):
         title.setAlignment(Qt.AlignCenter)
         layout.addWidget(title)
         
-        # Здесь будет расширенная статистика
-        stats_info = QLabel("Расширенная статистика будет доступна в следующем обновлении")
-        stats_info.setStyleSheet("font-size: 16px; color: #CCCCCC;")
-        stats_info.setAlignment(Qt.AlignCenter)
-        layout.addWidget(stats_info)
+        # Период и шаг графиков
+        controls = QHBoxLayout()
+        self.stats_range_combo = QComboBox()
+        for text, days in (("30 дней", 30), ("90 дней", 90), ("Год", 365), ("Вся история", None)):
+            self.stats_range_combo.addItem(text, days)
+        self.stats_bucket_combo = QComboBox()
+        for text, bucket in (("Авто", None), ("По дням", "day"), ("По неделям", "week"), ("По месяцам", "month")):
+            self.stats_bucket_combo.addItem(text, bucket)
+        controls.addWidget(QLabel("Период:"))
+        controls.addWidget(self.stats_range_combo)
+        controls.addWidget(QLabel("Шаг:"))
+        controls.addWidget(self.stats_bucket_combo)
+        controls.addStretch()
+        layout.addLayout(controls)
+        
+        self.productivity_chart = TrendChartWidget("Продуктивность", "%", max_value=100)
+        self.hours_chart = TrendChartWidget("Часы работы", "ч")
+        layout.addWidget(self.productivity_chart)
+        layout.addWidget(self.hours_chart)
+        
+        self.stats_summary_label = QLabel()
+        self.stats_summary_label.setStyleSheet("font-size: 14px; color: #CCCCCC;")
+        layout.addWidget(self.stats_summary_label)
+        
+        self.stats_range_combo.currentIndexChanged.connect(self.refresh_trend_charts)
+        self.stats_bucket_combo.currentIndexChanged.connect(self.refresh_trend_charts)
         
         return tab_widget
     
+    def refresh_trend_charts(self):
+        """Обновление графиков статистики (по манифесту дней)"""
+        end = time_layer.today()
+        days = self.stats_range_combo.currentData()
+        start = end - timedelta(days=days - 1) if days else dt.date.min
+        statistics = self.data_manager.get_statistics(start, end)
+        
+        # Для "всей истории" график начинается с первого дня с данными
+        chart_start = start if days else None
+        bucket = self.stats_bucket_combo.currentData()
+        for chart, key in ((self.productivity_chart, "productivity_series"),
+                           (self.hours_chart, "hours_series")):
+            chart.set_points(statistics[key], chart_start, end)
+            chart.set_bucket(bucket)
+        
+        self.stats_summary_label.setText(
+            f"Дней с блоками: {statistics['total_days']} | "
+            f"Часов: {statistics['total_hours']:.1f} | "
+            f"В среднем за день: {statistics['average_hours_per_day']:.1f} ч"
+        )
+    
     def create_settings_tab(self):
         """Создание вкладки настроек"""
         tab_widget = QWidget()
@@ -490,8 +547,13 @@ class MainWindow(QMainWindow):
         
         # Меню Правка
         edit_menu = menubar.addMenu("✏️ Правка")
+        self.undo_action = edit_menu.addAction("↩️ Отменить", self.undo, "Ctrl+Z")
+        self.redo_action = edit_menu.addAction("↪️ Повторить", self.redo, "Ctrl+Y")
+        self.update_undo_actions()
+        edit_menu.addSeparator()
         edit_menu.addAction("➕ Добавить блок", self.add_time_block_dialog, "Insert")
         edit_menu.addAction("🎯 Автопланирование", self.auto_schedule)
+        edit_menu.addAction("🔍 Поиск", self.show_search, "Ctrl+F")
         edit_menu.addSeparator()
         edit_menu.addAction("🧹 Очистить день", self.clear_day)
         
@@ -509,6 +571,15 @@ class MainWindow(QMainWindow):
         tool_menu.addAction("🔔 Уведомления", self.toggle_notifications)
         tool_menu.addAction("⚙️ Настройки", self.show_settings)
         
+        trace_menu = tool_menu.addMenu("⏱️ Трассировка")
+        trace_action = trace_menu.addAction("Включить трассировку")
+        trace_action.setCheckable(True)
+        trace_action.setChecked(tracer.enabled)
+        trace_action.toggled.connect(tracer.set_enabled)
+        trace_menu.addAction("📈 Сводка (p50/p95/p99)", self.show_trace_summary)
+        trace_menu.addAction("💾 Экспорт (Chrome trace)", self.export_trace)
+        trace_menu.addAction("🔔 Доставка уведомлений", self.show_notification_stats)
+        
         # Меню Помощь
         help_menu = menubar.addMenu("❓ Помощь")
         help_menu.addAction("📖 О программе", self.show_about)
@@ -552,6 +623,9 @@ class MainWindow(QMainWindow):
         # Определяем направление анимации
         direction = "left" if index > current_index else "right"
         
+        if self.stacked_widget.widget(index) is self.stats_tab:
+            self.refresh_trend_charts()
+        
         # Используем новую анимацию скольжения
         self.slide_stacked_animation.slide_to_widget(index, direction)
         
@@ -567,7 +641,7 @@ class MainWindow(QMainWindow):
             start_minutes = 8 * 60 + (y_pos // 2)
             duration = 60  # 1 час по умолчанию
             
-            start_time = datetime.now().replace(hour=0, minute=0) + timedelta(minutes=start_minutes)
+            start_time = datetime.combine(self.current_date, time()) + timedelta(minutes=start_minutes)
             end_time = start_time + timedelta(minutes=duration)
             
             self.add_time_block(start_time, end_time)
@@ -587,13 +661,35 @@ class MainWindow(QMainWindow):
         layout.addRow("Название:", title_edit)
         
         start_time_edit = QTimeEdit()
-        start_time_edit.setTime(datetime.now().time())
+        start_time_edit.setTime(time_layer.now_naive().time())
         layout.addRow("Время начала:", start_time_edit)
         
         end_time_edit = QTimeEdit()
-        end_time_edit.setTime((datetime.now() + timedelta(hours=1)).time())
+        end_time_edit.setTime((time_layer.now_naive() + timedelta(hours=1)).time())
         layout.addRow("Время окончания:", end_time_edit)
         
+        # Длительность по истории похожих задач, пока окончание не изменили вручную
+        from duration_estimator import get_duration_estimator
+        estimator = get_duration_estimator(self.data_manager.data_dir)
+        suggestion = {"edited": False, "active": False}
+        
+        def suggest_end_time():
+            if suggestion["edited"]:
+                return
+            minutes = estimator.estimate(title_edit.text())
+            suggestion["active"] = True
+            end_time_edit.setTime(start_time_edit.time().addSecs(minutes * 60))
+            suggestion["active"] = False
+        
+        def on_end_time_edited():
+            if not suggestion["active"]:
+                suggestion["edited"] = True
+        
+        title_edit.textChanged.connect(suggest_end_time)
+        start_time_edit.timeChanged.connect(suggest_end_time)
+        end_time_edit.timeChanged.connect(on_end_time_edited)
+        suggest_end_time()
+        
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(dialog.accept)
         buttons.rejected.connect(dialog.reject)
@@ -618,11 +714,11 @@ class MainWindow(QMainWindow):
     def add_time_block(self, start_time, end_time, title="Новая задача"):
         """Добавление временного блока с анимацией"""
         block = PremiumTimeBlock(start_time, end_time, title)
-        block.deleted.connect(self.delete_time_block)
-        block.edited.connect(self.update_time_block)
+        self.connect_block(block)
         
         self.time_blocks.append(block)
         self.blocks_layout.addWidget(block)
+        self.command_log.record_add(block.block_id, block.to_state(), len(self.time_blocks) - 1)
         
         # Показываем блок
         block.show()
@@ -652,16 +748,81 @@ class MainWindow(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            index = self.time_blocks.index(block)
             self.time_blocks.remove(block)
             block.deleteLater()
+            self.command_log.record_delete(block.block_id, index)
             self.update_stats()
-            self.statusBar().showMessage("Блок удален")
+            self.statusBar().showMessage("Блок удален (Ctrl+Z - отменить)")
     
     def update_time_block(self, block):
         """Обновление временного блока"""
+        self.command_log.record_update(block.block_id, block.to_state())
         self.update_stats()
         self.statusBar().showMessage(f"Обновлен блок: {block.title}")
     
+    def connect_block(self, block):
+        """Подключение сигналов блока"""
+        block.deleted.connect(self.delete_time_block)
+        block.edited.connect(self.update_time_block)
+        block.color_changed.connect(lambda changed, color: self.update_time_block(changed))
+    
+    # --- Отмена и повтор (цель журнала команд) ---
+    
+    def undo(self):
+        """Отмена последнего изменения блоков"""
+        if self.command_log.undo(self):
+            self.update_stats()
+            self.statusBar().showMessage("Изменение отменено")
+    
+    def redo(self):
+        """Повтор отмененного изменения блоков"""
+        if self.command_log.redo(self):
+            self.update_stats()
+            self.statusBar().showMessage("Изменение повторено")
+    
+    def update_undo_actions(self):
+        """Доступность пунктов меню отмены и повтора"""
+        if hasattr(self, 'undo_action'):
+            self.undo_action.setEnabled(self.command_log.can_undo())
+            self.redo_action.setEnabled(self.command_log.can_redo())
+    
+    def find_block(self, block_id):
+        """Блок текущего дня по ID"""
+        for block in self.time_blocks:
+            if block.block_id == block_id:
+                return block
+        return None
+    
+    def insert_block(self, index, state):
+        """Восстановление блока из состояния в позицию index"""
+        block = PremiumTimeBlock(
+            datetime.fromisoformat(state["start_time"]),
+            datetime.fromisoformat(state["end_time"]),
+            state["title"], state.get("color"), state.get("notify", True),
+            block_id=state.get("id")
+        )
+        block.progress = state.get("progress", 0)
+        block.created_at = state.get("created_at", block.created_at)
+        self.connect_block(block)
+        index = min(index, len(self.time_blocks))
+        self.time_blocks.insert(index, block)
+        self.blocks_layout.insertWidget(index, block)
+        block.show()
+    
+    def remove_block(self, block_id):
+        """Удаление блока без подтверждения"""
+        block = self.find_block(block_id)
+        if block:
+            self.time_blocks.remove(block)
+            block.deleteLater()
+    
+    def update_block(self, block_id, fields):
+        """Применение измененных полей к блоку"""
+        block = self.find_block(block_id)
+        if block:
+            block.apply_state(fields)
+    
     def new_day(self):
         """Начало нового дня"""
         reply = QMessageBox.question(self, "Новый день", 
@@ -676,9 +837,10 @@ class MainWindow(QMainWindow):
             for block in self.time_blocks:
                 block.deleteLater()
             self.time_blocks.clear()
+            self.command_log.reset()
             
             # Новый день
-            self.current_date = datetime.now().date()
+            self.current_date = time_layer.today()
             self.update_date_display()
             self.update_stats()
             
@@ -686,6 +848,7 @@ class MainWindow(QMainWindow):
     
     def save_current_day(self):
         """Сохранение текущего дня"""
+        self.command_log.take_changes()
         if self.data_manager.save_day(self.time_blocks, self.current_date):
             self.statusBar().showMessage("День сохранен")
         else:
@@ -704,11 +867,12 @@ class MainWindow(QMainWindow):
                     start_time, end_time,
                     block_data["title"],
                     block_data.get("color", "#FF2B43"),
-                    block_data.get("notify", True)
+                    block_data.get("notify", True),
+                    block_id=block_data.get("id")
                 )
+                block.created_at = block_data.get("created_at", block.created_at)
                 
-                block.deleted.connect(self.delete_time_block)
-                block.edited.connect(self.update_time_block)
+                self.connect_block(block)
                 
                 self.time_blocks.append(block)
                 self.blocks_layout.addWidget(block)
@@ -716,16 +880,26 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 print(f"Ошибка загрузки блока: {e}")
         
+        # Загруженное состояние - исходная точка журнала отмены
+        self.command_log.reset((block.block_id, block.to_state()) for block in self.time_blocks)
         self.update_stats()
         self.statusBar().showMessage(f"Загружено {len(blocks_data)} блоков")
     
+    @traced("ui.update_stats", "ui")
     def update_stats(self):
         """Обновление статистики с анимацией"""
         total_blocks = len(self.time_blocks)
         total_minutes = sum(block.get_duration_minutes() for block in self.time_blocks)
         hours = total_minutes // 60
         minutes = total_minutes % 60
-        productivity = min(100, int((total_minutes / 480) * 100))
+        # Сохраненный день берет оценку из общего кэша по контрольной сумме
+        # файла; несохраненные правки считаются заново (это один день)
+        version = None if self.command_log.changes else self.data_manager.day_version(self.current_date)
+        if version is None:
+            productivity = score_metrics(metrics_from_blocks(self.time_blocks), DAY_FORMULA)
+        else:
+            productivity = productivity_scorer.score(
+                self.current_date, version, lambda: metrics_from_blocks(self.time_blocks))
         
         # Обновление карточек статистики с анимацией
         self.animate_stat_update(self.blocks_card, total_blocks)
@@ -772,7 +946,7 @@ class MainWindow(QMainWindow):
     def update_date_display(self):
         """Обновление отображения даты"""
         date_str = self.current_date.strftime("%d %B %Y (%A)")
-        if self.current_date == datetime.now().date():
+        if self.current_date == time_layer.today():
             date_str += " - СЕГОДНЯ"
         
         self.date_label.setText(f"📅 {date_str}")
@@ -797,10 +971,93 @@ class MainWindow(QMainWindow):
         
         # Проверка уведомлений
         self.notification_manager.start()
+        
+        # Файлы дней, измененные другими процессами
+        self.data_watcher = self.data_manager.create_watcher(lambda: [self.current_date])
+        self.watch_timer = QTimer()
+        self.watch_timer.timeout.connect(self.check_external_changes)
+        self.watch_timer.start(2000)
+        
+        # Синхронизация с файлом календаря (.ics)
+        self.calendar_sync = None
+        self.calendar_timer = QTimer()
+        self.calendar_timer.timeout.connect(self.run_calendar_sync)
+        self.calendar_timer.start(60000)
+        self.run_calendar_sync()
+    
+    def run_calendar_sync(self):
+        """Инкрементальный обмен с файлом .ics, если синхронизация включена"""
+        if not self.settings_manager.get("integration/calendar_sync", False):
+            return
+        try:
+            if self.calendar_sync is None:
+                from ical_sync import CalendarSync
+                from task_manager import task_manager
+                self.calendar_sync = CalendarSync(self.data_manager, task_manager)
+            # Несохраненные блоки текущего дня должны попасть в экспорт
+            if self.command_log.take_changes():
+                self.data_manager.save_day(self.time_blocks, self.current_date)
+            imported, exported, token = self.calendar_sync.sync(
+                self.settings_manager.get("integration/calendar_file") or None)
+            if imported:
+                self.reload_current_day_in_place()
+                self.statusBar().showMessage(f"Календарь: получено событий - {imported}")
+        except Exception as e:
+            print(f"Ошибка синхронизации календаря: {e}")
+    
+    def check_external_changes(self):
+        """Перечитывание текущего дня, если его файл изменил другой процесс"""
+        for path in self.data_watcher.poll():
+            if self.data_manager.date_from_filename(path) == self.current_date:
+                self.reload_current_day_in_place()
+    
+    def reload_current_day_in_place(self):
+        """Слияние блоков дня с диска: меняются только отличающиеся блоки
+        
+        Блоки с несохраненными локальными изменениями остаются как есть.
+        """
+        blocks_data = self.data_manager.load_day(self.current_date)
+        local_changes = self.command_log.changes
+        disk_ids = set()
+        
+        for index, block_data in enumerate(blocks_data):
+            block_id = block_data.get("id")
+            disk_ids.add(block_id)
+            if block_id in local_changes:
+                continue
+            state = CommandLog.snapshot(block_data)
+            block = self.find_block(block_id)
+            if block is None:
+                self.insert_block(index, dict(state, id=block_id))
+            else:
+                current = block.to_state()
+                changed = {key: value for key, value in state.items() if current.get(key) != value}
+                if changed:
+                    block.apply_state(changed)
+            self.command_log.track_external(block_id, state)
+        
+        for block in list(self.time_blocks):
+            if block.block_id not in disk_ids and block.block_id not in local_changes:
+                self.remove_block(block.block_id)
+                self.command_log.track_external(block.block_id, None)
+        
+        self.update_stats()
+        self.statusBar().showMessage("День обновлен: изменения из другого окна")
+        self.sync_notifications()
+    
+    def sync_notifications(self):
+        """Напоминания о начале блоков текущего дня с включенными уведомлениями"""
+        # Другие дни только просматриваются - напоминания сегодняшнего дня сохраняются
+        if self.current_date != time_layer.today():
+            return
+        self.notification_manager.sync_blocks(
+            (block.block_id, block.start_time, block.title, block.notify)
+            for block in self.time_blocks
+        )
     
     def auto_save(self):
-        """Автосохранение"""
-        if self.time_blocks:
+        """Автосохранение (только если с прошлого сохранения были изменения)"""
+        if self.command_log.take_changes():
             self.data_manager.save_day(self.time_blocks, self.current_date)
             self.sys_info_label.setText("Автосохранение выполнено")
     
@@ -813,15 +1070,15 @@ class MainWindow(QMainWindow):
     # Дополнительные методы для быстрых действий
     def quick_add_block(self):
         """Быстрое добавление блока"""
-        current_time = datetime.now()
-        start_time = current_time.replace(minute=(current_time.minute // 30) * 30)
+        current_time = time_layer.now_naive()
+        start_time = current_time.replace(minute=(current_time.minute // 30) * 30, second=0)
         end_time = start_time + timedelta(hours=1)
         
         self.add_time_block(start_time, end_time, "Быстрая задача")
     
     def focus_today(self):
         """Фокусировка на сегодняшнем дне"""
-        self.current_date = datetime.now().date()
+        self.current_date = time_layer.today()
         self.update_date_display()
         self.load_current_day()
     
@@ -837,6 +1094,7 @@ class MainWindow(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            self.command_log.record_clear([block.block_id for block in self.time_blocks])
             for block in self.time_blocks:
                 block.deleteLater()
             self.time_blocks.clear()
@@ -900,6 +1158,61 @@ class MainWindow(QMainWindow):
             # Реализация импорта
             pass
     
+    def show_search(self):
+        """Поиск по задачам и блокам всех дней"""
+        query, ok = QInputDialog.getText(self, "Поиск", "Что найти:")
+        if not ok or not query.strip():
+            return
+        
+        results = self.search_index.search(query, limit=20)
+        if not results:
+            QMessageBox.information(self, "Поиск", f"По запросу «{query}» ничего не найдено")
+            return
+        
+        lines = []
+        for doc_id, doc, score in results:
+            icon = "📋" if doc.get("kind") == "task" else "⏰"
+            lines.append(f"{icon} {doc.get('date', '')}  {doc.get('title', '')}")
+        QMessageBox.information(self, "Поиск", "\n".join(lines))
+    
+    def show_data_message(self, level, title, message):
+        """Показ сообщений менеджера данных в диалогах"""
+        if level == "warning":
+            QMessageBox.warning(self, title, message)
+        else:
+            QMessageBox.information(self, title, message)
+    
+    def show_trace_summary(self):
+        """Сводка длительностей отслеживаемых участков"""
+        dialog = QMessageBox(self)
+        dialog.setWindowTitle("Трассировка")
+        dialog.setText("<pre>" + tracer.format_summary() + "</pre>")
+        dialog.exec_()
+    
+    def show_notification_stats(self):
+        """Счетчики очереди доставки напоминаний"""
+        stats = self.notification_manager.get_stats()
+        names = {
+            "queued": "В очередь", "delivered": "Доставлено", "batches": "Пачек (окон)",
+            "snoozed": "Отложено", "dismissed": "Закрыто", "expired": "Скрыто по таймауту",
+            "pending": "Ждут доставки", "snoozed_pending": "Ждут после откладывания"
+        }
+        lines = [f"{title}: {stats.get(key, 0)}" for key, title in names.items()]
+        QMessageBox.information(self, "Уведомления", "\n".join(lines))
+    
+    def export_trace(self):
+        """Экспорт трассировки для chrome://tracing или Perfetto"""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Экспорт трассировки", "timeblock_trace.json", "JSON Files (*.json)"
+        )
+        
+        if filename:
+            try:
+                count = tracer.export_chrome_trace(filename)
+                self.statusBar().showMessage(f"Экспортировано событий: {count}")
+            except Exception as e:
+                QMessageBox.warning(self, "Ошибка экспорта", f"Не удалось сохранить трассировку: {str(e)}")
+    
     def show_about(self):
         """Показать информацию о программе"""
         QMessageBox.about(self, "О программе", 
@@ -923,6 +1236,7 @@ class MainWindow(QMainWindow):
         """Обработка закрытия приложения"""
         if self.time_blocks and self.settings.get("auto_save", True):
             self.data_manager.save_day(self.time_blocks, self.current_date)
+        self.run_calendar_sync()
         
         self.notification_manager.stop()
         
@@ -948,6 +1262,17 @@ class MainWindow(QMainWindow):
         if 'appearance/font_size' in new_settings:
             self.apply_font_size(new_settings['appearance/font_size'])
         
+        if 'behavior/timezone' in new_settings:
+            time_layer.set_zone(new_settings['behavior/timezone'])
+            self.update_date_display()
+        
+        # Новые сохранения пишутся в выбранном формате, чтение определяет формат само
+        if 'behavior/storage_format' in new_settings:
+            self.data_manager.storage_format = new_settings['behavior/storage_format']
+        
+        if new_settings.get('integration/calendar_sync'):
+            self.run_calendar_sync()
+        
         # Обновляем другие компоненты...
         self.statusBar().showMessage("Настройки применены")
 
@@ -2,8 +2,9 @@
 from PyQt5.QtWidgets import (QPushButton, QFrame, QLabel, QSlider, QProgressBar, 
                              QVBoxLayout, QHBoxLayout, QGraphicsDropShadowEffect)
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve, QRectF
-from PyQt5.QtGui import QPainter, QColor, QLinearGradient, QFont, QPen, QPainterPath
+from PyQt5.QtGui import QPainter, QColor, QLinearGradient, QFont, QPen, QPainterPath, QPixmap
 from animations import RippleEffect, FadeAnimation
+from chart_pipeline import TrendSeries, ordinal_to_date
 
 class PremiumButton(QPushButton):
     """Кнопка премиум-класса с эффектами"""
@@ -277,4 +278,117 @@ class NotificationToast(QFrame):
         shadow.setBlurRadius(20)
         shadow.setColor(QColor(0, 0, 0, 100))
         shadow.setOffset(0, 5)
-        self.setGraphicsEffect(shadow)
\ No newline at end of file
+        self.setGraphicsEffect(shadow)
+
+
+class TrendChartWidget(QFrame):
+    """График тренда по дням/неделям/месяцам
+
+    Точки агрегируются и прореживаются (LTTB) под ширину графика, готовый
+    рисунок хранится в QPixmap и перерисовывается только при смене версии
+    данных, корзины или размера - обычная перерисовка окна лишь копирует его.
+    """
+    MARGIN_LEFT = 40
+    MARGIN_RIGHT = 12
+    MARGIN_TOP = 28
+    MARGIN_BOTTOM = 24
+    
+    def __init__(self, title="", unit="", max_value=None, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.unit = unit
+        self.max_value = max_value
+        self.series = TrendSeries()
+        self.bucket = None
+        self.rendered_bucket = None
+        self._pixmap = None
+        self._pixmap_key = None
+        self.setMinimumHeight(220)
+    
+    def set_points(self, points, start=None, end=None):
+        """Новые данные [(date, значение)]; без изменений кэш сохраняется"""
+        if self.series.set_points(points, start, end):
+            self.update()
+    
+    def set_bucket(self, bucket):
+        """Корзина: day, week, month или None (выбор по длине периода)"""
+        if bucket != self.bucket:
+            self.bucket = bucket
+            self.update()
+    
+    def paintEvent(self, event):
+        ratio = self.devicePixelRatioF()
+        key = (self.series.version, self.bucket, self.width(), self.height(), ratio)
+        if key != self._pixmap_key:
+            self._pixmap = self.render_chart(ratio)
+            self._pixmap_key = key
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+    
+    def render_chart(self, ratio):
+        """Отрисовка графика в QPixmap"""
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(QColor("#1E1E1E"))
+        
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        left, top = self.MARGIN_LEFT, self.MARGIN_TOP
+        plot_width = max(1, self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT)
+        plot_height = max(1, self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM)
+        
+        points, self.rendered_bucket = self.series.render_points(plot_width, self.bucket)
+        bucket_names = {"day": "по дням", "week": "по неделям", "month": "по месяцам"}
+        painter.setPen(QColor("#FF2B43"))
+        painter.setFont(QFont("Segoe UI", 10, QFont.Bold))
+        painter.drawText(8, 18, f"{self.title} ({bucket_names[self.rendered_bucket]})")
+        
+        painter.setFont(QFont("Segoe UI", 8))
+        if not points:
+            painter.setPen(QColor("#888888"))
+            painter.drawText(left, top + plot_height // 2, "Нет данных за период")
+            painter.end()
+            return pixmap
+        
+        max_y = max(self.max_value or 0, max(value for x, value in points)) or 1
+        min_x, max_x = points[0][0], points[-1][0]
+        span_x = max(1, max_x - min_x)
+        
+        # Сетка и подписи оси значений
+        for i in range(5):
+            y = top + plot_height * i / 4
+            painter.setPen(QPen(QColor("#333333"), 1))
+            painter.drawLine(left, int(y), left + plot_width, int(y))
+            painter.setPen(QColor("#888888"))
+            painter.drawText(2, int(y) + 4, f"{max_y * (4 - i) / 4:.0f}{self.unit}")
+        
+        path = QPainterPath()
+        for i, (x, value) in enumerate(points):
+            px = left + (x - min_x) / span_x * plot_width
+            py = top + plot_height - value / max_y * plot_height
+            if i == 0:
+                path.moveTo(px, py)
+            else:
+                path.lineTo(px, py)
+        
+        # Заливка под линией
+        area = QPainterPath(path)
+        area.lineTo(left + (points[-1][0] - min_x) / span_x * plot_width, top + plot_height)
+        area.lineTo(left + (points[0][0] - min_x) / span_x * plot_width, top + plot_height)
+        area.closeSubpath()
+        gradient = QLinearGradient(0, top, 0, top + plot_height)
+        gradient.setColorAt(0, QColor(255, 43, 67, 120))
+        gradient.setColorAt(1, QColor(255, 43, 67, 0))
+        painter.fillPath(area, gradient)
+        
+        painter.setPen(QPen(QColor("#FF2B43"), 2))
+        painter.drawPath(path)
+        
+        # Подписи крайних дат
+        painter.setPen(QColor("#888888"))
+        bottom = top + plot_height + 16
+        painter.drawText(left, bottom, ordinal_to_date(min_x).strftime("%d.%m.%Y"))
+        last_label = ordinal_to_date(max_x).strftime("%d.%m.%Y")
+        painter.drawText(left + plot_width - painter.fontMetrics().width(last_label), bottom, last_label)
+        painter.end()
+        return pixmap
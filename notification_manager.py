@@ -1,12 +1,95 @@
 # notification_manager.py - Продвинутая система уведомлений
-import winsound
-from datetime import datetime, timedelta
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject, Qt
-from PyQt5.QtWidgets import QMessageBox, QSystemTrayIcon
+from PyQt5.QtWidgets import (QMessageBox, QSystemTrayIcon, QFrame, QVBoxLayout, QHBoxLayout,
+                             QLabel, QPushButton, QApplication)
 from animations import NotificationAnimator
+from time_layer import time_layer
+
+
+class NotificationToast(QFrame):
+    """Немодальное всплывающее окно с пачкой напоминаний
+
+    Не забирает фокус и не запускает вложенный цикл событий; новые
+    напоминания, пришедшие пока окно открыто, дописываются в него.
+    """
+    snoozed = pyqtSignal(list)
+    dismissed = pyqtSignal(list, bool)  # (напоминания, закрыто по таймауту)
+
+    def __init__(self, parent=None, snooze_minutes=5, timeout=15000):
+        super().__init__(parent, Qt.Tool | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.items = []
+        self.setFixedWidth(320)
+        self.setStyleSheet("""
+            QFrame { background: #1E1E1E; border: 2px solid #FF2B43; border-radius: 8px; }
+            QLabel { color: white; border: none; }
+            QPushButton { background: #FF2B43; color: white; border: none;
+                          padding: 6px 12px; border-radius: 6px; }
+        """)
+        
+        layout = QVBoxLayout(self)
+        self.title_label = QLabel()
+        self.title_label.setStyleSheet("font-weight: bold;")
+        self.message_label = QLabel()
+        self.message_label.setWordWrap(True)
+        layout.addWidget(self.title_label)
+        layout.addWidget(self.message_label)
+        
+        buttons_layout = QHBoxLayout()
+        snooze_btn = QPushButton(f"Отложить ({snooze_minutes} мин)")
+        snooze_btn.clicked.connect(self.on_snooze)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(lambda: self.finish(False))
+        buttons_layout.addWidget(snooze_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+        
+        self.expire_timer = QTimer(self)
+        self.expire_timer.setSingleShot(True)
+        self.expire_timer.setInterval(timeout)
+        self.expire_timer.timeout.connect(lambda: self.finish(True))
+    
+    def add_items(self, items, title, message):
+        """Добавление напоминаний (окно показывается или обновляется)"""
+        self.items.extend(items)
+        self.title_label.setText(title)
+        self.message_label.setText(message)
+        self.adjustSize()
+        self.move_to_corner()
+        if not self.isVisible():
+            self.show()
+            NotificationAnimator.show_notification(self, "", 0)
+        self.expire_timer.start()
+    
+    def move_to_corner(self):
+        screen = QApplication.primaryScreen()
+        if screen is not None:
+            area = screen.availableGeometry()
+            self.move(area.right() - self.width() - 16, area.bottom() - self.height() - 16)
+    
+    def on_snooze(self):
+        items, self.items = self.items, []
+        self.expire_timer.stop()
+        self.hide()
+        self.snoozed.emit(items)
+    
+    def finish(self, expired):
+        items, self.items = self.items, []
+        self.expire_timer.stop()
+        self.hide()
+        self.dismissed.emit(items, expired)
+
 
 class PremiumNotificationManager(QObject):
-    """Менеджер уведомлений премиум-класса"""
+    """Менеджер уведомлений премиум-класса
+
+    Наступившие напоминания не показываются сразу, а попадают в очередь
+    доставки: все, что наступает в пределах batch_window секунд, уходит
+    одной пачкой (одно окно, один звук, одно сообщение в трее). Окна
+    показываются не чаще раза в min_popup_interval секунд - напоминания,
+    пришедшие раньше, копятся и дописываются в следующую пачку. Доставка
+    идет по таймеру и никогда не блокирует поток интерфейса.
+    """
     notification_triggered = pyqtSignal(str, str)
     
     def __init__(self, parent=None):
@@ -18,12 +101,25 @@ class PremiumNotificationManager(QObject):
         self.notification_times = {}
         self.snoozed_notifications = {}
         
+        # Очередь доставки
+        self.pending = []
+        self.last_popup = None
+        self.toast = None
+        self.delivery_timer = QTimer()
+        self.delivery_timer.setSingleShot(True)
+        self.delivery_timer.timeout.connect(self.deliver_pending)
+        self.stats = {"queued": 0, "delivered": 0, "batches": 0,
+                      "snoozed": 0, "dismissed": 0, "expired": 0}
+        
         # Настройки уведомлений
         self.settings = {
             "sound_enabled": True,
             "popup_enabled": True,
             "snooze_duration": 5,  # минут
-            "early_notification": 2  # минут до начала
+            "early_notification": 2,  # минут до начала
+            "batch_window": 60,  # секунд: напоминания в этом окне объединяются
+            "min_popup_interval": 20,  # секунд между всплывающими окнами
+            "popup_timeout": 15  # секунд до автоматического скрытия окна
         }
     
     def start(self):
@@ -34,6 +130,7 @@ class PremiumNotificationManager(QObject):
     def stop(self):
         """Остановка проверки уведомлений"""
         self.timer.stop()
+        self.delivery_timer.stop()
     
     def set_enabled(self, enabled):
         """Включение/выключение уведомлений"""
@@ -44,9 +141,10 @@ class PremiumNotificationManager(QObject):
             self.timer.stop()
     
     def add_notification(self, block_id, start_time, title, reminder_type="start"):
-        """Добавление уведомления"""
-        notify_time = start_time - timedelta(minutes=self.settings["early_notification"])
+        """Добавление уведомления (start_time - datetime или UTC epoch)"""
+        notify_time = time_layer.to_epoch(start_time) - self.settings["early_notification"] * 60
         self.notification_times[block_id] = {
+            "block_id": block_id,
             "notify_time": notify_time,
             "title": title,
             "type": reminder_type,
@@ -58,45 +156,105 @@ class PremiumNotificationManager(QObject):
         if block_id in self.notification_times:
             del self.notification_times[block_id]
     
+    def sync_blocks(self, blocks):
+        """Напоминания для блоков дня: blocks - (block_id, start_time, title, notify)
+
+        Уже отправленные напоминания с прежним временем не повторяются;
+        блоки, которые уже начались, не напоминают. Отложенные напоминания
+        удаленных блоков отбрасываются.
+        """
+        now = time_layer.now()
+        current = {}
+        block_ids = set()
+        for block_id, start_time, title, notify in blocks:
+            block_ids.add(block_id)
+            start = time_layer.to_epoch(start_time)
+            if not notify or start <= now:
+                continue
+            existing = self.notification_times.get(block_id)
+            notify_time = start - self.settings["early_notification"] * 60
+            if existing and existing["notify_time"] == notify_time:
+                existing["title"] = title
+                current[block_id] = existing
+            else:
+                self.add_notification(block_id, start, title)
+                current[block_id] = self.notification_times[block_id]
+        self.notification_times = current
+        self.snoozed_notifications = {
+            key: notification for key, notification in self.snoozed_notifications.items()
+            if notification.get("block_id") is None or notification["block_id"] in block_ids
+        }
+    
     def check_notifications(self):
-        """Проверка уведомлений"""
+        """Проверка уведомлений: наступившие попадают в очередь доставки"""
         if not self.enabled:
             return
         
-        current_time = datetime.now()
-        notifications_to_send = []
+        # Моменты хранятся в UTC epoch - сравнение целых чисел.
+        # Напоминания из ближайшего окна объединения уходят той же пачкой.
+        current_time = time_layer.now()
+        horizon = current_time + self.settings["batch_window"]
+        due = []
         
         # Проверка обычных уведомлений
         for block_id, notification in self.notification_times.items():
-            if not notification["sent"] and current_time >= notification["notify_time"]:
-                notifications_to_send.append((block_id, notification))
+            if not notification["sent"] and notification["notify_time"] <= horizon:
+                due.append(notification)
                 notification["sent"] = True
         
         # Проверка отложенных уведомлений
         for block_id, notification in list(self.snoozed_notifications.items()):
-            if current_time >= notification["snooze_until"]:
-                notifications_to_send.append((block_id, notification))
+            if notification["snooze_until"] <= horizon:
+                due.append(notification)
                 del self.snoozed_notifications[block_id]
         
-        # Отправка уведомлений
-        for block_id, notification in notifications_to_send:
-            self.send_notification(notification)
+        if due:
+            self.pending.extend(due)
+            self.stats["queued"] += len(due)
+            self.schedule_delivery()
     
-    def send_notification(self, notification):
-        """Отправка уведомления"""
-        title = "Напоминание"
-        message = f"Задача '{notification['title']}' начнется через {self.settings['early_notification']} минут"
-        
-        if notification["type"] == "end":
-            message = f"Задача '{notification['title']}' скоро завершится"
+    def schedule_delivery(self):
+        """Запуск доставки с учетом ограничения частоты окон"""
+        if not self.pending or self.delivery_timer.isActive():
+            return
+        delay = 0
+        if self.last_popup is not None:
+            delay = max(0, self.last_popup + self.settings["min_popup_interval"] - time_layer.now())
+        self.delivery_timer.start(delay * 1000)
+    
+    def format_batch(self, batch):
+        """Заголовок и текст для пачки напоминаний"""
+        if len(batch) == 1:
+            notification = batch[0]
+            if notification["type"] == "end":
+                return "Напоминание", f"Задача '{notification['title']}' скоро завершится"
+            return ("Напоминание", f"Задача '{notification['title']}' начнется через "
+                    f"{self.settings['early_notification']} минут")
+        lines = [f"• {notification['title']}" for notification in batch[:8]]
+        if len(batch) > 8:
+            lines.append(f"... и еще {len(batch) - 8}")
+        return f"Напоминания ({len(batch)})", "Скоро начнутся задачи:\n" + "\n".join(lines)
+    
+    def deliver_pending(self):
+        """Доставка накопленной пачки: один звук, одно окно, одно сообщение в трее"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.last_popup = time_layer.now()
+        self.stats["delivered"] += len(batch)
+        self.stats["batches"] += 1
         
         # Звуковое уведомление
         if self.settings["sound_enabled"]:
             self.play_notification_sound()
         
-        # Всплывающее уведомление
+        # Всплывающее уведомление (в открытое окно дописываются новые напоминания)
         if self.settings["popup_enabled"]:
-            self.show_popup_notification(title, message, notification)
+            shown = self.toast.items if self.toast is not None and self.toast.isVisible() else []
+            title, message = self.format_batch(shown + batch)
+            self.show_popup_notification(title, message, batch)
+        else:
+            title, message = self.format_batch(batch)
         
         # Уведомление в системном трее
         if hasattr(self.parent, 'tray_icon'):
@@ -105,53 +263,42 @@ class PremiumNotificationManager(QObject):
         # Сигнал для основного окна
         self.notification_triggered.emit(title, message)
     
+    def send_notification(self, notification):
+        """Отправка уведомления (через очередь доставки)"""
+        self.pending.append(notification)
+        self.stats["queued"] += 1
+        self.schedule_delivery()
+    
+    def get_stats(self):
+        """Счетчики доставки для мониторинга"""
+        stats = dict(self.stats)
+        stats["pending"] = len(self.pending)
+        stats["snoozed_pending"] = len(self.snoozed_notifications)
+        return stats
+    
     def play_notification_sound(self):
-        """Воспроизведение звука уведомления"""
-        try:
-            winsound.PlaySound("SystemExclamation", winsound.SND_ALIAS)
-        except:
-            pass  # Игнорируем ошибки воспроизведения звука
-    
-    def show_popup_notification(self, title, message, notification):
-        """Показ всплывающего уведомления"""
-        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
-        
-        dialog = QDialog(self.parent)
-        dialog.setWindowTitle(title)
-        dialog.setFixedSize(300, 150)
-        dialog.setWindowFlags(Qt.Dialog | Qt.WindowStaysOnTopHint)
-        
-        layout = QVBoxLayout(dialog)
-        
-        # Сообщение
-        message_label = QLabel(message)
-        message_label.setWordWrap(True)
-        layout.addWidget(message_label)
-        
-        # Кнопки
-        buttons_layout = QHBoxLayout()
-        
-        snooze_btn = QPushButton("Отложить (5 мин)")
-        snooze_btn.clicked.connect(lambda: self.snooze_notification(notification, dialog))
-        
-        close_btn = QPushButton("Закрыть")
-        close_btn.clicked.connect(dialog.accept)
-        
-        buttons_layout.addWidget(snooze_btn)
-        buttons_layout.addWidget(close_btn)
-        layout.addLayout(buttons_layout)
-        
-        # Анимация появления
-        NotificationAnimator.show_notification(dialog, "", 0)
-        dialog.exec_()
-    
-    def snooze_notification(self, notification, dialog):
-        """Отложить уведомление"""
-        snooze_until = datetime.now() + timedelta(minutes=self.settings["snooze_duration"])
-        notification["snooze_until"] = snooze_until
-        self.snoozed_notifications[id(notification)] = notification
-        
-        dialog.accept()
+        """Воспроизведение звука уведомления (в фоновом потоке, не блокирует интерфейс)"""
+        # Импорт по требованию: при выключенном звуке модуль не загружается
+        from sound_backend import get_sound_player
+        get_sound_player().play()
+    
+    def show_popup_notification(self, title, message, batch):
+        """Показ немодального окна с пачкой напоминаний"""
+        if self.toast is None:
+            self.toast = NotificationToast(None, self.settings["snooze_duration"],
+                                           self.settings["popup_timeout"] * 1000)
+            self.toast.snoozed.connect(self.snooze_notifications)
+            self.toast.dismissed.connect(self.on_toast_dismissed)
+        self.toast.add_items(batch, title, message)
+    
+    def snooze_notifications(self, batch):
+        """Отложить пачку напоминаний"""
+        snooze_until = time_layer.now() + self.settings["snooze_duration"] * 60
+        for notification in batch:
+            notification["snooze_until"] = snooze_until
+            key = notification.get("block_id", id(notification))
+            self.snoozed_notifications[key] = notification
+        self.stats["snoozed"] += len(batch)
         
         # Уведомление об отложении
         if hasattr(self.parent, 'tray_icon'):
@@ -159,7 +306,11 @@ class PremiumNotificationManager(QObject):
                                             f"Напоминание отложено на {self.settings['snooze_duration']} минут", 
                                             QSystemTrayIcon.Information, 2000)
     
+    def on_toast_dismissed(self, batch, expired):
+        self.stats["expired" if expired else "dismissed"] += len(batch)
+    
     def clear_all(self):
         """Очистка всех уведомлений"""
         self.notification_times.clear()
-        self.snoozed_notifications.clear()
\ No newline at end of file
+        self.snoozed_notifications.clear()
+        self.pending.clear()
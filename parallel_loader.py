@@ -0,0 +1,181 @@
+# parallel_loader.py - Параллельная загрузка диапазона дней
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from day_format import decode_day, validate_day
+from day_manifest import summarize_blocks
+
+# Замеры на 3000 днях (12 блоков в день): последовательный разбор со сводкой -
+# около 55 мкс на день; пересылка в запущенный пул добавляет около 20 мкс на
+# день и 1 мс на пачку; запуск пула (spawn, повторный импорт модулей) - около
+# 110 мс. Уже запущенный пул окупается примерно со 100 дней (порог взят с
+# запасом для 2 процессов); запуск нового - см. pool_start_days.
+SEQUENTIAL_US_PER_DAY = 55
+IPC_US_PER_DAY = 20
+POOL_START_MS = 110
+MIN_PARALLEL_DAYS = 512
+MIN_PARALLEL_WORKERS = 2
+DEFAULT_CHUNK_SIZE = 128
+MAX_IO_WORKERS = 16
+
+# Пул процессов живет все время работы приложения и запускается по требованию
+_process_pool = None
+_process_pool_workers = 0
+
+
+def day_filename(data_dir, day):
+    """Путь к файлу дня"""
+    return os.path.join(data_dir, f"schedule_{day.strftime('%Y-%m-%d')}.json")
+
+
+def read_day(data_dir, day):
+    """Чтение сырых байтов дня (None, если файла нет)"""
+    try:
+        with open(day_filename(data_dir, day), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def decode_chunk(raws, with_data=True):
+    """Разбор пачки дней (выполняется в процессе-обработчике)
+
+    Возвращает для каждого дня (data, summary) или (None, текст ошибки).
+    При with_data=False обратно передается только сводка - это
+    избавляет от пересылки разобранных блоков между процессами.
+    """
+    results = []
+    for raw in raws:
+        if raw is None:
+            results.append((None, None))
+            continue
+        try:
+            data = decode_day(raw)
+            if not validate_day(data):
+                results.append((None, "поврежден файл дня"))
+                continue
+            summary = summarize_blocks(data["time_blocks"])
+            results.append((data if with_data else {}, summary))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def pool_start_days(workers):
+    """С какого числа дней окупается запуск пула из workers процессов (None - никогда)
+
+    Пул нужен пересчету сводок манифеста (refresh_manifest), когда
+    устаревших дней много: первый запуск на чужом каталоге, перевод
+    формата хранения (compact переписывает все файлы), синхронизация
+    каталога извне. По замерам это около 5200 дней при 4 процессах и
+    3900 при 8; запущенный пул затем переиспользуется и для меньших
+    диапазонов от MIN_PARALLEL_DAYS.
+    """
+    gain = SEQUENTIAL_US_PER_DAY * (1 - 1 / workers) - IPC_US_PER_DAY
+    if gain <= 0:
+        return None
+    return int(POOL_START_MS * 1000 / gain)
+
+
+def get_process_pool(workers, start=True):
+    """Общий пул процессов (None, если не запущен и start=False)
+
+    Процессы запускаются через spawn: fork процесса с Qt и потоками небезопасен.
+    """
+    global _process_pool, _process_pool_workers
+    if _process_pool is not None and _process_pool_workers != workers:
+        shutdown_process_pool()
+    if _process_pool is None and start:
+        _process_pool = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        _process_pool_workers = workers
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Остановка общего пула (при выходе и после сбоя процесса-обработчика)"""
+    global _process_pool
+    pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_process_pool)
+
+
+class ParallelDayLoader:
+    """Загрузка дней: последовательно или сводки в пуле процессов
+
+    Результаты возвращаются в порядке дат. Параллельно считаются только
+    сводки (with_data=False, пересчет манифеста): разобранные блоки дороже
+    переслать из процесса, чем разобрать на месте, поэтому загрузка с
+    данными (экспорт, календарь, индексация) всегда последовательна.
+    Малые диапазоны, workers < 2 и сбой пула процессов - тоже
+    последовательный путь; новый пул запускается только на диапазоне
+    от pool_start_days.
+    """
+
+    def __init__(self, data_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.data_dir = data_dir
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+
+    def load(self, dates, with_data=True):
+        """Список (date, raw, data, summary, error) в порядке дат
+
+        Для отсутствующего дня raw и error равны None; при with_data=False
+        data - пустой словарь.
+        """
+        dates = sorted(dates)
+        if with_data or self.workers < MIN_PARALLEL_WORKERS or len(dates) < MIN_PARALLEL_DAYS:
+            return self.load_sequential(dates, with_data)
+        start_days = pool_start_days(self.workers)
+        pool = get_process_pool(self.workers, start=start_days is not None and len(dates) >= start_days)
+        if pool is None:
+            return self.load_sequential(dates, with_data)
+        try:
+            return self.load_parallel(dates, pool)
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Параллельная загрузка недоступна, последовательный режим: {e}")
+            shutdown_process_pool()
+            return self.load_sequential(dates, with_data)
+
+    def load_sequential(self, dates, with_data=True):
+        """Последовательная загрузка (резервный путь)"""
+        results = []
+        for day in dates:
+            raw = read_day(self.data_dir, day)
+            (data, extra), = decode_chunk([raw], with_data)
+            results.append(self._result(day, raw, data, extra))
+        return results
+
+    def load_parallel(self, dates, pool):
+        """Параллельный расчет сводок в общем пуле процессов"""
+        io_workers = min(MAX_IO_WORKERS, self.workers * 2)
+        chunks = [dates[i:i + self.chunk_size] for i in range(0, len(dates), self.chunk_size)]
+
+        with ThreadPoolExecutor(max_workers=io_workers) as io_pool:
+            # Чтение всех дней сразу; разбор пачки стартует, как только она прочитана
+            read_futures = [[io_pool.submit(read_day, self.data_dir, day) for day in chunk]
+                            for chunk in chunks]
+            decode_futures = []
+            raws_by_chunk = []
+            for futures in read_futures:
+                raws = [future.result() for future in futures]
+                raws_by_chunk.append(raws)
+                decode_futures.append(pool.submit(decode_chunk, raws, False))
+
+            results = []
+            for chunk, raws, future in zip(chunks, raws_by_chunk, decode_futures):
+                for day, raw, (data, extra) in zip(chunk, raws, future.result()):
+                    results.append(self._result(day, raw, data, extra))
+        return results
+
+    @staticmethod
+    def _result(day, raw, data, extra):
+        if data is None:
+            return (day, raw, None, None, extra)
+        return (day, raw, data, extra, None)
@@ -0,0 +1,129 @@
+# productivity.py - Единый расчет продуктивности с кэшем по версии содержимого дня
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+WORKDAY_MINUTES = 8 * 60
+MAX_BONUS = 20
+
+# Метрики дня, из которых считаются все формулы
+DayMetrics = namedtuple("DayMetrics", "total_blocks total_minutes unique_titles total_tasks completed_tasks",
+                        defaults=(0, 0))
+
+FORMULAS = {}
+DEFAULT_FORMULA = "time"
+# Оценка дня - одна везде: в файле дня, в окне и в статистике за период
+DAY_FORMULA = "diversity"
+
+
+def register_formula(name):
+    """Регистрация формулы: func(metrics) -> оценка 0..100"""
+    def decorator(func):
+        FORMULAS[name] = func
+        return func
+    return decorator
+
+
+@register_formula("time")
+def time_formula(metrics):
+    """Доля рабочего дня (8 часов), занятая блоками"""
+    if not metrics.total_blocks:
+        return 0
+    return min(100, int(metrics.total_minutes / WORKDAY_MINUTES * 100))
+
+
+@register_formula("diversity")
+def diversity_formula(metrics):
+    """Доля рабочего дня + бонус за разные задачи (сохраняется в файле дня)"""
+    if not metrics.total_blocks:
+        return 0
+    return min(100, time_formula(metrics) + min(MAX_BONUS, metrics.unique_titles * 2))
+
+
+@register_formula("planning")
+def planning_formula(metrics):
+    """Доля рабочего дня + бонус за число блоков (как calculate_productivity в performance.cpp)"""
+    if not metrics.total_blocks:
+        return 0.0
+    return min(100.0, metrics.total_minutes / WORKDAY_MINUTES * 100 + min(MAX_BONUS, metrics.total_blocks * 2))
+
+
+@register_formula("tasks")
+def tasks_formula(metrics):
+    """Доля выполненных задач"""
+    if not metrics.total_tasks:
+        return 0
+    return round(metrics.completed_tasks / metrics.total_tasks * 100, 1)
+
+
+def score_metrics(metrics, formula=DEFAULT_FORMULA):
+    """Оценка по метрикам без кэша"""
+    return FORMULAS[formula](metrics)
+
+
+def metrics_from_data(blocks_data):
+    """Метрики по словарям блоков (формат файла дня)"""
+    total_minutes = 0
+    for block in blocks_data:
+        seconds = (datetime.fromisoformat(block["end_time"]) -
+                   datetime.fromisoformat(block["start_time"])).total_seconds()
+        total_minutes += int(seconds / 60)
+    return DayMetrics(len(blocks_data), total_minutes,
+                      len(set(block.get("title", "") for block in blocks_data)))
+
+
+def metrics_from_blocks(time_blocks):
+    """Метрики по виджетам блоков"""
+    return DayMetrics(len(time_blocks), sum(block.get_duration_minutes() for block in time_blocks),
+                      len(set(block.title for block in time_blocks)))
+
+
+def metrics_from_summary(summary):
+    """Метрики по записи манифеста"""
+    return DayMetrics(summary.get("total_blocks", 0), summary.get("total_seconds", 0) / 60, 0)
+
+
+class ProductivityScorer:
+    """Кэш оценок: ключ (день, формула) -> (версия содержимого, значение), вытеснение LRU
+
+    Версия дня - контрольная сумма его файла из манифеста; ее используют
+    все потребители, поэтому оценка дня считается один раз на содержимое.
+    На ключ хранится только последняя версия: новая заменяет старую, и
+    число записей не превышает числа дней (кэш рассчитан на многолетний
+    диапазон). Статистика задач ведет свой экземпляр со своими версиями.
+    """
+
+    def __init__(self, max_entries=16384):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, key, version, compute):
+        """Значение compute() для (key, version) - вычисляется один раз на версию"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = compute()
+        self.entries[key] = (version, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def score(self, day, version, metrics, formula=DAY_FORMULA):
+        """Оценка дня; metrics - DayMetrics или функция, возвращающая их (вызывается только при промахе)"""
+        return self.cached((day, formula), version,
+                           lambda: score_metrics(metrics() if callable(metrics) else metrics, formula))
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+# Глобальный экземпляр
+productivity_scorer = ProductivityScorer()
@@ -0,0 +1,383 @@
+# search_index.py - Инкрементальный полнотекстовый индекс задач и блоков
+import heapq
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import date as date_cls
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = os.path.join("time_blocking_premium_data", "search")
+
+# Журнал сворачивается в снимок, когда становится длиннее этого числа операций
+COMPACT_THRESHOLD = 2000
+
+# Полная индексация читает дни пачками (не держит все блоки в памяти)
+REBUILD_BATCH_DAYS = 64
+
+# Минимальная длина терма для поиска по префиксу и с опечаткой
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+
+# Веса совпадений: точное > префикс > с опечаткой
+EXACT_WEIGHT = 3
+PREFIX_WEIGHT = 2
+FUZZY_WEIGHT = 1
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Нормализация текста: NFKC, casefold, ё -> е"""
+    return unicodedata.normalize("NFKC", text or "").casefold().replace("ё", "е")
+
+
+def tokenize(text):
+    """Разбиение нормализованного текста на слова"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def single_deletes(word):
+    """Все варианты слова с одной удаленной буквой"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a, b):
+    """Расстояние Дамерау-Левенштейна (OSA) не больше 1"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return (len(diff) == 2 and diff[1] == diff[0] + 1
+                and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if la > lb:
+        a, b = b, a
+    # b длиннее на одну букву: ищем первую позицию расхождения
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """Инвертированный индекс по названиям и описаниям задач и названиям блоков
+
+    Документы:
+        task:<id>                  - задача (название + описание)
+        block:<YYYY-MM-DD>:<id>    - блок времени дня
+
+    Поддерживает поиск по префиксу (отсортированный словарь + bisect) и
+    с одной опечаткой (словарь удалений в стиле SymSpell). Изменения
+    дописываются в журнал, который периодически сворачивается в снимок,
+    поэтому индекс никогда не перестраивается целиком при правке.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        self.snapshot_path = os.path.join(index_dir, "snapshot.json")
+        self.journal_path = os.path.join(index_dir, "journal.jsonl")
+        self.docs = {}
+        self.sources = set()        # какие источники уже проиндексированы целиком
+        self._doc_tokens = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._deletes = {}
+        self._day_docs = {}
+        self._journal_length = 0
+        os.makedirs(index_dir, exist_ok=True)
+        self.load()
+
+    # --- Словарь и списки вхождений ---
+
+    def _add_token(self, token, doc_id):
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = set()
+            insort(self._vocabulary, token)
+            if len(token) >= MIN_FUZZY_LENGTH - 1:
+                for variant in single_deletes(token) | {token}:
+                    self._deletes.setdefault(variant, set()).add(token)
+        postings.add(doc_id)
+
+    def _remove_token(self, token, doc_id):
+        postings = self._postings.get(token)
+        if postings is None:
+            return
+        postings.discard(doc_id)
+        if postings:
+            return
+        del self._postings[token]
+        del self._vocabulary[bisect_left(self._vocabulary, token)]
+        if len(token) >= MIN_FUZZY_LENGTH - 1:
+            for variant in single_deletes(token) | {token}:
+                tokens = self._deletes.get(variant)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._deletes[variant]
+
+    def _put(self, doc_id, doc):
+        self._drop(doc_id)
+        tokens = set(tokenize(doc.get("text", "")))
+        self.docs[doc_id] = doc
+        self._doc_tokens[doc_id] = tokens
+        for token in tokens:
+            self._add_token(token, doc_id)
+        if doc.get("kind") == "block":
+            self._day_docs.setdefault(doc["date"], set()).add(doc_id)
+
+    def _drop(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        for token in self._doc_tokens.pop(doc_id, ()):
+            self._remove_token(token, doc_id)
+        if doc.get("kind") == "block":
+            day_docs = self._day_docs.get(doc["date"])
+            if day_docs is not None:
+                day_docs.discard(doc_id)
+                if not day_docs:
+                    del self._day_docs[doc["date"]]
+        return True
+
+    # --- Обновления ---
+
+    def put_document(self, doc_id, doc):
+        """Добавление или замена документа"""
+        self._put(doc_id, doc)
+        self._log({"op": "put", "id": doc_id, "doc": doc})
+
+    def remove_document(self, doc_id):
+        """Удаление документа"""
+        if self._drop(doc_id):
+            self._log({"op": "del", "id": doc_id})
+
+    @staticmethod
+    def task_document(task):
+        """Документ индекса для задачи"""
+        return {
+            "kind": "task",
+            "title": task.title,
+            "text": f"{task.title}\n{task.description or ''}",
+            "date": task.local_date().isoformat(),
+            "status": task.status.value,
+            "priority": task.priority.value,
+            "recurring": task.recurrence is not None
+        }
+
+    def index_task(self, task):
+        """Индексация задачи"""
+        self.put_document(f"task:{task.id}", self.task_document(task))
+
+    def remove_task(self, task_id):
+        """Удаление задачи из индекса"""
+        self.remove_document(f"task:{task_id}")
+
+    def on_task_event(self, event, task):
+        """Обработчик событий TaskManager"""
+        if event == "deleted":
+            self.remove_task(task.id)
+        else:
+            self.index_task(task)
+
+    def index_day(self, date, blocks_data):
+        """Замена блоков дня в индексе (обработчик сохранения дня)"""
+        day_key = date.isoformat()
+        new_ids = set()
+        for block in blocks_data:
+            doc_id = f"block:{day_key}:{block.get('id')}"
+            new_ids.add(doc_id)
+            doc = {"kind": "block", "title": block.get("title", ""),
+                   "text": block.get("title", ""), "date": day_key}
+            if self.docs.get(doc_id) != doc:
+                self.put_document(doc_id, doc)
+        for doc_id in self._day_docs.get(day_key, set()) - new_ids:
+            self.remove_document(doc_id)
+
+    def rebuild(self, task_manager=None, data_manager=None):
+        """Полная индексация источников (первый запуск или ручное обновление)"""
+        if task_manager is not None:
+            for doc_id in [d for d, doc in self.docs.items() if doc.get("kind") == "task"]:
+                self._drop(doc_id)
+            for task in task_manager.snapshot():
+                self._put(f"task:{task.id}", self.task_document(task))
+            self.sources.add("tasks")
+
+        if data_manager is not None:
+            for doc_id in [d for d, doc in self.docs.items() if doc.get("kind") == "block"]:
+                self._drop(doc_id)
+            # Дни из манифеста и архива: перенесенные в архив дни остаются в поиске
+            keys = {day.isoformat() for day, _ in
+                    data_manager.refresh_manifest().entries_in_range(date_cls.min, date_cls.max)}
+            keys.update(data_manager.archive.load_index()["days"])
+            days = sorted(date_cls.fromisoformat(key) for key in keys)
+            for offset in range(0, len(days), REBUILD_BATCH_DAYS):
+                for day, raw, blocks, summary in data_manager.load_days(
+                        days[offset:offset + REBUILD_BATCH_DAYS]):
+                    for block in blocks:
+                        doc_id = f"block:{day.isoformat()}:{block.get('id')}"
+                        self._put(doc_id, {"kind": "block", "title": block.get("title", ""),
+                                           "text": block.get("title", ""), "date": day.isoformat()})
+            self.sources.add("blocks")
+
+        self.save()
+
+    # --- Поиск ---
+
+    def _match_term(self, term):
+        """Слова словаря, подходящие под терм, с весами"""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_WEIGHT
+
+        if len(term) >= MIN_PREFIX_LENGTH:
+            i = bisect_left(self._vocabulary, term)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+                matches.setdefault(self._vocabulary[i], PREFIX_WEIGHT)
+                i += 1
+
+        if len(term) >= MIN_FUZZY_LENGTH:
+            for variant in single_deletes(term) | {term}:
+                for token in self._deletes.get(variant, ()):
+                    if token not in matches and within_one_edit(term, token):
+                        matches[token] = FUZZY_WEIGHT
+        return matches
+
+    def search(self, query, kind=None, date_from=None, date_to=None,
+               status=None, priority=None, limit=50):
+        """Поиск документов
+
+        Все слова запроса должны совпасть (точно, по префиксу или с одной
+        опечаткой). Возвращает список (doc_id, doc, score), лучшие - первыми,
+        при равенстве - более поздние даты.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, weight in self._match_term(term).items():
+                for doc_id in self._postings[token]:
+                    if term_scores.get(doc_id, 0) < weight:
+                        term_scores[doc_id] = weight
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc_id: score + term_scores[doc_id]
+                          for doc_id, score in scores.items() if doc_id in term_scores}
+            if not scores:
+                return []
+
+        if isinstance(date_from, date_cls):
+            date_from = date_from.isoformat()
+        if isinstance(date_to, date_cls):
+            date_to = date_to.isoformat()
+        status = getattr(status, "value", status)
+        priority = getattr(priority, "value", priority)
+
+        results = []
+        for doc_id, score in scores.items():
+            doc = self.docs[doc_id]
+            if kind and doc.get("kind") != kind:
+                continue
+            if date_from and doc.get("date", "") < date_from:
+                continue
+            if date_to and doc.get("date", "") > date_to:
+                continue
+            if status and doc.get("status") != status:
+                continue
+            if priority and doc.get("priority") != priority:
+                continue
+            results.append((doc_id, doc, score))
+
+        rank = lambda item: (item[2], item[1].get("date", ""))
+        if limit:
+            return heapq.nlargest(limit, results, key=rank)
+        return sorted(results, key=rank, reverse=True)
+
+    # --- Хранение: снимок + журнал ---
+
+    def _log(self, record):
+        """Дописывание операции в журнал"""
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._journal_length += 1
+            if self._journal_length > max(COMPACT_THRESHOLD, len(self.docs)):
+                self.save()
+        except Exception as e:
+            print(f"Ошибка записи журнала поиска: {e}")
+
+    def load(self):
+        """Загрузка снимка и применение журнала"""
+        try:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    self.sources = set(data.get("sources", []))
+                    for doc_id, doc in data.get("docs", {}).items():
+                        self._put(doc_id, doc)
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # оборванная последняя строка
+                        if record.get("op") == "put":
+                            self._put(record["id"], record["doc"])
+                        elif record.get("op") == "del":
+                            self._drop(record["id"])
+                        self._journal_length += 1
+        except Exception as e:
+            print(f"Ошибка загрузки поискового индекса: {e}")
+
+    def save(self):
+        """Сворачивание журнала в снимок (атомарно)"""
+        data = {"version": INDEX_VERSION, "sources": sorted(self.sources), "docs": self.docs}
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_length = 0
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"Ошибка сохранения поискового индекса: {e}")
+
+
+# Глобальный экземпляр индекса
+_search_index = None
+
+
+def get_search_index(data_manager=None):
+    """Глобальный индекс, подписанный на изменения задач и (если передан) дней"""
+    global _search_index
+    from task_manager import task_manager
+
+    if _search_index is None:
+        _search_index = SearchIndex()
+        task_manager.add_listener(_search_index.on_task_event)
+        if "tasks" not in _search_index.sources:
+            _search_index.rebuild(task_manager=task_manager)
+
+    if data_manager is not None and _search_index.index_day not in data_manager.day_listeners:
+        data_manager.add_day_listener(_search_index.index_day)
+        if "blocks" not in _search_index.sources:
+            _search_index.rebuild(data_manager=data_manager)
+
+    return _search_index
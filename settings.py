@@ -1,8 +1,9 @@
 # settings.py - Система настроек премиум-класса
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from PyQt5.QtCore import QSettings, QStandardPaths
+from PyQt5.QtCore import QSettings, QStandardPaths, QObject, QTimer, QCoreApplication
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
                              QGroupBox, QCheckBox, QComboBox, QSpinBox, 
                              QDoubleSpinBox, QLineEdit, QPushButton, 
@@ -11,13 +12,28 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
 from PyQt5.QtGui import QIcon, QFont, QPalette, QColor
 from PyQt5.QtCore import Qt, pyqtSignal
 
-class AppSettings:
-    """Класс для управления настройками приложения"""
+class AppSettings(QObject):
+    """Класс для управления настройками приложения
+    
+    Значения кэшируются в памяти уже приведенными к типу. Запись на диск
+    откладывается и объединяется: изменения сбрасываются одним sync()
+    после паузы FLUSH_DELAY_MS или в конце transaction().
+    """
+    setting_changed = pyqtSignal(str, object)
+    
+    FLUSH_DELAY_MS = 500
     
     def __init__(self, app_name="TimeBlockingPlanner"):
+        super().__init__()
         self.app_name = app_name
         self.settings = QSettings("PremiumSoft", app_name)
         self.default_settings = self.get_default_settings()
+        self.flat_defaults = self.flatten_settings(self.default_settings)
+        
+        self._cache = {}
+        self._pending = {}
+        self._transaction_depth = 0
+        self._flush_timer = None
         
     def get_default_settings(self):
         """Возвращает настройки по умолчанию"""
@@ -46,7 +62,9 @@ class AppSettings:
                 "minimize_to_tray": True,
                 "start_minimized": False,
                 "confirm_deletions": True,
-                "backup_on_start": True
+                "backup_on_start": True,
+                "storage_format": "json",
+                "timezone": "Europe/Moscow"
             },
             "time_blocks": {
                 "default_duration": 60,
@@ -58,6 +76,7 @@ class AppSettings:
             },
             "integration": {
                 "calendar_sync": False,
+                "calendar_file": "",
                 "export_format": "json",
                 "auto_export": False,
                 "cloud_sync": False
@@ -69,44 +88,115 @@ class AppSettings:
             }
         }
     
+    @staticmethod
+    def flatten_settings(settings, prefix=""):
+        """Преобразование вложенных настроек в плоский словарь "группа/ключ" """
+        flat = {}
+        for key, value in settings.items():
+            full_key = f"{prefix}{key}"
+            if isinstance(value, dict):
+                flat.update(AppSettings.flatten_settings(value, f"{full_key}/"))
+            else:
+                flat[full_key] = value
+        return flat
+    
+    @staticmethod
+    def coerce_value(value, default):
+        """Приведение сохраненного значения к типу значения по умолчанию"""
+        if isinstance(default, bool):
+            return value.lower() == 'true' if isinstance(value, str) else bool(value)
+        elif isinstance(default, int):
+            return int(value) if value is not None else default
+        elif isinstance(default, float):
+            return float(value) if value is not None else default
+        else:
+            return value if value is not None else default
+    
     def get(self, key, default=None):
         """Получить значение настройки"""
-        keys = key.split('/')
-        current = self.default_settings
+        if key in self._cache:
+            return self._cache[key]
         
         # Находим значение по умолчанию
-        for k in keys:
-            if k in current:
-                current = current[k]
-            else:
-                return default
-        
-        # Пытаемся получить сохраненное значение
-        value = self.settings.value(key, current)
-        
-        # Преобразуем типы данных
-        if isinstance(current, bool):
-            return value.lower() == 'true' if isinstance(value, str) else bool(value)
-        elif isinstance(current, int):
-            return int(value) if value is not None else current
-        elif isinstance(current, float):
-            return float(value) if value is not None else current
-        else:
-            return value if value is not None else current
+        if key not in self.flat_defaults:
+            return default
+        current = self.flat_defaults[key]
+        
+        # Пытаемся получить сохраненное значение и преобразуем тип
+        value = self.coerce_value(self.settings.value(key, current), current)
+        self._cache[key] = value
+        return value
     
     def set(self, key, value):
-        """Установить значение настройки"""
-        self.settings.setValue(key, value)
+        """Установить значение настройки (запись на диск откладывается)"""
+        if key in self.flat_defaults:
+            value = self.coerce_value(value, self.flat_defaults[key])
+            if key not in self._pending and self.get(key) == value:
+                return
+        
+        self._cache[key] = value
+        self._pending[key] = value
+        self.setting_changed.emit(key, value)
+        
+        if self._transaction_depth == 0:
+            self.schedule_flush()
+    
+    def set_many(self, values):
+        """Установить несколько настроек одной записью"""
+        with self.transaction():
+            for key, value in values.items():
+                self.set(key, value)
+    
+    @contextmanager
+    def transaction(self):
+        """Группировка изменений: все значения записываются одним sync()"""
+        self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.flush()
+    
+    def schedule_flush(self):
+        """Отложенная запись изменений (повторные вызовы сдвигают таймер)"""
+        app = QCoreApplication.instance()
+        if app is None:
+            # Без цикла событий таймер не сработает - пишем сразу
+            self.flush()
+            return
+        
+        if self._flush_timer is None:
+            self._flush_timer = QTimer(self)
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.setInterval(self.FLUSH_DELAY_MS)
+            self._flush_timer.timeout.connect(self.flush)
+            app.aboutToQuit.connect(self.flush)
+        self._flush_timer.start()
+    
+    def flush(self):
+        """Запись накопленных изменений на диск"""
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+        if not self._pending:
+            return
+        
+        for key, value in self._pending.items():
+            self.settings.setValue(key, value)
+        self._pending.clear()
         self.settings.sync()
     
     def reset_to_defaults(self):
         """Сбросить все настройки к значениям по умолчанию"""
+        self._pending.clear()
+        self._cache.clear()
         self.settings.clear()
         self.settings.sync()
     
     def export_settings(self, filename):
         """Экспортировать настройки в файл"""
         try:
+            self.flush()
             all_settings = {}
             for key in self.settings.allKeys():
                 all_settings[key] = self.settings.value(key)
@@ -125,10 +215,12 @@ class AppSettings:
             with open(filename, 'r', encoding='utf-8') as f:
                 imported_settings = json.load(f)
             
+            self.flush()
             for key, value in imported_settings.items():
                 self.settings.setValue(key, value)
             
             self.settings.sync()
+            self._cache.clear()
             return True
         except Exception as e:
             print(f"Ошибка импорта настроек: {e}")
@@ -136,6 +228,7 @@ class AppSettings:
     
     def get_all_settings(self):
         """Получить все текущие настройки"""
+        self.flush()
         settings = {}
         for key in self.settings.allKeys():
             settings[key] = self.settings.value(key)
@@ -326,6 +419,18 @@ class SettingsDialog(QDialog):
         self.backup_check = QCheckBox("Создавать резервные копии")
         autosave_layout.addRow(self.backup_check)
         
+        self.storage_format_combo = QComboBox()
+        self.storage_format_combo.addItems(["JSON", "Компактный (сжатый)"])
+        autosave_layout.addRow("Формат файлов:", self.storage_format_combo)
+        
+        # Часовой пояс: список распространенных зон, можно ввести любую зону IANA
+        self.timezone_combo = QComboBox()
+        self.timezone_combo.setEditable(True)
+        self.timezone_combo.addItems(["Europe/Moscow", "Europe/Kaliningrad", "Europe/Samara",
+                                      "Asia/Yekaterinburg", "Asia/Novosibirsk", "Asia/Vladivostok",
+                                      "Europe/Berlin", "Europe/London", "America/New_York", "UTC"])
+        autosave_layout.addRow("Часовой пояс:", self.timezone_combo)
+        
         # Поведение при запуске
         startup_group = QGroupBox("🚀 Запуск приложения")
         startup_layout = QFormLayout(startup_group)
@@ -419,6 +524,10 @@ class SettingsDialog(QDialog):
         self.calendar_sync_check = QCheckBox("Синхронизация с календарем")
         sync_layout.addRow(self.calendar_sync_check)
         
+        self.calendar_file_edit = QLineEdit()
+        self.calendar_file_edit.setPlaceholderText("data/calendar/timeblocking.ics")
+        sync_layout.addRow("Файл календаря (.ics):", self.calendar_file_edit)
+        
         self.cloud_sync_check = QCheckBox("Облачная синхронизация")
         sync_layout.addRow(self.cloud_sync_check)
         
@@ -562,6 +671,18 @@ class SettingsDialog(QDialog):
             self.settings_manager.get("notifications/working_hours_end", "22:00")
         )
         
+        # Поведение
+        self.storage_format_combo.setCurrentIndex(
+            {"json": 0, "compact": 1}.get(self.settings_manager.get("behavior/storage_format"), 0)
+        )
+        self.timezone_combo.setCurrentText(self.settings_manager.get("behavior/timezone"))
+        
+        # Интеграция
+        self.calendar_sync_check.setChecked(
+            self.settings_manager.get("integration/calendar_sync", False)
+        )
+        self.calendar_file_edit.setText(self.settings_manager.get("integration/calendar_file", ""))
+        
         # Обновляем состояние зависимых элементов
         self.toggle_notification_settings(self.notify_enabled_check.isChecked())
     
@@ -598,6 +719,8 @@ class SettingsDialog(QDialog):
             "behavior/start_minimized": self.start_minimized_check.isChecked(),
             "behavior/confirm_deletions": self.confirm_deletions_check.isChecked(),
             "behavior/backup_on_start": self.backup_check.isChecked(),
+            "behavior/storage_format": ["json", "compact"][self.storage_format_combo.currentIndex()],
+            "behavior/timezone": self.timezone_combo.currentText().strip() or "Europe/Moscow",
             
             "time_blocks/default_duration": self.default_duration_spin.value(),
             "time_blocks/default_color": ["#FF2B43", "#2B43FF", "#2BFF43", "#FFA52B", "#A52BFF"][self.default_color_combo.currentIndex()],
@@ -609,6 +732,7 @@ class SettingsDialog(QDialog):
             "integration/export_format": ["json", "csv", "xml", "pdf"][self.export_format_combo.currentIndex()],
             "integration/auto_export": self.auto_export_check.isChecked(),
             "integration/calendar_sync": self.calendar_sync_check.isChecked(),
+            "integration/calendar_file": self.calendar_file_edit.text().strip(),
             "integration/cloud_sync": self.cloud_sync_check.isChecked(),
             
             "privacy/analytics": self.analytics_check.isChecked(),
@@ -623,8 +747,8 @@ class SettingsDialog(QDialog):
         try:
             settings = self.collect_settings()
             
-            for key, value in settings.items():
-                self.settings_manager.set(key, value)
+            # Все значения записываются на диск одной транзакцией
+            self.settings_manager.set_many(settings)
             
             # Сигнал о изменении настроек
             self.settings_changed.emit(settings)
@@ -727,8 +851,7 @@ class SettingsUtils:
                     old_settings = json.load(f)
                 
                 # Конвертация старых настроек в новый формат
-                for key, value in old_settings.items():
-                    new_settings_manager.set(key, value)
+                new_settings_manager.set_many(old_settings)
                 
                 return True
         except:
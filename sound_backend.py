@@ -0,0 +1,204 @@
+# sound_backend.py - Воспроизведение звуков напоминаний в фоновом потоке
+import atexit
+import io
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from functools import lru_cache
+
+SAMPLE_RATE = 22050
+# Повторные вызовы play() чаще этого интервала сливаются в один звук
+DEFAULT_COALESCE_SECONDS = 0.5
+# TIMEBLOCK_SOUND=null отключает звук (тесты, серверы без аудио)
+BACKEND_ENV = "TIMEBLOCK_SOUND"
+PLAYER_COMMANDS = (("paplay",), ("aplay", "-q"), ("afplay",))
+
+
+@lru_cache(maxsize=4)
+def reminder_sample(frequency=880, duration_ms=180, volume=0.4):
+    """Звук напоминания: WAV (16 бит, моно) в памяти, синтезируется один раз"""
+    frames = SAMPLE_RATE * duration_ms // 1000
+    fade = max(1, frames // 10)
+    samples = []
+    for i in range(frames):
+        # Плавные нарастание и затухание без щелчков
+        envelope = min(1.0, i / fade, (frames - i) / fade)
+        value = volume * envelope * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE)
+        samples.append(int(value * 32767))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buffer.getvalue()
+
+
+class NullBackend:
+    """Без звука: только считает воспроизведения (тесты, headless Linux)"""
+
+    name = "null"
+
+    def __init__(self):
+        self.played = 0
+
+    def play(self, sample):
+        self.played += 1
+
+
+class WinsoundBackend:
+    """Windows: PlaySound из памяти (winsound импортируется при создании)"""
+
+    name = "winsound"
+
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play(self, sample):
+        # SND_MEMORY несовместим с SND_ASYNC - асинхронность дает поток проигрывателя
+        self.winsound.PlaySound(sample, self.winsound.SND_MEMORY | self.winsound.SND_NODEFAULT)
+
+
+class CommandBackend:
+    """Linux/macOS: внешний проигрыватель (paplay, aplay, afplay) и временный WAV
+
+    Сэмпл записывается на диск один раз и переиспользуется.
+    """
+
+    name = "command"
+
+    def __init__(self, command):
+        self.command = list(command)
+        self.paths = {}
+
+    @classmethod
+    def detect(cls):
+        for command in PLAYER_COMMANDS:
+            path = shutil.which(command[0])
+            if path:
+                return cls((path,) + command[1:])
+        return None
+
+    def sample_path(self, sample):
+        path = self.paths.get(id(sample))
+        if path is None or not os.path.exists(path):
+            fd, path = tempfile.mkstemp(prefix="timeblock_", suffix=".wav")
+            with os.fdopen(fd, "wb") as f:
+                f.write(sample)
+            self.paths[id(sample)] = path
+        return path
+
+    def play(self, sample):
+        subprocess.run(self.command + [self.sample_path(sample)], stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, timeout=10, check=False)
+
+    def close(self):
+        for path in self.paths.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.paths.clear()
+
+
+def create_backend(name=None):
+    """Выбор бэкенда: явно (null, winsound, command) или по платформе"""
+    name = name or os.environ.get(BACKEND_ENV, "")
+    if name == "null":
+        return NullBackend()
+    if name == "winsound" or (not name and sys.platform == "win32"):
+        try:
+            return WinsoundBackend()
+        except ImportError as e:
+            print(f"winsound недоступен, звук отключен: {e}")
+            return NullBackend()
+    return CommandBackend.detect() or NullBackend()
+
+
+class SoundPlayer:
+    """Очередь воспроизведения в отдельном потоке
+
+    play() возвращается сразу; поток запускается при первом звуке.
+    Вызовы, пришедшие пока звук ждет очереди или раньше чем через
+    coalesce_seconds после предыдущего, сливаются в один.
+    """
+
+    def __init__(self, backend=None, coalesce_seconds=DEFAULT_COALESCE_SECONDS):
+        self.backend = backend
+        self.coalesce_seconds = coalesce_seconds
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pending = False
+        self.last_play = 0.0
+        self.stats = {"played": 0, "coalesced": 0, "errors": 0}
+
+    def play(self, sample=None):
+        """Запрос звука (по умолчанию - звук напоминания); False - слит с предыдущим"""
+        with self.lock:
+            now = time.monotonic()
+            if self.pending or now - self.last_play < self.coalesce_seconds:
+                self.stats["coalesced"] += 1
+                return False
+            self.pending = True
+            self.last_play = now
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="sound-player", daemon=True)
+                self.thread.start()
+        self.requests.put(sample)
+        return True
+
+    def _run(self):
+        while True:
+            sample = self.requests.get()
+            if sample is StopIteration:
+                break
+            with self.lock:
+                self.pending = False
+            try:
+                if self.backend is None:
+                    self.backend = create_backend()
+                self.backend.play(sample or reminder_sample())
+                self.stats["played"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Ошибка воспроизведения звука: {e}")
+
+    def wait_idle(self, timeout=5.0):
+        """Ожидание опустошения очереди (для тестов и завершения)"""
+        deadline = time.monotonic() + timeout
+        while not self.requests.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """Остановка потока и удаление временных файлов"""
+        if self.thread is not None:
+            self.requests.put(StopIteration)
+            self.thread.join(timeout=2)
+            self.thread = None
+        if hasattr(self.backend, "close"):
+            self.backend.close()
+
+
+_sound_player = None
+
+
+def get_sound_player():
+    """Глобальный проигрыватель (бэкенд выбирается при первом звуке)
+
+    Закрывается при выходе - поток останавливается, временные WAV удаляются.
+    """
+    global _sound_player
+    if _sound_player is None:
+        _sound_player = SoundPlayer()
+        atexit.register(_sound_player.close)
+    return _sound_player
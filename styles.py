@@ -28,9 +28,108 @@ class PremiumTheme:
         }
     }
 
+    # Палитра цветов блоков; цвет из палитры выбирается свойством colorClass
+    BLOCK_COLORS = ["#FF2B43", "#FF4C63", "#FF6B7F", "#FF8A99",
+                    "#FF4C43", "#FF6B5F", "#FF8A79", "#FFA999"]
+
+    # Скомпилированные таблицы стилей: тема -> строка
+    _stylesheet_cache = {}
+    _block_stylesheet = None
+    _custom_block_cache = {}
+
     @staticmethod
     def get_stylesheet(theme="dark"):
-        colors = PremiumTheme.COLORS[theme]
+        """Таблица стилей темы (компилируется один раз на тему)"""
+        stylesheet = PremiumTheme._stylesheet_cache.get(theme)
+        if stylesheet is None:
+            stylesheet = PremiumTheme._compile_stylesheet(theme) + PremiumTheme.get_block_stylesheet()
+            PremiumTheme._stylesheet_cache[theme] = stylesheet
+        return stylesheet
+
+    @staticmethod
+    def block_color_class(color):
+        """Класс цвета блока (c0, c1, ...) или None для цвета вне палитры"""
+        try:
+            return f"c{PremiumTheme.BLOCK_COLORS.index(color.upper())}"
+        except (AttributeError, ValueError):
+            return None
+
+    @staticmethod
+    def get_block_stylesheet():
+        """Общие правила блоков для всех цветов палитры (входят в таблицу темы)"""
+        if PremiumTheme._block_stylesheet is None:
+            rules = [PremiumTheme._block_color_rules('PremiumTimeBlock[colorClass="c%d"]' % i, color)
+                     for i, color in enumerate(PremiumTheme.BLOCK_COLORS)]
+            PremiumTheme._block_stylesheet = ("\n/* === ВРЕМЕННЫЕ БЛОКИ === */\n"
+                                              + PremiumTheme._block_common_rules("PremiumTimeBlock")
+                                              + "".join(rules))
+        return PremiumTheme._block_stylesheet
+
+    @staticmethod
+    def get_custom_block_stylesheet(color):
+        """Стиль отдельного блока с цветом вне палитры (кешируется по цвету)"""
+        stylesheet = PremiumTheme._custom_block_cache.get(color)
+        if stylesheet is None:
+            stylesheet = (PremiumTheme._block_common_rules("PremiumTimeBlock")
+                          + PremiumTheme._block_color_rules("PremiumTimeBlock", color))
+            PremiumTheme._custom_block_cache[color] = stylesheet
+        return stylesheet
+
+    @staticmethod
+    def _block_common_rules(selector):
+        """Правила блока, не зависящие от цвета"""
+        return f"""
+{selector} QLabel {{
+    color: #FFFFFF;
+    font-size: 11px;
+    background: transparent;
+}}
+{selector} QSlider::groove:horizontal {{
+    background: #333333;
+    height: 4px;
+    border-radius: 2px;
+}}
+"""
+
+    @staticmethod
+    def _block_color_rules(selector, color):
+        """Правила оформления блока заданного цвета"""
+        return f"""
+{selector} {{
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+        stop:0 {color}33, stop:0.5 {color}22, stop:1 {color}11);
+    border: 2px solid {color};
+    border-radius: 12px;
+    margin: 2px;
+}}
+{selector}:hover {{
+    border: 2px solid {color}CC;
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+        stop:0 {color}55, stop:0.5 {color}44, stop:1 {color}33);
+}}
+{selector} QLabel#title_label {{
+    background: {color};
+    padding: 4px 8px;
+    border-radius: 6px;
+    color: white;
+    font-weight: bold;
+    font-size: 12px;
+}}
+{selector} QSlider::handle:horizontal {{
+    background: {color};
+    width: 12px;
+    height: 12px;
+    border-radius: 6px;
+    margin: -4px 0;
+}}
+"""
+
+    @staticmethod
+    def _compile_stylesheet(theme):
+        """Сборка таблицы стилей темы"""
+        # Неизвестная или неполная тема дополняется цветами темной
+        colors = dict(PremiumTheme.COLORS["dark"])
+        colors.update(PremiumTheme.COLORS.get(theme, {}))
         
         return f"""
 /* === ОСНОВНЫЕ СТИЛИ === */
@@ -0,0 +1,207 @@
+# task_list_model.py - Модель и представление списка задач с точечными обновлениями
+from bisect import bisect_left
+
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRectF, QSize
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPen
+
+# Дополнительная роль: сам объект задачи
+TaskRole = Qt.UserRole + 1
+
+
+class TaskListModel(QAbstractListModel):
+    """Отсортированная по времени начала модель задач
+
+    Строки хранятся в порядке (start_time, id); позиция задачи находится
+    двоичным поиском, поэтому добавление, изменение и удаление затрагивают
+    только одну строку и сообщают представлению о ней отдельными сигналами.
+    Текст строки форматируется при первой отрисовке и кешируется.
+    """
+
+    def __init__(self, formatter, accepts=None, parent=None):
+        super().__init__(parent)
+        self.formatter = formatter          # task -> (text, QColor)
+        self.accepts = accepts or (lambda task: True)
+        self._tasks = []
+        self._keys = []
+        self._key_by_id = {}
+        self._display_cache = {}
+
+    # --- Интерфейс QAbstractListModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._tasks):
+            return None
+
+        task = self._tasks[index.row()]
+        if role == Qt.UserRole:
+            return task.id
+        if role == TaskRole:
+            return task
+        if role in (Qt.DisplayRole, Qt.BackgroundRole):
+            display = self._display_cache.get(task.id)
+            if display is None:
+                display = self.formatter(task)
+                self._display_cache[task.id] = display
+            return display[0] if role == Qt.DisplayRole else display[1]
+        return None
+
+    # --- Точечные обновления ---
+
+    @staticmethod
+    def sort_key(task):
+        """Ключ сортировки строки (UTC epoch - без сравнения разных часовых поясов)"""
+        return (task.start_ts, task.id)
+
+    def row_of(self, task_id):
+        """Номер строки задачи или -1"""
+        key = self._key_by_id.get(task_id)
+        if key is None:
+            return -1
+        return bisect_left(self._keys, key)
+
+    def reset_tasks(self, tasks):
+        """Полная замена содержимого (загрузка, кнопка «Обновить»)"""
+        self.beginResetModel()
+        self._tasks = sorted((task for task in tasks if self.accepts(task)), key=self.sort_key)
+        self._keys = [self.sort_key(task) for task in self._tasks]
+        self._key_by_id = {task.id: key for task, key in zip(self._tasks, self._keys)}
+        self._display_cache.clear()
+        self.endResetModel()
+
+    def upsert_task(self, task):
+        """Добавление или обновление одной задачи"""
+        if not self.accepts(task):
+            self.remove_task(task.id)
+            return
+
+        new_key = self.sort_key(task)
+        old_row = self.row_of(task.id)
+        self._display_cache.pop(task.id, None)
+
+        if old_row < 0:
+            row = bisect_left(self._keys, new_key)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._tasks.insert(row, task)
+            self._keys.insert(row, new_key)
+            self._key_by_id[task.id] = new_key
+            self.endInsertRows()
+            return
+
+        if self._keys[old_row] == new_key:
+            self._tasks[old_row] = task
+            index = self.index(old_row)
+            self.dataChanged.emit(index, index)
+            return
+
+        # Время начала изменилось - перемещаем строку, сохраняя выделение.
+        # destination - позиция до удаления исходной строки (как требует beginMoveRows)
+        destination = bisect_left(self._keys, new_key)
+        new_row = destination - 1 if destination > old_row else destination
+        moving = destination not in (old_row, old_row + 1)
+        if moving:
+            self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), destination)
+        del self._tasks[old_row]
+        del self._keys[old_row]
+        self._tasks.insert(new_row, task)
+        self._keys.insert(new_row, new_key)
+        self._key_by_id[task.id] = new_key
+        if moving:
+            self.endMoveRows()
+        index = self.index(new_row)
+        self.dataChanged.emit(index, index)
+
+    def remove_task(self, task_id):
+        """Удаление одной задачи"""
+        row = self.row_of(task_id)
+        if row < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._tasks[row]
+        del self._keys[row]
+        del self._key_by_id[task_id]
+        self._display_cache.pop(task_id, None)
+        self.endRemoveRows()
+        return True
+
+    def retranslate(self):
+        """Сброс кеша текста (смена языка) без пересоздания строк"""
+        self._display_cache.clear()
+        if self._tasks:
+            self.dataChanged.emit(self.index(0), self.index(len(self._tasks) - 1))
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """Отрисовка карточки задачи; вызывается только для видимых строк"""
+
+    ROW_HEIGHT = 78
+    MARGIN = 5
+    PADDING = 10
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        rect = QRectF(option.rect).adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        if option.state & QStyle.State_Selected:
+            background = QColor("#FF2B43")
+        elif option.state & QStyle.State_MouseOver:
+            background = QColor("#3D3D3D")
+        else:
+            background = index.data(Qt.BackgroundRole) or QColor("#1E1E1E")
+
+        path = QPainterPath()
+        path.addRoundedRect(rect, 6, 6)
+        painter.fillPath(path, background)
+        painter.setPen(QPen(QColor("#444444"), 1))
+        painter.drawPath(path)
+
+        painter.setPen(QColor("white"))
+        painter.setFont(option.font)
+        text_rect = rect.adjusted(self.PADDING, self.PADDING / 2, -self.PADDING, -self.PADDING / 2)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, index.data(Qt.DisplayRole) or "")
+
+        painter.restore()
+
+
+class TaskListView(QListView):
+    """Список задач с заглушкой для пустой модели"""
+
+    def __init__(self, placeholder="", parent=None):
+        super().__init__(parent)
+        self.placeholder = placeholder
+        self.setItemDelegate(TaskItemDelegate(self))
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+
+    def current_task_id(self):
+        """ID выбранной задачи или None"""
+        index = self.currentIndex()
+        if not index.isValid() or not self.selectionModel().isSelected(index):
+            return None
+        return index.data(Qt.UserRole)
+
+    def select_task(self, task_id):
+        """Выделение задачи по ID"""
+        model = self.model()
+        row = model.row_of(task_id) if model is not None else -1
+        if row >= 0:
+            self.setCurrentIndex(model.index(row))
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        model = self.model()
+        if self.placeholder and (model is None or model.rowCount() == 0):
+            painter = QPainter(self.viewport())
+            painter.setPen(QColor("#AAAAAA"))
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, self.placeholder)
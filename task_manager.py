@@ -1,12 +1,17 @@
 # task_manager.py - Менеджер задач с реальными данными
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Optional, Iterator, Callable
+from dataclasses import dataclass, asdict, field, replace
 from enum import Enum
 import uuid
-import pytz
+from contextlib import contextmanager
+
+from tracing import traced
+from time_layer import time_layer
+from file_storage import file_lock, atomic_write, read_bytes, file_signature
+from productivity import ProductivityScorer, score_metrics, DayMetrics
 
 class TaskStatus(Enum):
     PLANNED = "planned"
@@ -20,6 +25,98 @@ class TaskPriority(Enum):
     HIGH = "high"
     URGENT = "urgent"
 
+class RecurrenceFrequency(Enum):
+    DAILY = "daily"      # каждые N дней
+    WEEKLY = "weekly"    # каждые N недель в указанные дни
+
+@dataclass
+class RecurrenceRule:
+    """Правило повторения задачи
+
+    Хранится в задаче-шаблоне; отдельные повторения не сохраняются, а
+    вычисляются только для запрошенного периода.
+    """
+    frequency: RecurrenceFrequency = RecurrenceFrequency.DAILY
+    interval: int = 1
+    weekdays: List[int] = field(default_factory=list)   # 0 - понедельник
+    until: Optional[date] = None
+    count: Optional[int] = None
+    exceptions: List[str] = field(default_factory=list)  # ISO-даты без повторения
+    
+    def iter_dates(self, first: date, window_start: date, window_end: date) -> Iterator[date]:
+        """Даты повторений в окне [window_start, window_end]
+        
+        Начало окна вычисляется арифметически, поэтому стоимость зависит
+        только от размера окна, а не от того, как далеко тянется серия.
+        """
+        interval = max(1, self.interval)
+        end = window_end if self.until is None else min(window_end, self.until)
+        start = max(first, window_start)
+        if start > end:
+            return
+        excluded = set(self.exceptions)
+        
+        if self.frequency == RecurrenceFrequency.WEEKLY:
+            weekdays = sorted(set(self.weekdays)) or [first.weekday()]
+            anchor = first - timedelta(days=first.weekday())
+            # Повторения первой недели до даты начала не считаются
+            skipped = sum(1 for wd in weekdays if wd < first.weekday())
+            period = (start - anchor).days // (7 * interval)
+            while True:
+                week_start = anchor + timedelta(days=7 * interval * period)
+                if week_start > end:
+                    return
+                for position, wd in enumerate(weekdays):
+                    day = week_start + timedelta(days=wd)
+                    if day < start:
+                        continue
+                    if day > end:
+                        return
+                    ordinal = period * len(weekdays) + position - skipped
+                    if self.count is not None and ordinal >= self.count:
+                        return
+                    if day.isoformat() not in excluded:
+                        yield day
+                period += 1
+        else:
+            ordinal = -(-(start - first).days // interval)
+            while True:
+                if self.count is not None and ordinal >= self.count:
+                    return
+                day = first + timedelta(days=ordinal * interval)
+                if day > end:
+                    return
+                if day.isoformat() not in excluded:
+                    yield day
+                ordinal += 1
+    
+    def occurs_on(self, first: date, day: date) -> bool:
+        """Есть ли повторение в указанную дату"""
+        return next(self.iter_dates(first, day, day), None) == day
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в словарь"""
+        return {
+            'frequency': self.frequency.value,
+            'interval': self.interval,
+            'weekdays': list(self.weekdays),
+            'until': self.until.isoformat() if self.until else None,
+            'count': self.count,
+            'exceptions': list(self.exceptions)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RecurrenceRule':
+        """Создание из словаря"""
+        return cls(
+            frequency=RecurrenceFrequency(data.get('frequency', 'daily')),
+            interval=int(data.get('interval', 1)),
+            weekdays=list(data.get('weekdays', [])),
+            until=date.fromisoformat(data['until']) if data.get('until') else None,
+            count=data.get('count'),
+            exceptions=list(data.get('exceptions', []))
+        )
+
 @dataclass
 class Task:
     """Модель задачи"""
@@ -33,6 +130,23 @@ class Task:
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
+    recurrence: Optional[RecurrenceRule] = None
+    recurrence_id: Optional[str] = None  # ID шаблона для отдельного повторения
+    # Начало и конец в UTC epoch - для сравнений и сортировки (не сохраняются)
+    start_ts: int = field(default=0, init=False, repr=False, compare=False)
+    end_ts: int = field(default=0, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.refresh_epochs()
+    
+    def refresh_epochs(self):
+        """Пересчет start_ts/end_ts после изменения start_time/end_time"""
+        self.start_ts = time_layer.to_epoch(self.start_time)
+        self.end_ts = time_layer.to_epoch(self.end_time)
+    
+    def local_date(self) -> date:
+        """Дата начала в часовом поясе пользователя"""
+        return time_layer.local_date(self.start_ts)
     
     def get_duration_minutes(self) -> int:
         """Получение длительности в минутах"""
@@ -43,13 +157,13 @@ class Task:
         """Получение длительности в часах"""
         return self.get_duration_minutes() / 60
     
-    def is_active_now(self, moscow_time: datetime) -> bool:
-        """Проверка, активна ли задача сейчас"""
-        return self.start_time <= moscow_time <= self.end_time
+    def is_active_now(self, moscow_time) -> bool:
+        """Проверка, активна ли задача сейчас (datetime или epoch)"""
+        return self.start_ts <= time_layer.to_epoch(moscow_time) <= self.end_ts
     
-    def is_overdue(self, moscow_time: datetime) -> bool:
-        """Проверка, просрочена ли задача"""
-        return moscow_time > self.end_time and self.status != TaskStatus.COMPLETED
+    def is_overdue(self, moscow_time) -> bool:
+        """Проверка, просрочена ли задача (datetime или epoch)"""
+        return time_layer.to_epoch(moscow_time) > self.end_ts and self.status != TaskStatus.COMPLETED
     
     def mark_completed(self, moscow_time: datetime):
         """Отметить как выполненную"""
@@ -60,6 +174,12 @@ class Task:
     def to_dict(self) -> Dict[str, Any]:
         """Преобразование в словарь"""
         data = asdict(self)
+        data['recurrence'] = self.recurrence.to_dict() if self.recurrence else None
+        del data['start_ts'], data['end_ts']
+        # Поля повторения не пишем для обычных задач
+        for key in ('recurrence', 'recurrence_id'):
+            if data[key] is None:
+                del data[key]
         # Преобразуем datetime в строки
         for key, value in data.items():
             if isinstance(value, datetime):
@@ -84,25 +204,252 @@ class Task:
             data['priority'] = TaskPriority(data['priority'])
         if 'status' in data:
             data['status'] = TaskStatus(data['status'])
+        if data.get('recurrence'):
+            data['recurrence'] = RecurrenceRule.from_dict(data['recurrence'])
         
         return cls(**data)
 
+class FrozenTask(Task):
+    """Копия задачи в снимке: изменение атрибутов запрещено"""
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Задача в снимке только для чтения: {name}")
+    
+    def __delattr__(self, name):
+        raise AttributeError(f"Задача в снимке только для чтения: {name}")
+
+
+def freeze_task(task: Task) -> FrozenTask:
+    """Неизменяемая копия задачи (правило повторения копируется с кортежами)"""
+    state = dict(vars(task))
+    if task.recurrence:
+        state['recurrence'] = replace(task.recurrence, weekdays=tuple(task.recurrence.weekdays),
+                                      exceptions=tuple(task.recurrence.exceptions))
+    frozen = object.__new__(FrozenTask)
+    frozen.__dict__.update(state)
+    return frozen
+
+
+def make_occurrence(master: Task, day: date) -> Task:
+    """Виртуальное повторение серии на указанную дату (не сохраняется)"""
+    shift = timedelta(days=(day - master.local_date()).days)
+    return Task(
+        id=f"{master.id}:{day.isoformat()}",
+        title=master.title,
+        description=master.description,
+        start_time=master.start_time + shift,
+        end_time=master.end_time + shift,
+        priority=master.priority,
+        status=TaskStatus.PLANNED,
+        created_at=master.created_at,
+        updated_at=master.updated_at,
+        recurrence_id=master.id
+    )
+
+
+def find_task(find_stored: Callable[[str], Optional[Task]], task_id: str) -> Optional[Task]:
+    """Задача по ID среди сохраненных или виртуальное повторение серии"""
+    task = find_stored(task_id)
+    if task or ':' not in task_id:
+        return task
+    
+    # ID повторения: "<ID шаблона>:<дата>"
+    master_id, _, day_text = task_id.rpartition(':')
+    master = find_stored(master_id)
+    if not master or not master.recurrence:
+        return None
+    try:
+        day = date.fromisoformat(day_text)
+    except ValueError:
+        return None
+    if not master.recurrence.occurs_on(master.local_date(), day):
+        return None
+    return make_occurrence(master, day)
+
+
+def tasks_in_range(tasks, start_date: date, end_date: date) -> List[Task]:
+    """Задачи с датой начала в периоде [start_date, end_date]
+    
+    Серии разворачиваются только в пределах периода, поэтому объем
+    работы не зависит от того, как далеко продолжаются повторения.
+    """
+    # Обычные задачи отбираются сравнением целых epoch с границами периода
+    range_start, _ = time_layer.day_bounds(start_date)
+    _, range_end = time_layer.day_bounds(end_date)
+    result = []
+    for task in tasks:
+        if task.recurrence:
+            for day in task.recurrence.iter_dates(task.local_date(), start_date, end_date):
+                result.append(make_occurrence(task, day))
+        elif range_start <= task.start_ts < range_end:
+            result.append(task)
+    return result
+
+
+# Число корзин снимка: публикация копирует одну корзину (около n / SNAPSHOT_BUCKETS задач)
+# и кортеж ссылок на корзины
+SNAPSHOT_BUCKETS = 512
+
+
+class TaskSnapshot:
+    """Неизменяемый снимок задач для чтения из фоновых потоков
+    
+    Содержит копии задач на момент версии version; последующие правки
+    TaskManager его не затрагивают. Задачи разложены по SNAPSHOT_BUCKETS
+    корзинам по хешу ID (постоянное отображение): при изменении задачи
+    копируется только ее корзина, остальные корзины общие с предыдущим
+    снимком. Опубликованные корзины никогда не меняются.
+    """
+    __slots__ = ('version', 'buckets', '_count')
+    
+    def __init__(self, version: int, buckets: tuple, count: int):
+        self.version = version
+        self.buckets = buckets
+        self._count = count
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[FrozenTask]:
+        for bucket in self.buckets:
+            yield from bucket.values()
+    
+    def _find_stored(self, task_id: str) -> Optional[FrozenTask]:
+        if not self.buckets:
+            return None
+        return self.buckets[hash(task_id) % len(self.buckets)].get(task_id)
+    
+    def get_task_by_id(self, task_id: str) -> Optional[Task]:
+        """Задача по ID (включая виртуальные повторения серий)"""
+        return find_task(self._find_stored, task_id)
+    
+    def get_tasks_in_range(self, start_date: date, end_date: date) -> List[Task]:
+        """Задачи с датой начала в периоде [start_date, end_date]"""
+        return tasks_in_range(self, start_date, end_date)
+    
+    def get_tasks_for_date(self, day: date) -> List[Task]:
+        """Задачи на дату"""
+        return tasks_in_range(self, day, day)
+
+
 class TaskManager:
     """Менеджер задач"""
     
-    def __init__(self):
+    def __init__(self, data_file: str = "tasks_data.json"):
         self.tasks: List[Task] = []
-        self.data_file = "tasks_data.json"
-        self.moscow_tz = pytz.timezone('Europe/Moscow')
+        self.data_file = data_file
+        self.listeners: List[Callable[[str, Task], None]] = []
+        # Записи в том виде, в каком они последний раз совпадали с файлом, и подпись файла
+        self._synced: Dict[str, Dict[str, Any]] = {}
+        self._disk_signature = None
+        # Растет при каждом изменении задач - версия для кэша оценок продуктивности
+        self.version = 0
+        # Свой кэш: оценки дней из общего кэша не вытесняются статистикой задач
+        self._stats_cache = ProductivityScorer(max_entries=32)
+        # Корзины опубликованного снимка и задачи, изменившиеся после публикации (None - удалена)
+        self._buckets: List[Dict[str, FrozenTask]] = []
+        self._count = 0
+        self._dirty: Dict[str, Optional[Task]] = {}
+        self._snapshot = TaskSnapshot(0, (), 0)
+        # События пакета изменений (None - вне пакета): запись и оповещение в конце
+        self._batch: Optional[List[tuple]] = None
         self.load_tasks()
     
+    def add_listener(self, callback: Callable[[str, Task], None]):
+        """Подписка на изменения задач: callback(event, task)
+        
+        event - created, updated или deleted.
+        """
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+    
+    def notify_listeners(self, event: str, task: Task):
+        """Оповещение подписчиков об изменении задачи (снимок публикуется до вызова)"""
+        self.version += 1
+        self._dirty[task.id] = None if event == "deleted" else task
+        self.publish_snapshot()
+        for callback in list(self.listeners):
+            try:
+                callback(event, task)
+            except Exception as e:
+                print(f"Ошибка обработчика задач: {e}")
+    
+    def snapshot(self) -> TaskSnapshot:
+        """Текущий снимок задач за O(1) - для чтения из любых потоков
+        
+        Снимок публикуется поточно-безопасной заменой ссылки после каждого
+        изменения, поэтому читателям не нужны блокировки, а правки задач
+        на месте не видны в уже выданных снимках.
+        """
+        return self._snapshot
+    
+    def publish_snapshot(self):
+        """Публикация нового снимка: копируются только корзины измененных задач"""
+        if not self._buckets:
+            self._rebuild_buckets()
+        changed = {}
+        for task_id, task in self._dirty.items():
+            index = hash(task_id) % SNAPSHOT_BUCKETS
+            bucket = changed.get(index)
+            if bucket is None:
+                bucket = changed[index] = dict(self._buckets[index])
+                self._count -= len(bucket)
+            if task is None:
+                bucket.pop(task_id, None)
+            else:
+                bucket[task_id] = freeze_task(task)
+        for index, bucket in changed.items():
+            self._buckets[index] = bucket
+            self._count += len(bucket)
+        self._dirty.clear()
+        self._snapshot = TaskSnapshot(self.version, tuple(self._buckets), self._count)
+    
+    def _rebuild_buckets(self):
+        """Полное построение корзин по текущему списку задач (при загрузке)"""
+        buckets = [{} for _ in range(SNAPSHOT_BUCKETS)]
+        for task in self.tasks:
+            buckets[hash(task.id) % SNAPSHOT_BUCKETS][task.id] = freeze_task(task)
+        self._buckets = buckets
+        self._count = sum(len(bucket) for bucket in buckets)
+        self._dirty.clear()
+    
+    @contextmanager
+    def batch(self):
+        """Пакет изменений: файл задач пишется один раз, подписчики оповещаются в конце
+        
+        Для массовых правок (импорт): каждое изменение вне пакета
+        перезаписывает весь файл.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            events, self._batch = self._batch, None
+            if events:
+                self.save_tasks()
+                for event, task in events:
+                    self.notify_listeners(event, task)
+    
+    def _changed(self, event: str, task: Task):
+        """Сохранение и оповещение после изменения (в пакете - отложенно)"""
+        if self._batch is not None:
+            self._batch.append((event, task))
+            return
+        self.save_tasks()
+        self.notify_listeners(event, task)
+    
     def get_moscow_time(self) -> datetime:
-        """Получение московского времени"""
-        return datetime.now(self.moscow_tz)
+        """Текущее время в часовом поясе пользователя (по умолчанию - московское)"""
+        return time_layer.now_local()
     
     def create_task(self, title: str, description: str, start_time: datetime, 
-                   end_time: datetime, priority: TaskPriority = TaskPriority.MEDIUM) -> Task:
-        """Создание новой задачи"""
+                   end_time: datetime, priority: TaskPriority = TaskPriority.MEDIUM,
+                   recurrence: Optional[RecurrenceRule] = None,
+                   status: TaskStatus = TaskStatus.PLANNED) -> Task:
+        """Создание новой задачи (с recurrence - повторяющейся серии)"""
         moscow_time = self.get_moscow_time()
         
         task = Task(
@@ -112,18 +459,19 @@ class TaskManager:
             start_time=start_time,
             end_time=end_time,
             priority=priority,
-            status=TaskStatus.PLANNED,
+            status=status,
             created_at=moscow_time,
-            updated_at=moscow_time
+            updated_at=moscow_time,
+            recurrence=recurrence
         )
         
         self.tasks.append(task)
-        self.save_tasks()
+        self._changed("created", task)
         return task
     
     def update_task(self, task_id: str, **kwargs) -> Optional[Task]:
-        """Обновление задачи"""
-        task = self.get_task_by_id(task_id)
+        """Обновление задачи (повторение серии сохраняется как отдельная задача)"""
+        task = self.materialize_occurrence(task_id)
         if not task:
             return None
         
@@ -134,51 +482,83 @@ class TaskManager:
                 setattr(task, key, value)
         
         task.updated_at = moscow_time
-        self.save_tasks()
+        task.refresh_epochs()
+        self._changed("updated", task)
         return task
     
     def delete_task(self, task_id: str) -> bool:
-        """Удаление задачи"""
-        task = self.get_task_by_id(task_id)
+        """Удаление задачи (для повторения - исключение даты из серии)"""
+        task = self._find_stored(task_id)
+        if not task:
+            occurrence = self.get_task_by_id(task_id)
+            if occurrence:
+                master = self._find_stored(occurrence.recurrence_id)
+                master.recurrence.exceptions.append(occurrence.local_date().isoformat())
+                self._changed("updated", master)
+                return True
         if task:
             self.tasks.remove(task)
-            self.save_tasks()
+            self._changed("deleted", task)
             return True
         return False
     
     def complete_task(self, task_id: str) -> Optional[Task]:
         """Завершение задачи"""
-        task = self.get_task_by_id(task_id)
+        task = self.materialize_occurrence(task_id)
         if task:
             moscow_time = self.get_moscow_time()
             task.mark_completed(moscow_time)
-            self.save_tasks()
+            self._changed("updated", task)
             return task
         return None
     
     def get_task_by_id(self, task_id: str) -> Optional[Task]:
-        """Получение задачи по ID"""
+        """Получение задачи по ID (включая виртуальные повторения серий)"""
+        return find_task(self._find_stored, task_id)
+    
+    def _find_stored(self, task_id: str) -> Optional[Task]:
+        """Поиск среди сохраненных задач"""
         for task in self.tasks:
             if task.id == task_id:
                 return task
         return None
     
+    def materialize_occurrence(self, task_id: str) -> Optional[Task]:
+        """Сохраненная задача по ID; повторение серии сохраняется при первом изменении
+        
+        Дата повторения добавляется в исключения шаблона, а само повторение
+        становится обычной задачей с тем же ID.
+        """
+        task = self._find_stored(task_id)
+        if task:
+            return task
+        
+        task = self.get_task_by_id(task_id)
+        if task:
+            master = self._find_stored(task.recurrence_id)
+            master.recurrence.exceptions.append(task.local_date().isoformat())
+            self._dirty[master.id] = master
+            self.tasks.append(task)
+        return task
+    
+    def get_tasks_in_range(self, start_date: date, end_date: date) -> List[Task]:
+        """Задачи с датой начала в периоде [start_date, end_date]"""
+        return tasks_in_range(self.tasks, start_date, end_date)
+    
+    def get_tasks_for_date(self, day: date) -> List[Task]:
+        """Получение задач на дату"""
+        return self.get_tasks_in_range(day, day)
+    
     def get_tasks_for_today(self) -> List[Task]:
         """Получение задач на сегодня"""
-        moscow_time = self.get_moscow_time()
-        today = moscow_time.date()
-        
-        return [
-            task for task in self.tasks
-            if task.start_time.date() == today
-        ]
+        return self.get_tasks_for_date(time_layer.today())
     
     def get_active_task(self) -> Optional[Task]:
         """Получение текущей активной задачи"""
-        moscow_time = self.get_moscow_time()
+        now = time_layer.now()
         
         for task in self.tasks:
-            if task.is_active_now(moscow_time) and task.status == TaskStatus.IN_PROGRESS:
+            if task.is_active_now(now) and task.status == TaskStatus.IN_PROGRESS:
                 return task
         
         return None
@@ -194,9 +574,18 @@ class TaskManager:
         return [task for task in today_tasks if task.status in [TaskStatus.PLANNED, TaskStatus.IN_PROGRESS]]
     
     def calculate_productivity_today(self) -> Dict[str, Any]:
-        """Расчет продуктивности за сегодня"""
-        today_tasks = self.get_tasks_for_today()
-        completed_tasks = self.get_completed_tasks_today()
+        """Расчет продуктивности за сегодня (пересчет только после изменения задач)
+        
+        Считается по снимку задач, поэтому вызов безопасен и из фонового потока.
+        """
+        today = self.get_moscow_time().date()
+        snapshot = self.snapshot()
+        return dict(self._stats_cache.cached(("tasks-today", today), snapshot.version,
+                                               lambda: self._productivity_today(snapshot, today)))
+    
+    def _productivity_today(self, snapshot: TaskSnapshot, today: date) -> Dict[str, Any]:
+        today_tasks = snapshot.get_tasks_for_date(today)
+        completed_tasks = [task for task in today_tasks if task.status == TaskStatus.COMPLETED]
         
         if not today_tasks:
             return {
@@ -212,11 +601,11 @@ class TaskManager:
         total_planned_minutes = sum(task.get_duration_minutes() for task in today_tasks)
         completed_minutes = sum(task.get_duration_minutes() for task in completed_tasks)
         
-        productivity_percent = (len(completed_tasks) / len(today_tasks)) * 100
+        metrics = DayMetrics(0, total_planned_minutes, 0, len(today_tasks), len(completed_tasks))
         efficiency = (completed_minutes / total_planned_minutes) * 100 if total_planned_minutes > 0 else 0
         
         return {
-            'productivity_percent': round(productivity_percent, 1),
+            'productivity_percent': score_metrics(metrics, "tasks"),
             'total_tasks': len(today_tasks),
             'completed_tasks': len(completed_tasks),
             'pending_tasks': len(today_tasks) - len(completed_tasks),
@@ -228,58 +617,151 @@ class TaskManager:
     def get_weekly_stats(self) -> List[Dict[str, Any]]:
         """Получение статистики за неделю"""
         moscow_time = self.get_moscow_time()
+        snapshot = self.snapshot()
         stats = []
         
         for i in range(7):
             day = moscow_time - timedelta(days=i)
-            day_tasks = [
-                task for task in self.tasks
-                if task.start_time.date() == day.date()
-            ]
-            
-            completed = [task for task in day_tasks if task.status == TaskStatus.COMPLETED]
-            productivity = (len(completed) / len(day_tasks)) * 100 if day_tasks else 0
-            
-            stats.append({
-                'date': day.date().isoformat(),
-                'day_name': day.strftime('%a'),
-                'total_tasks': len(day_tasks),
-                'completed_tasks': len(completed),
-                'productivity': round(productivity, 1)
-            })
+            stats.append(dict(self._stats_cache.cached(
+                ("tasks-day", day.date()), snapshot.version,
+                lambda day=day: self._day_stats(snapshot, day))))
         
         return list(reversed(stats))  # От понедельника к воскресенью
     
+    def _day_stats(self, snapshot: TaskSnapshot, day: datetime) -> Dict[str, Any]:
+        day_tasks = snapshot.get_tasks_for_date(day.date())
+        completed = [task for task in day_tasks if task.status == TaskStatus.COMPLETED]
+        metrics = DayMetrics(0, 0, 0, len(day_tasks), len(completed))
+        
+        return {
+            'date': day.date().isoformat(),
+            'day_name': day.strftime('%a'),
+            'total_tasks': len(day_tasks),
+            'completed_tasks': len(completed),
+            'productivity': score_metrics(metrics, "tasks")
+        }
+    
+    @traced("tasks.save_tasks", "io")
     def save_tasks(self):
-        """Сохранение задач в файл"""
+        """Сохранение задач в файл
+        
+        Запись идет под блокировкой файла и атомарно. Если файл успели
+        изменить другие процессы, их записи сначала сливаются с нашими:
+        свои измененные и удаленные задачи берутся из памяти, остальные -
+        с диска (без перезаписи чужих изменений).
+        """
         try:
-            data = {
-                'tasks': [task.to_dict() for task in self.tasks],
-                'saved_at': self.get_moscow_time().isoformat()
-            }
+            with file_lock(self.data_file):
+                local = {task.id: task.to_dict() for task in self.tasks}
+                signature = file_signature(self.data_file)
+                events = []
+                if signature is not None and signature != self._disk_signature:
+                    dirty = {task_id for task_id, record in local.items()
+                             if self._synced.get(task_id) != record}
+                    deleted = set(self._synced) - set(local)
+                    merged = []
+                    for record in self._read_records():
+                        task_id = record.get('id')
+                        if task_id in deleted:
+                            continue
+                        if task_id in dirty:
+                            merged.append(local[task_id])
+                            dirty.discard(task_id)
+                        else:
+                            merged.append(record)
+                    merged.extend(local[task_id] for task_id in local if task_id in dirty)
+                    events = self._apply_records(merged)
+                    local = {task.id: task.to_dict() for task in self.tasks}
+                
+                data = {
+                    'tasks': list(local.values()),
+                    'saved_at': self.get_moscow_time().isoformat()
+                }
+                atomic_write(self.data_file, json.dumps(data, ensure_ascii=False, indent=2))
+                self._synced = local
+                self._disk_signature = file_signature(self.data_file)
             
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            for event, task in events:
+                self.notify_listeners(event, task)
         except Exception as e:
             print(f"Ошибка сохранения задач: {e}")
     
+    @traced("tasks.load_tasks", "io")
     def load_tasks(self):
         """Загрузка задач из файла"""
         try:
             if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with file_lock(self.data_file, exclusive=False):
+                    records = self._read_records()
+                    self._disk_signature = file_signature(self.data_file)
                 
                 self.tasks = []
-                for task_data in data.get('tasks', []):
+                self._synced = {}
+                self.version += 1
+                for task_data in records:
                     try:
-                        task = Task.from_dict(task_data)
+                        task = Task.from_dict(dict(task_data))
                         self.tasks.append(task)
+                        self._synced[task.id] = task.to_dict()
                     except Exception as e:
                         print(f"Ошибка загрузки задачи: {e}")
         except Exception as e:
             print(f"Ошибка загрузки файла задач: {e}")
             self.tasks = []
+        self._rebuild_buckets()
+        self.publish_snapshot()
+    
+    def sync_from_disk(self) -> List[tuple]:
+        """Подхват изменений файла задач, сделанных другими процессами
+        
+        Меняются только отличающиеся записи - объекты задач обновляются на
+        месте, подписчики получают created/updated/deleted. Возвращает
+        список (event, task).
+        """
+        try:
+            with file_lock(self.data_file, exclusive=False):
+                signature = file_signature(self.data_file)
+                if signature is None or signature == self._disk_signature:
+                    return []
+                records = self._read_records()
+                self._disk_signature = signature
+        except Exception as e:
+            print(f"Ошибка загрузки файла задач: {e}")
+            return []
+        
+        events = self._apply_records(records)
+        self._synced = {task.id: task.to_dict() for task in self.tasks}
+        for event, task in events:
+            self.notify_listeners(event, task)
+        return events
+    
+    def _read_records(self) -> List[Dict[str, Any]]:
+        """Записи задач из файла"""
+        raw = read_bytes(self.data_file)
+        if not raw:
+            return []
+        return json.loads(raw.decode('utf-8')).get('tasks', [])
+    
+    def _apply_records(self, records: List[Dict[str, Any]]) -> List[tuple]:
+        """Приведение списка задач к records с обновлением объектов на месте"""
+        current = {task.id: task for task in self.tasks}
+        tasks = []
+        events = []
+        for record in records:
+            try:
+                task = current.pop(record.get('id'), None)
+                if task is None:
+                    task = Task.from_dict(dict(record))
+                    events.append(("created", task))
+                elif task.to_dict() != record:
+                    vars(task).update(vars(Task.from_dict(dict(record))))
+                    events.append(("updated", task))
+                tasks.append(task)
+            except Exception as e:
+                print(f"Ошибка загрузки задачи: {e}")
+        events.extend(("deleted", task) for task in current.values())
+        self.tasks[:] = tasks
+        return events
 
 # Глобальный экземпляр
 task_manager = TaskManager()
@@ -4,6 +4,10 @@ from PyQt5.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout,
 from PyQt5.QtCore import Qt, pyqtSignal, QPoint, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QMouseEvent, QFont, QPainter, QColor, QPen, QLinearGradient
 from animations import PremiumTimeBlockAnimator
+from styles import PremiumTheme
+from tracing import traced
+import uuid
+from datetime import datetime
 
 class PremiumTimeBlock(QWidget):
     """Временной блок с премиум анимациями и эффектами"""
@@ -12,7 +16,8 @@ class PremiumTimeBlock(QWidget):
     color_changed = pyqtSignal(object, str)
     time_changed = pyqtSignal(object)
     
-    def __init__(self, start_time, end_time, title="", color=None, notify=True, parent=None):
+    def __init__(self, start_time, end_time, title="", color=None, notify=True, parent=None,
+                 block_id=None):
         super().__init__(parent)
         self.start_time = start_time
         self.end_time = end_time
@@ -23,7 +28,9 @@ class PremiumTimeBlock(QWidget):
         self.is_resizing = False
         self.resize_edge = None
         self.drag_start_pos = None
-        self.block_id = id(self)
+        # Постоянный ID: сохраняется в файле дня и переживает отмену удаления
+        self.block_id = block_id if block_id is not None else uuid.uuid4().hex
+        self.created_at = datetime.now().isoformat()
         
         # Настройка UI
         self.init_ui()
@@ -52,6 +59,7 @@ class PremiumTimeBlock(QWidget):
         header_layout = QHBoxLayout()
         
         self.title_label = QLabel(self.title)
+        self.title_label.setObjectName("title_label")
         self.title_label.setAlignment(Qt.AlignLeft)
         self.title_label.setWordWrap(True)
         header_layout.addWidget(self.title_label)
@@ -106,52 +114,34 @@ class PremiumTimeBlock(QWidget):
         self.shadow_animation.setEasingCurve(QEasingCurve.OutCubic)
     
     def apply_styles(self):
-        """Применение стилей"""
-        self.setStyleSheet(f"""
-            PremiumTimeBlock {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 {self.color}33, stop:0.5 {self.color}22, stop:1 {self.color}11);
-                border: 2px solid {self.color};
-                border-radius: 12px;
-                margin: 2px;
-            }}
-            PremiumTimeBlock:hover {{
-                border: 2px solid {self.color}CC;
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 {self.color}55, stop:0.5 {self.color}44, stop:1 {self.color}33);
-            }}
-            QLabel {{
-                color: #FFFFFF;
-                font-size: 11px;
-                background: transparent;
-            }}
-            QLabel[objectName="title_label"] {{
-                font-weight: bold;
-                font-size: 12px;
-                color: #FFFFFF;
-            }}
-            QSlider::groove:horizontal {{
-                background: #333333;
-                height: 4px;
-                border-radius: 2px;
-            }}
-            QSlider::handle:horizontal {{
-                background: {self.color};
-                width: 12px;
-                height: 12px;
-                border-radius: 6px;
-                margin: -4px 0;
-            }}
-        """)
-        
-        # Специальный стиль для заголовка
-        self.title_label.setStyleSheet(f"""
-            background: {self.color};
-            padding: 4px 8px;
-            border-radius: 6px;
-            color: white;
-            font-weight: bold;
-        """)
+        """Применение стилей
+        
+        Цвета палитры оформляются общей таблицей темы через свойство
+        colorClass - смена цвета лишь переполировывает виджет. Для цвета
+        вне палитры задается собственная таблица стилей.
+        """
+        color_class = PremiumTheme.block_color_class(self.color)
+        if color_class is None:
+            self.setProperty("colorClass", "custom")
+            self.setStyleSheet(PremiumTheme.get_custom_block_stylesheet(self.color))
+            return
+        
+        if self.styleSheet():
+            self.setStyleSheet("")
+        if self.property("colorClass") != color_class:
+            self.setProperty("colorClass", color_class)
+            self.repolish()
+    
+    def repolish(self):
+        """Повторное применение стилей после смены свойства colorClass
+        
+        Переполировываются только виджеты с правилами, зависящими от цвета.
+        """
+        for widget in (self, self.title_label, self.progress_slider):
+            style = widget.style()
+            style.unpolish(widget)
+            style.polish(widget)
+        self.update()
     
     def enterEvent(self, event):
         """Обработчик входа курсора"""
@@ -328,10 +318,32 @@ class PremiumTimeBlock(QWidget):
         """Обработчик изменения прогресса"""
         self.progress_label.setText(f"Выполнено: {value}%")
     
+    def to_state(self):
+        """Отслеживаемые поля блока в формате файла дня"""
+        return {
+            "title": self.title,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "color": self.color,
+            "notify": self.notify,
+            "progress": getattr(self, 'progress', 0),
+            "created_at": self.created_at
+        }
+    
+    def apply_state(self, fields):
+        """Применение полей из журнала команд (без сигнала edited)"""
+        for key, value in fields.items():
+            if key in ("start_time", "end_time"):
+                value = datetime.fromisoformat(value)
+            setattr(self, key, value)
+        self.update_display()
+        self.apply_styles()
+    
     def get_duration_minutes(self):
         """Получение продолжительности в минутах"""
         return int((self.end_time - self.start_time).total_seconds() / 60)
     
+    @traced("paint.PremiumTimeBlock", "paint")
     def paintEvent(self, event):
         """Отрисовка дополнительных элементов"""
         super().paintEvent(event)
@@ -0,0 +1,118 @@
+# time_layer.py - Единый слой времени: UTC epoch внутри, местное время только для отображения
+import calendar
+import time as time_module
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+import pytz
+
+DEFAULT_ZONE = "Europe/Moscow"
+
+EPOCH = datetime(1970, 1, 1)
+# Смещение зоны кэшируется по 15-минутным интервалам (переходы бывают на :00/:30/:45)
+OFFSET_BUCKET = 900
+
+
+@lru_cache(maxsize=64)
+def get_zone(name):
+    """Объект часового пояса по имени (кэшируется)"""
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=8192)
+def _utc_offset_at_epoch(zone_name, bucket):
+    """Смещение зоны (секунды) для момента UTC из интервала bucket"""
+    moment = pytz.utc.localize(EPOCH + timedelta(seconds=bucket * OFFSET_BUCKET))
+    return int(moment.astimezone(get_zone(zone_name)).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=8192)
+def _utc_offset_at_wall(zone_name, bucket):
+    """Смещение зоны (секунды) для местного времени из интервала bucket
+
+    Для несуществующего и неоднозначного времени при переводе часов
+    берется стандартное (зимнее) время.
+    """
+    moment = EPOCH + timedelta(seconds=bucket * OFFSET_BUCKET)
+    return int(get_zone(zone_name).localize(moment, is_dst=False).utcoffset().total_seconds())
+
+
+class TimeLayer:
+    """Нормализация времени к UTC epoch (целые секунды)
+
+    Все моменты при поступлении приводятся к int через to_epoch: время с
+    часовым поясом - по своему поясу, наивное - как местное время
+    настроенной зоны. Сравнение и сортировка в горячих путях идут по
+    целым числам; в местное время переводится только для отображения.
+    """
+
+    def __init__(self, zone_name=DEFAULT_ZONE):
+        self.zone_name = DEFAULT_ZONE
+        self.zone = get_zone(DEFAULT_ZONE)
+        self.set_zone(zone_name)
+
+    def set_zone(self, zone_name):
+        """Смена часового пояса пользователя; False - неизвестная зона"""
+        try:
+            zone = get_zone(zone_name)
+        except pytz.UnknownTimeZoneError:
+            print(f"Ошибка часового пояса: неизвестная зона {zone_name}")
+            return False
+        self.zone_name = zone_name
+        self.zone = zone
+        return True
+
+    # --- Текущее время ---
+
+    def now(self):
+        """Текущий момент (UTC epoch)"""
+        return int(time_module.time())
+
+    def now_local(self):
+        """Текущее время зоны с часовым поясом"""
+        return datetime.now(self.zone)
+
+    def now_naive(self):
+        """Текущее местное время зоны без часового пояса (для блоков и виджетов)"""
+        return self.to_naive_local(self.now())
+
+    def today(self):
+        """Текущая дата в зоне пользователя"""
+        return self.local_date(self.now())
+
+    # --- Преобразования ---
+
+    def to_epoch(self, value):
+        """Момент -> UTC epoch; int/float возвращаются как есть (целой частью)"""
+        if isinstance(value, (int, float)):
+            return int(value)
+        if value.tzinfo is not None:
+            return calendar.timegm(value.utctimetuple())
+        wall = (value - EPOCH) // timedelta(seconds=1)
+        return wall - _utc_offset_at_wall(self.zone_name, wall // OFFSET_BUCKET)
+
+    def to_naive_local(self, epoch):
+        """UTC epoch -> местное время зоны без часового пояса"""
+        offset = _utc_offset_at_epoch(self.zone_name, epoch // OFFSET_BUCKET)
+        return EPOCH + timedelta(seconds=epoch + offset)
+
+    def to_local(self, epoch):
+        """UTC epoch -> местное время зоны с часовым поясом"""
+        return datetime.fromtimestamp(epoch, self.zone)
+
+    def local_date(self, epoch):
+        """Дата момента в зоне пользователя"""
+        return self.to_naive_local(epoch).date()
+
+    def day_bounds(self, day):
+        """Границы дня зоны пользователя: [начало, начало следующего дня) в epoch"""
+        start = datetime.combine(day, time())
+        return self.to_epoch(start), self.to_epoch(start + timedelta(days=1))
+
+    def format(self, epoch, format_str="%H:%M"):
+        """Форматирование момента в местном времени"""
+        return self.to_naive_local(epoch).strftime(format_str)
+
+
+# Глобальный слой времени (зона задается настройкой behavior/timezone)
+time_layer = TimeLayer()
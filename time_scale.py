@@ -3,6 +3,7 @@ from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import Qt, QPoint, QTimer
 from PyQt5.QtGui import QPainter, QPen, QColor, QFont, QLinearGradient
 from datetime import datetime, timedelta
+from tracing import traced
 
 class PremiumTimeScale(QWidget):
     """Премиум шкала времени с улучшенной визуализацией"""
@@ -22,6 +23,7 @@ class PremiumTimeScale(QWidget):
         self.timer.timeout.connect(self.update)
         self.timer.start(60000)  # Обновление каждую минуту
         
+    @traced("paint.PremiumTimeScale", "paint")
     def paintEvent(self, event):
         """Отрисовка шкалы времени"""
         painter = QPainter(self)
@@ -0,0 +1,280 @@
+# timeblock_cli.py - Консольная утилита отчетов и обслуживания данных (без Qt)
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+from data_manager import PremiumDataManager, DEFAULT_DATA_DIR
+from day_format import SUPPORTED_FORMATS, FORMAT_COMPACT
+
+# Коды завершения
+EXIT_OK = 0
+EXIT_FAILED = 1     # ошибка выполнения или найдены проблемы
+EXIT_USAGE = 2      # неверные аргументы (как у argparse)
+
+
+def parse_date(value):
+    """Дата из аргумента: YYYY-MM-DD, today или -N (N дней назад)"""
+    if value == "today":
+        return date.today()
+    if value.startswith("-") and value[1:].isdigit():
+        return date.today() - timedelta(days=int(value[1:]))
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Неверная дата: {value}")
+
+
+def make_data_manager(args, storage_format=None):
+    """Менеджер данных в режиме исключений"""
+    kwargs = {"data_dir": args.data_dir, "raise_errors": True}
+    if storage_format:
+        kwargs["storage_format"] = storage_format
+    return PremiumDataManager(**kwargs)
+
+
+def make_task_manager(args):
+    """Менеджер задач с файлом в каталоге данных"""
+    # Импорт по требованию: остальным командам задачи не нужны
+    from task_manager import TaskManager
+    return TaskManager(os.path.join(args.data_dir, "tasks_data.json"))
+
+
+def json_default(value):
+    """Даты для JSON-вывода - в ISO (ряды трендов и самый продуктивный день)"""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def cmd_stats(args):
+    """Статистика за период"""
+    statistics = make_data_manager(args).get_statistics(args.start, args.end)
+
+    if args.json:
+        print(json.dumps(statistics, ensure_ascii=False, indent=2, default=json_default))
+        return EXIT_OK
+
+    print(f"Период: {args.start.isoformat()} - {args.end.isoformat()}")
+    print(f"  Дней с блоками: {statistics['total_days']}")
+    print(f"  Всего блоков: {statistics['total_blocks']}")
+    print(f"  Всего часов: {statistics['total_hours']:.1f}")
+    print(f"  Блоков в день: {statistics['average_blocks_per_day']:.1f}")
+    print(f"  Часов в день: {statistics['average_hours_per_day']:.1f}")
+    day = statistics["most_productive_day"]
+    if day:
+        print(f"  Самый продуктивный день: {day['date'].isoformat()} ({day['productivity']}%)")
+    return EXIT_OK
+
+
+def cmd_export(args):
+    """Экспорт данных за период"""
+    content = make_data_manager(args).export_data(args.start, args.end, args.format)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+        print(f"Экспортировано в {args.output}")
+    else:
+        sys.stdout.write(content + "\n")
+    return EXIT_OK
+
+
+def cmd_import(args):
+    """Импорт данных из файла экспорта (json)"""
+    with open(args.file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    imported = make_data_manager(args).import_data(data, create_backup=not args.no_backup)
+    print(f"Импортировано дней: {imported}")
+    return EXIT_OK
+
+
+def cmd_compact(args):
+    """Перевод всех дней в указанный формат хранения"""
+    converted = make_data_manager(args, storage_format=args.format).convert_storage(args.format)
+    print(f"Преобразовано файлов: {converted} (формат {args.format})")
+    return EXIT_OK
+
+
+def cmd_verify_backups(args):
+    """Проверка целостности резервных копий"""
+    problems = make_data_manager(args).backup_store.verify()
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"Найдено проблем: {len(problems)}")
+        return EXIT_FAILED
+    print("Резервные копии в порядке")
+    return EXIT_OK
+
+
+def cmd_reindex(args):
+    """Полная перестройка поискового индекса"""
+    # Импорт по требованию: остальным командам не нужен индекс
+    from search_index import SearchIndex
+
+    index = SearchIndex(os.path.join(args.data_dir, "search"))
+    index.rebuild(task_manager=make_task_manager(args), data_manager=make_data_manager(args))
+    print(f"Проиндексировано документов: {len(index.docs)}")
+    return EXIT_OK
+
+
+def cmd_archive(args):
+    """Перенос закрытых дней в колоночный архив"""
+    from day_archive import archive_closed_days
+
+    archived = archive_closed_days(make_data_manager(args), before=args.before,
+                                   remove_files=not args.keep_files)
+    print(f"Перенесено в архив дней: {archived}")
+    return EXIT_OK
+
+
+def cmd_serve(args):
+    """Локальный HTTP/JSON API (до Ctrl+C)"""
+    from api_server import run_server
+
+    run_server(make_task_manager(args), make_data_manager(args), port=args.port)
+    return EXIT_OK
+
+
+def cmd_ical(args):
+    """Обмен с файлом iCalendar: экспорт изменений, импорт или оба"""
+    from ical_sync import CalendarSync
+
+    sync = CalendarSync(make_data_manager(args), make_task_manager(args))
+    if args.action in ("import", "sync"):
+        print(f"Импортировано событий: {sync.import_file(args.file)}")
+    if args.action in ("export", "sync"):
+        count, token = sync.export_changes(args.file, full=args.full, delta_path=args.delta)
+        print(f"Изменившихся событий: {count} (синхронизация №{token})")
+    return EXIT_OK
+
+
+def cmd_generate(args):
+    """Синтетический набор данных для нагрузочных проверок"""
+    from workload_generator import WorkloadGenerator
+
+    existing = []
+    if os.path.isdir(args.data_dir):
+        existing = [name for name in os.listdir(args.data_dir)
+                    if name.startswith("schedule_") and name.endswith(".json")]
+    if existing and not args.force:
+        print(f"Ошибка: в {args.data_dir} уже есть дни ({len(existing)}); укажите --force",
+              file=sys.stderr)
+        return EXIT_FAILED
+
+    generator = WorkloadGenerator(seed=args.seed, start=args.first_day, days=args.days,
+                                  today=args.today, tasks_per_day=args.tasks_per_day,
+                                  blocks_per_day=args.blocks_per_day, routines=args.routines,
+                                  backup_ratio=args.backup_ratio)
+    tasks_file = args.tasks_file or os.path.join(args.data_dir, "tasks_data.json")
+    totals = generator.generate(make_data_manager(args), tasks_file)
+    print(f"Задач: {totals['tasks']} ({tasks_file})")
+    print(f"Дней: {totals['days']}, блоков: {totals['blocks']}, "
+          f"резервных копий: {totals['backups']}")
+    return EXIT_OK
+
+
+def build_parser():
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        prog="timeblock_cli",
+        description="Отчеты и обслуживание данных планировщика без графического интерфейса"
+    )
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                        help=f"каталог данных (по умолчанию {DEFAULT_DATA_DIR})")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    def add_range(command):
+        command.add_argument("--from", dest="start", type=parse_date, default=parse_date("-30"),
+                             help="начало периода: YYYY-MM-DD, today или -N (по умолчанию -30)")
+        command.add_argument("--to", dest="end", type=parse_date, default=parse_date("today"),
+                             help="конец периода (по умолчанию today)")
+
+    stats = commands.add_parser("stats", help="статистика за период")
+    add_range(stats)
+    stats.add_argument("--json", action="store_true", help="вывод в JSON")
+    stats.set_defaults(handler=cmd_stats)
+
+    export = commands.add_parser("export", help="экспорт данных за период")
+    add_range(export)
+    export.add_argument("--format", choices=("json", "csv"), default="json")
+    export.add_argument("-o", "--output", help="файл результата (по умолчанию stdout)")
+    export.set_defaults(handler=cmd_export)
+
+    import_ = commands.add_parser("import", help="импорт файла экспорта (json)")
+    import_.add_argument("file")
+    import_.add_argument("--no-backup", action="store_true",
+                         help="не создавать резервные копии перезаписываемых дней")
+    import_.set_defaults(handler=cmd_import)
+
+    compact = commands.add_parser("compact", help="перевод дней в формат хранения")
+    compact.add_argument("--format", choices=SUPPORTED_FORMATS, default=FORMAT_COMPACT)
+    compact.set_defaults(handler=cmd_compact)
+
+    verify = commands.add_parser("verify-backups", help="проверка резервных копий")
+    verify.set_defaults(handler=cmd_verify_backups)
+
+    reindex = commands.add_parser("reindex", help="перестройка поискового индекса")
+    reindex.set_defaults(handler=cmd_reindex)
+
+    archive = commands.add_parser("archive", help="перенос закрытых дней в архив")
+    archive.add_argument("--before", type=parse_date, default=parse_date("-7"),
+                         help="архивировать дни раньше этой даты (по умолчанию -7)")
+    archive.add_argument("--keep-files", action="store_true",
+                         help="не удалять файлы дней после архивации")
+    archive.set_defaults(handler=cmd_archive)
+
+    serve = commands.add_parser("serve", help="локальный HTTP/JSON API (127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="порт (по умолчанию 8765)")
+    serve.set_defaults(handler=cmd_serve)
+
+    ical = commands.add_parser("ical", help="обмен с файлом календаря (.ics)")
+    ical.add_argument("action", choices=("export", "import", "sync"))
+    ical.add_argument("-f", "--file", help="файл .ics (по умолчанию <data-dir>/calendar/timeblocking.ics)")
+    ical.add_argument("--full", action="store_true",
+                      help="считать измененными все события")
+    ical.add_argument("--delta", help="файл .ics только с изменившимися и удаленными событиями")
+    ical.set_defaults(handler=cmd_ical)
+
+    generate = commands.add_parser("generate", help="синтетический набор данных (seed)")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--start", dest="first_day", type=parse_date, default=date(2023, 1, 1),
+                          help="первый день (по умолчанию 2023-01-01)")
+    generate.add_argument("--days", type=int, default=3 * 365, help="число дней (по умолчанию 1095)")
+    generate.add_argument("--today", type=parse_date,
+                          help="граница прошлого и будущего для статусов (по умолчанию последний день)")
+    generate.add_argument("--tasks-per-day", type=int, default=20)
+    generate.add_argument("--blocks-per-day", type=int, default=12)
+    generate.add_argument("--routines", type=int, default=6, help="число повторяющихся серий")
+    generate.add_argument("--backup-ratio", type=float, default=0.1,
+                          help="доля дней с историей резервных копий")
+    generate.add_argument("--tasks-file",
+                          help="файл задач (по умолчанию <data-dir>/tasks_data.json)")
+    generate.add_argument("--force", action="store_true", help="писать в каталог с данными")
+    generate.set_defaults(handler=cmd_generate)
+
+    return parser
+
+
+def main(argv=None):
+    """Точка входа; возвращает код завершения"""
+    args = build_parser().parse_args(argv)
+    if getattr(args, "start", None) and args.start > args.end:
+        print("Ошибка: начало периода позже конца", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command not in ("import", "generate") and not os.path.isdir(args.data_dir):
+        print(f"Ошибка: каталог данных не найден: {args.data_dir}", file=sys.stderr)
+        return EXIT_FAILED
+
+    try:
+        return args.handler(args)
+    except Exception as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
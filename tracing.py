@@ -0,0 +1,180 @@
+# tracing.py - Легковесная трассировка горячих участков с экспортом в Chrome trace
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Переменная окружения для включения трассировки при запуске
+TRACE_ENV = "TIMEBLOCK_TRACE"
+
+# Размер кольцевого буфера событий и окна для перцентилей
+DEFAULT_CAPACITY = 50000
+SAMPLES_PER_SPAN = 1000
+
+
+class _NullSpan:
+    """Пустой span для выключенной трассировки"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Активный span: замеряет время и передает событие трассировщику"""
+
+    __slots__ = ("tracer", "name", "category", "start")
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+class Tracer:
+    """Трассировщик: кольцевой буфер событий и скользящие перцентили по именам"""
+
+    def __init__(self, enabled=False, capacity=DEFAULT_CAPACITY):
+        self.enabled = enabled
+        self.events = deque(maxlen=capacity)
+        self.samples = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def set_enabled(self, enabled):
+        """Включение/выключение трассировки"""
+        self.enabled = bool(enabled)
+
+    def clear(self):
+        """Очистка накопленных событий"""
+        with self._lock:
+            self.events.clear()
+            self.samples.clear()
+            self.counts.clear()
+
+    def span(self, name, category="app"):
+        """Контекстный менеджер замера участка кода"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def record(self, name, category, start_ns, duration_ns):
+        """Регистрация завершенного участка"""
+        with self._lock:
+            self.events.append((name, category, start_ns, duration_ns, threading.get_ident()))
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=SAMPLES_PER_SPAN)
+            samples.append(duration_ns)
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    # --- Сводка ---
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+        return sorted_values[index]
+
+    def summary(self):
+        """Сводка по участкам: {имя: {count, p50, p95, p99, max}} (мс, по последним замерам)"""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self.samples.items()}
+            counts = dict(self.counts)
+
+        result = {}
+        for name, values in snapshot.items():
+            if not values:
+                continue
+            result[name] = {
+                "count": counts.get(name, len(values)),
+                "p50": self._percentile(values, 50) / 1e6,
+                "p95": self._percentile(values, 95) / 1e6,
+                "p99": self._percentile(values, 99) / 1e6,
+                "max": values[-1] / 1e6
+            }
+        return result
+
+    def format_summary(self):
+        """Текстовая сводка, отсортированная по p95"""
+        summary = self.summary()
+        if not summary:
+            return "Нет данных трассировки" if self.enabled else \
+                f"Трассировка выключена (включите ее или задайте {TRACE_ENV}=1)"
+
+        lines = [f"{'Участок':<40}{'N':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        for name, stats in sorted(summary.items(), key=lambda item: item[1]["p95"], reverse=True):
+            lines.append(f"{name:<40}{stats['count']:>7}{stats['p50']:>9.2f}{stats['p95']:>9.2f}"
+                         f"{stats['p99']:>9.2f}{stats['max']:>9.2f}")
+        lines.append("Время в миллисекундах")
+        return "\n".join(lines)
+
+    # --- Экспорт ---
+
+    def export_chrome_trace(self, filename):
+        """Экспорт событий в формате Chrome trace-event (chrome://tracing, Perfetto)"""
+        with self._lock:
+            events = list(self.events)
+
+        pid = os.getpid()
+        trace_events = [{
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": tid
+        } for name, category, start, duration, tid in events]
+
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return len(trace_events)
+
+
+# Глобальный трассировщик
+tracer = Tracer(enabled=os.environ.get(TRACE_ENV, "") not in ("", "0"))
+
+
+def span(name, category="app"):
+    """Замер участка кода глобальным трассировщиком"""
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return _Span(tracer, name, category)
+
+
+def traced(name=None, category="app"):
+    """Декоратор замера функции; при выключенной трассировке - одна проверка флага"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record(span_name, category, start, time.perf_counter_ns() - start)
+
+        return wrapper
+    return decorator
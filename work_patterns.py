@@ -0,0 +1,308 @@
+# work_patterns.py - Потоковая статистика паттернов работы по выполненным задачам
+import math
+from collections import OrderedDict
+
+from completion_stats import CompletionStats, SAVE_INTERVAL, attach_to_tasks, state_path
+from time_layer import time_layer
+
+STATE_FILE = "work_patterns.json"
+DEFAULT_HALF_LIFE_DAYS = 14.0
+METRICS = ("start", "duration", "lag")
+WEEKDAY_METRICS = ("start", "duration")
+
+
+class RunningStats:
+    """Среднее и дисперсия по Уэлфорду: O(1) на значение, без хранения истории"""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        """Исключение ранее добавленного значения (обратный шаг Уэлфорда)"""
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean = self.mean
+        self.count -= 1
+        self.mean = (mean * (self.count + 1) - value) / self.count
+        self.m2 = max(0.0, self.m2 - (value - mean) * (value - self.mean))
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_list(self):
+        return [self.count, self.mean, self.m2]
+
+
+class DecayedStats:
+    """Экспоненциально затухающие среднее и дисперсия (скользящее окно без окна)
+
+    Вес значения уменьшается вдвое каждые half_life секунд с момента
+    события. Обновление взвешенным алгоритмом Уэста - O(1), численно
+    устойчиво; значения, пришедшие не по порядку, учитываются со своим весом.
+    """
+
+    __slots__ = ("half_life", "weight", "mean", "m2", "updated")
+
+    def __init__(self, half_life, weight=0.0, mean=0.0, m2=0.0, updated=None):
+        self.half_life = half_life
+        self.weight = weight
+        self.mean = mean
+        self.m2 = m2
+        self.updated = updated
+
+    def _decay(self, seconds):
+        return 0.5 ** (seconds / self.half_life)
+
+    def add(self, value, timestamp):
+        if self.updated is None or timestamp >= self.updated:
+            if self.updated is not None:
+                factor = self._decay(timestamp - self.updated)
+                self.weight *= factor
+                self.m2 *= factor
+            self.updated = timestamp
+            sample_weight = 1.0
+        else:
+            sample_weight = self._decay(self.updated - timestamp)
+        self.weight += sample_weight
+        delta = value - self.mean
+        self.mean += delta * sample_weight / self.weight
+        self.m2 += sample_weight * delta * (value - self.mean)
+
+    def remove(self, value, timestamp):
+        """Исключение значения с его текущим весом (обратный шаг алгоритма Уэста)"""
+        if self.updated is None:
+            return
+        sample_weight = self._decay(max(0, self.updated - timestamp))
+        weight = self.weight - sample_weight
+        if weight <= 1e-9:
+            self.weight, self.mean, self.m2 = 0.0, 0.0, 0.0
+            return
+        mean = self.mean
+        self.mean = (mean * self.weight - value * sample_weight) / weight
+        self.m2 = max(0.0, self.m2 - sample_weight * (value - mean) * (value - self.mean))
+        self.weight = weight
+
+    def effective_weight(self, now=None):
+        """Суммарный вес на момент now (сколько "свежих" значений в окне)"""
+        if self.updated is None:
+            return 0.0
+        return self.weight * self._decay(max(0, (now or self.updated) - self.updated))
+
+    @property
+    def variance(self):
+        return max(0.0, self.m2 / self.weight) if self.weight else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_list(self):
+        return [self.weight, self.mean, self.m2, self.updated]
+
+
+class WorkPatterns(CompletionStats):
+    """Статистика начала, длительности и запаздывания выполнения задач
+
+    На каждую выполненную задачу обновляются (за O(1)):
+        start     - начало задачи, минуты от полуночи (местное время)
+        duration  - длительность, минуты
+        lag       - completed_at - end_time, минуты (отрицательное - раньше срока)
+    для всей истории (Уэлфорд), затухающего окна и по дням недели (0 - понедельник).
+    Оценки регулярности и фокуса считаются так же, как analyze_work_patterns
+    в performance.cpp, но по накопленной статистике, без прохода по истории.
+
+    Значения последних max_counted задач хранятся, поэтому снятие отметки
+    о выполнении или удаление такой задачи вычитается из статистики; более
+    старые задачи остаются учтенными. Состояние сохраняется не чаще раза
+    в save_interval секунд - остаток дописывает flush() при выходе.
+    """
+
+    label = "статистики паттернов работы"
+
+    def __init__(self, path=None, half_life_days=DEFAULT_HALF_LIFE_DAYS,
+                 max_counted=5000, save_interval=SAVE_INTERVAL):
+        self.half_life = half_life_days * 86400
+        self.max_counted = max_counted
+        self.listeners = []
+        super().__init__(path or state_path(None, STATE_FILE), save_interval)
+
+    def reset(self):
+        self.total = {name: RunningStats() for name in METRICS}
+        self.recent = {name: DecayedStats(self.half_life) for name in METRICS}
+        self.weekdays = [{name: RunningStats() for name in WEEKDAY_METRICS} for _ in range(7)]
+        # ID задачи -> [начало, длительность, запаздывание, выполнено (epoch), день недели]
+        self.counted = OrderedDict()
+
+    # --- Сохранение ---
+
+    def from_state(self, state):
+        self.total = {name: RunningStats(*state["total"][name]) for name in METRICS}
+        self.recent = {name: DecayedStats(self.half_life, *state["recent"][name]) for name in METRICS}
+        self.weekdays = [{name: RunningStats(*day[name]) for name in WEEKDAY_METRICS}
+                         for day in state["weekdays"]]
+        self.counted = OrderedDict((task_id, list(values)) for task_id, values in state["counted"])
+
+    def to_state(self):
+        return {
+            "total": {name: stats.to_list() for name, stats in self.total.items()},
+            "recent": {name: stats.to_list() for name, stats in self.recent.items()},
+            "weekdays": [{name: stats.to_list() for name, stats in day.items()} for day in self.weekdays],
+            "counted": list(self.counted.items())
+        }
+
+    # --- Обновление ---
+
+    def add_listener(self, callback):
+        """Подписка на обновление статистики: callback(patterns)"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def _changed(self, save):
+        if save:
+            self.save_later()
+        for callback in list(self.listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Ошибка обработчика паттернов работы: {e}")
+
+    def record_task(self, task, save=True):
+        """Учет выполненной задачи (каждая задача учитывается один раз)"""
+        if task.id in self.counted or task.completed_at is None:
+            return False
+
+        completed = time_layer.to_epoch(task.completed_at)
+        local_start = time_layer.to_naive_local(task.start_ts)
+        values = {
+            "start": local_start.hour * 60 + local_start.minute,
+            "duration": (task.end_ts - task.start_ts) / 60,
+            "lag": (completed - task.end_ts) / 60
+        }
+        for name, value in values.items():
+            self.total[name].add(value)
+            self.recent[name].add(value, completed)
+        weekday = self.weekdays[local_start.weekday()]
+        for name in WEEKDAY_METRICS:
+            weekday[name].add(values[name])
+
+        self.counted[task.id] = [values[name] for name in METRICS] + [completed, local_start.weekday()]
+        if len(self.counted) > self.max_counted:
+            self.counted.popitem(last=False)
+        self._changed(save)
+        return True
+
+    def forget_task(self, task_id, save=True):
+        """Исключение задачи из статистики (отметка снята или задача удалена)"""
+        entry = self.counted.pop(task_id, None)
+        if entry is None:
+            return False
+        values = dict(zip(METRICS, entry))
+        completed, weekday = entry[len(METRICS)], self.weekdays[entry[len(METRICS) + 1]]
+        for name, value in values.items():
+            self.total[name].remove(value)
+            self.recent[name].remove(value, completed)
+        for name in WEEKDAY_METRICS:
+            weekday[name].remove(values[name])
+        self._changed(save)
+        return True
+
+    # --- Оценки ---
+
+    def _stats(self, name, recent):
+        return self.recent[name] if recent else self.total[name]
+
+    def consistency_score(self, recent=True):
+        """Регулярность начала работы: 100 - СКО начала (мин) / 10"""
+        if self.total["start"].count < 2:
+            return 50.0
+        return max(0.0, 100.0 - self._stats("start", recent).std / 10.0)
+
+    def focus_score(self, recent=True):
+        """Предпочтение длинных задач: средняя длительность (мин) / 2, не больше 100"""
+        if self.total["duration"].count < 2:
+            return 50.0
+        return min(100.0, max(0.0, self._stats("duration", recent).mean / 2.0))
+
+    def pattern_score(self, recent=True):
+        """Общая оценка (как analyze_work_patterns)"""
+        return (self.consistency_score(recent) + self.focus_score(recent)) / 2.0
+
+    def summary(self):
+        """Сводка для интерфейса и API"""
+        now = time_layer.now()
+        return {
+            "completed": self.total["start"].count,
+            "recent_weight": round(self.recent["start"].effective_weight(now), 2),
+            "consistency_score": round(self.consistency_score(), 1),
+            "focus_score": round(self.focus_score(), 1),
+            "pattern_score": round(self.pattern_score(), 1),
+            "metrics": {
+                name: {
+                    "mean": round(self.total[name].mean, 1),
+                    "std": round(self.total[name].std, 1),
+                    "recent_mean": round(self.recent[name].mean, 1),
+                    "recent_std": round(self.recent[name].std, 1)
+                }
+                for name in METRICS
+            },
+            "weekdays": [
+                {
+                    "count": day["start"].count,
+                    "start_mean": round(day["start"].mean, 1),
+                    "start_std": round(day["start"].std, 1),
+                    "duration_mean": round(day["duration"].mean, 1)
+                }
+                for day in self.weekdays
+            ]
+        }
+
+    def format_summary(self):
+        """Текстовая сводка"""
+        summary = self.summary()
+        names = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+        lines = [
+            f"Выполнено задач: {summary['completed']}",
+            f"Регулярность: {summary['consistency_score']}",
+            f"Фокус: {summary['focus_score']}",
+            f"Общая оценка: {summary['pattern_score']}",
+            ""
+        ]
+        for name, title in (("start", "Начало"), ("duration", "Длительность"), ("lag", "Запаздывание")):
+            metric = summary["metrics"][name]
+            lines.append(f"{title}: {metric['mean']} ± {metric['std']} мин "
+                         f"(недавно {metric['recent_mean']} ± {metric['recent_std']})")
+        lines.append("")
+        for title, day in zip(names, summary["weekdays"]):
+            if day["count"]:
+                start = int(day["start_mean"])
+                lines.append(f"{title}: {day['count']} задач, начало ~{start // 60:02d}:{start % 60:02d}, "
+                             f"{day['duration_mean']} мин")
+        return "\n".join(lines)
+
+
+_work_patterns = None
+
+
+def get_work_patterns(data_dir=None):
+    """Глобальная статистика в каталоге данных, подписанная на события задач"""
+    global _work_patterns
+
+    if _work_patterns is None:
+        _work_patterns = attach_to_tasks(WorkPatterns(state_path(data_dir, STATE_FILE)))
+    return _work_patterns
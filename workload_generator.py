@@ -0,0 +1,358 @@
+# workload_generator.py - Детерминированный генератор больших синтетических наборов данных
+import json
+import os
+import random
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from file_storage import file_lock, atomic_write
+from time_layer import time_layer
+
+# Языки названий: (глаголы, объекты, вес); для zh/ja слова пишутся без пробела
+TITLE_WORDS = {
+    "ru": (("Подготовить", "Проверить", "Обсудить", "Написать", "Разобрать", "Спланировать"),
+           ("отчет", "презентацию", "бюджет", "почту", "код", "договор", "план недели"), 45),
+    "en": (("Review", "Write", "Plan", "Fix", "Call about", "Prepare"),
+           ("report", "budget", "inbox", "release notes", "design doc", "weekly plan"), 25),
+    "de": (("Prüfen", "Schreiben", "Planen", "Besprechen"),
+           ("Bericht", "Angebot", "Budget", "Übergabe"), 8),
+    "es": (("Revisar", "Escribir", "Preparar"),
+           ("informe", "presupuesto", "reunión"), 8),
+    "zh": (("审查", "准备", "讨论"), ("报告", "预算", "会议纪要"), 6),
+    "ja": (("確認", "作成", "準備"), ("資料", "見積もり", "議事録"), 5),
+    "ar": (("مراجعة", "كتابة", "تحضير"), ("التقرير", "الميزانية", "العرض"), 3),
+}
+NO_SPACE_LANGUAGES = ("zh", "ja")
+EMOJI = ("📌", "🔥", "✅", "📞", "🧠")
+
+# Повторяющиеся дела: (название, частота, интервал, дни недели, час, минута, длительность)
+ROUTINES = (
+    ("Утренняя зарядка", "daily", 1, (), 7, 0, 30),
+    ("Daily standup", "weekly", 1, (0, 1, 2, 3, 4), 10, 0, 15),
+    ("Планирование недели", "weekly", 1, (0,), 9, 0, 45),
+    ("Gym", "weekly", 1, (1, 3, 5), 19, 0, 90),
+    ("Чтение", "daily", 2, (), 22, 0, 40),
+    ("Ретроспектива", "weekly", 2, (4,), 16, 0, 60),
+    ("Wochenbericht", "weekly", 1, (4,), 15, 0, 30),
+    ("家庭作业检查", "daily", 1, (), 20, 0, 20),
+)
+
+PRIORITY_WEIGHTS = (("low", 25), ("medium", 45), ("high", 22), ("urgent", 8))
+PAST_STATUS_WEIGHTS = (("completed", 70), ("planned", 17), ("cancelled", 8), ("in_progress", 5))
+DURATIONS = ((15, 10), (30, 25), (45, 15), (60, 25), (90, 12), (120, 8), (180, 5))
+COLORS = ("#FF2B43", "#FF4C63", "#FF6B7F", "#FF8A99", "#FF4C43", "#FF6B5F", "#FF8A79", "#FFA999")
+
+
+def weighted(rng, choices):
+    """Случайный элемент из [(значение, вес)]"""
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class WorkloadGenerator:
+    """Генератор многолетних наборов задач и дней
+
+    Все значения выводятся из seed и даты дня (у каждого дня свой
+    генератор случайных чисел), поэтому одинаковые параметры дают
+    побайтно одинаковые файлы, а любой день воспроизводим отдельно.
+    Задачи и дни пишутся потоком: в памяти одновременно находится
+    только один день, а не весь набор.
+
+    today отделяет прошлое (смесь статусов) от будущего (планы);
+    по умолчанию - последний день периода.
+    """
+
+    def __init__(self, seed=0, start=None, days=3 * 365, today=None, tasks_per_day=20,
+                 blocks_per_day=12, routines=6, overlap_ratio=0.15, exception_rate=0.04,
+                 backup_ratio=0.1, backup_versions=3):
+        self.seed = seed
+        self.start = start or date(2023, 1, 1)
+        self.days = days
+        self.end = self.start + timedelta(days=days - 1)
+        self.today = today or self.end
+        self.tasks_per_day = tasks_per_day
+        self.blocks_per_day = blocks_per_day
+        self.routines = routines
+        self.overlap_ratio = overlap_ratio
+        self.exception_rate = exception_rate
+        self.backup_ratio = backup_ratio
+        self.backup_versions = backup_versions
+        self._plan = None
+        self._zones = {}
+
+    def rng(self, kind, key=""):
+        """Генератор для части набора (строковый seed не зависит от PYTHONHASHSEED)"""
+        return random.Random(f"{self.seed}:{kind}:{key}")
+
+    @staticmethod
+    def make_id(rng):
+        """UUID4 из генератора части набора"""
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def aware(self, moment):
+        """Местное время в ISO с часовым поясом (как в файле задач)
+
+        pytz.localize медленный, поэтому смещение пояса вычисляется один
+        раз на час местного времени.
+        """
+        hour = moment.replace(minute=0, second=0, microsecond=0)
+        zone = self._zones.get(hour)
+        if zone is None:
+            if len(self._zones) > 4096:
+                self._zones.clear()
+            zone = self._zones[hour] = time_layer.zone.localize(hour).tzinfo
+        return moment.replace(tzinfo=zone).isoformat()
+
+    def title(self, rng):
+        """Название задачи на одном из языков"""
+        language = weighted(rng, [(name, words[2]) for name, words in TITLE_WORDS.items()])
+        verbs, objects, _ = TITLE_WORDS[language]
+        separator = "" if language in NO_SPACE_LANGUAGES else " "
+        title = f"{rng.choice(verbs)}{separator}{rng.choice(objects)}"
+        if rng.random() < 0.05:
+            title = f"{rng.choice(EMOJI)} {title}"
+        if rng.random() < 0.1:
+            title = f"{title} #{rng.randint(1, 999)}"
+        return title
+
+    # --- Повторяющиеся дела ---
+
+    def routine_plan(self):
+        """Серии, их исключения и измененные повторения {дата: [(серия, сдвиг)]}"""
+        if self._plan is not None:
+            return self._plan
+        masters = []
+        moved = {}
+        for index in range(self.routines):
+            title, frequency, interval, weekdays, hour, minute, duration = ROUTINES[index % len(ROUTINES)]
+            if index >= len(ROUTINES):
+                title = f"{title} {index // len(ROUTINES) + 1}"
+            rng = self.rng("routine", index)
+            first = self.start + timedelta(days=rng.randrange(min(60, self.days)))
+            while weekdays and first.weekday() not in weekdays:
+                first += timedelta(days=1)
+            # Каждая четвертая серия заканчивается в середине периода
+            until = self.start + timedelta(days=self.days // 2) if index % 4 == 3 else None
+            master = {"index": index, "id": self.make_id(rng), "title": title, "first": first,
+                      "frequency": frequency, "interval": interval, "weekdays": list(weekdays),
+                      "until": until, "hour": hour, "minute": minute, "duration": duration,
+                      "exceptions": []}
+            day = first
+            last = min(self.end, until or self.end)
+            while day <= last:
+                if self.occurs(master, day) and rng.random() < self.exception_rate:
+                    master["exceptions"].append(day.isoformat())
+                    # Половина исключений - удаленные повторения, половина - измененные
+                    if rng.random() < 0.5:
+                        moved.setdefault(day, []).append((master, rng.choice((-30, -15, 15, 30, 60))))
+                day += timedelta(days=1)
+            masters.append(master)
+        self._plan = masters, moved
+        return self._plan
+
+    @staticmethod
+    def occurs(master, day):
+        """Есть ли повторение серии в дату (те же правила, что у RecurrenceRule)"""
+        if day < master["first"] or (master["until"] and day > master["until"]):
+            return False
+        if master["frequency"] == "daily":
+            return (day - master["first"]).days % master["interval"] == 0
+        anchor = master["first"] - timedelta(days=master["first"].weekday())
+        return day.weekday() in master["weekdays"] and \
+            ((day - anchor).days // 7) % master["interval"] == 0
+
+    # --- Задачи ---
+
+    def task_record(self, rng, task_id, title, start, minutes, priority=None, description="",
+                    recurrence=None, recurrence_id=None):
+        """Запись задачи в формате Task.to_dict"""
+        end = start + timedelta(minutes=minutes)
+        created = start - timedelta(hours=rng.randint(1, 14 * 24))
+        status = "planned"
+        if recurrence is None:
+            if end.date() < self.today:
+                status = weighted(rng, PAST_STATUS_WEIGHTS)
+            elif start.date() == self.today and rng.random() < 0.2:
+                status = rng.choice(("in_progress", "completed"))
+        completed = None
+        updated = created
+        if status == "completed":
+            completed = end + timedelta(minutes=rng.randint(-30, 240))
+            updated = completed
+        elif status != "planned":
+            updated = start + timedelta(minutes=rng.randint(0, minutes))
+        record = {
+            "id": task_id,
+            "title": title,
+            "description": description,
+            "start_time": self.aware(start),
+            "end_time": self.aware(end),
+            "priority": priority or weighted(rng, PRIORITY_WEIGHTS),
+            "status": status,
+            "created_at": self.aware(created),
+            "updated_at": self.aware(updated),
+            "completed_at": self.aware(completed) if completed else None
+        }
+        if recurrence is not None:
+            record["recurrence"] = recurrence
+        if recurrence_id is not None:
+            record["recurrence_id"] = recurrence_id
+        return record
+
+    def iter_tasks(self):
+        """Записи задач: сначала шаблоны серий, затем задачи по дням"""
+        masters, moved = self.routine_plan()
+        for master in masters:
+            rng = self.rng("master", master["index"])
+            start = datetime.combine(master["first"], time(master["hour"], master["minute"]))
+            recurrence = {
+                "frequency": master["frequency"],
+                "interval": master["interval"],
+                "weekdays": master["weekdays"],
+                "until": master["until"].isoformat() if master["until"] else None,
+                "count": None,
+                "exceptions": master["exceptions"]
+            }
+            yield self.task_record(rng, master["id"], master["title"], start, master["duration"],
+                                   priority="medium", recurrence=recurrence)
+
+        for offset in range(self.days):
+            day = self.start + timedelta(days=offset)
+            rng = self.rng("tasks", day.isoformat())
+            for master, shift in moved.get(day, ()):
+                start = datetime.combine(day, time(master["hour"], master["minute"])) + \
+                    timedelta(minutes=shift)
+                yield self.task_record(rng, f"{master['id']}:{day.isoformat()}", master["title"],
+                                       start, master["duration"], priority="medium",
+                                       recurrence_id=master["id"])
+            # Выходные загружены меньше будних дней
+            mean = self.tasks_per_day * (0.4 if day.weekday() >= 5 else 1.0)
+            for _ in range(max(0, round(rng.gauss(mean, mean * 0.3)))):
+                start = datetime.combine(day, time(rng.randint(6, 21), rng.choice((0, 15, 30, 45))))
+                description = self.title(rng) if rng.random() < 0.3 else ""
+                yield self.task_record(rng, self.make_id(rng), self.title(rng), start,
+                                       weighted(rng, DURATIONS), description=description)
+
+    def write_tasks(self, path):
+        """Потоковая запись файла задач (формат TaskManager); возвращает число задач"""
+        count = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(path):
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write('{"tasks": [')
+                    for record in self.iter_tasks():
+                        f.write(",\n" if count else "\n")
+                        f.write(json.dumps(record, ensure_ascii=False))
+                        count += 1
+                    saved_at = self.aware(datetime.combine(self.today, time(12)))
+                    f.write(f'\n], "saved_at": "{saved_at}"}}\n')
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return count
+
+    # --- Дни ---
+
+    def day_blocks(self, day):
+        """Блоки дня в формате файла дня (часть блоков пересекается)"""
+        rng = self.rng("blocks", day.isoformat())
+        mean = self.blocks_per_day * (0.5 if day.weekday() >= 5 else 1.0)
+        count = max(0, round(rng.gauss(mean, mean * 0.3)))
+        blocks = []
+        cursor = datetime.combine(day, time(7))
+        day_end = datetime.combine(day, time(23, 30))
+        for index in range(count):
+            minutes = weighted(rng, DURATIONS)
+            if blocks and rng.random() < self.overlap_ratio:
+                # Начало внутри предыдущего блока
+                start = cursor - timedelta(minutes=rng.choice((10, 15, 30)))
+            else:
+                start = cursor + timedelta(minutes=rng.choice((0, 0, 5, 15, 30)))
+            end = min(start + timedelta(minutes=minutes), day_end)
+            if end <= start:
+                break
+            created = start - timedelta(hours=rng.randint(1, 72))
+            past = day < self.today
+            blocks.append({
+                "id": self.make_id(rng),
+                "title": self.title(rng),
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+                "color": rng.choice(COLORS),
+                "notify": rng.random() < 0.7,
+                "progress": rng.choice((100, 100, 100, 75, 50, 0)) if past else 0,
+                "created_at": created.isoformat(),
+                "updated_at": (created + timedelta(minutes=rng.randint(0, 600))).isoformat()
+            })
+            cursor = max(cursor, end)
+        return blocks
+
+    def day_document(self, data_manager, day, blocks, saved_at):
+        """Содержимое файла дня и сводка для манифеста (как в write_day_data)"""
+        summary = data_manager.summarize_blocks_data(blocks)
+        return {
+            "version": "2.0",
+            "date": day.isoformat(),
+            "saved_at": saved_at.isoformat(),
+            "time_blocks": blocks,
+            "metadata": {
+                "total_blocks": summary["total_blocks"],
+                "total_minutes": summary["total_minutes"],
+                "productivity_score": summary["productivity_score"]
+            }
+        }, summary
+
+    def iter_days(self):
+        """(дата, блоки) по всем дням периода; пустые дни пропускаются"""
+        for offset in range(self.days):
+            day = self.start + timedelta(days=offset)
+            blocks = self.day_blocks(day)
+            if blocks:
+                yield day, blocks
+
+    def write_days(self, data_manager):
+        """Запись файлов дней, истории резервных копий и манифеста
+
+        Файлы пишутся в формате хранения data_manager; у доли дней
+        backup_ratio перед итоговой версией сохраняются более ранние
+        (меньше блоков, ниже прогресс). Манифест сохраняется один раз
+        в конце. Возвращает (дни, блоки, снимки резервных копий).
+        """
+        totals = [0, 0, 0]
+        for day, blocks in self.iter_days():
+            rng = self.rng("backups", day.isoformat())
+            saved_at = datetime.combine(day, time(23, 0))
+            if rng.random() < self.backup_ratio:
+                versions = rng.randint(1, self.backup_versions)
+                for version in range(versions):
+                    kept = blocks[:max(1, len(blocks) * (version + 1) // (versions + 1))]
+                    draft = [dict(block, progress=block["progress"] * version // versions)
+                             for block in kept]
+                    created_at = datetime.combine(day, time(8)) + timedelta(hours=version)
+                    document, _ = self.day_document(data_manager, day, draft, created_at)
+                    if data_manager.backup_store.put(day, data_manager.serialize_day(document),
+                                                     created_at=created_at):
+                        totals[2] += 1
+
+            document, summary = self.day_document(data_manager, day, blocks, saved_at)
+            raw = data_manager.serialize_day(document)
+            filename = os.path.join(data_manager.data_dir, f"schedule_{day.isoformat()}.json")
+            with file_lock(filename):
+                atomic_write(filename, raw)
+            data_manager.manifest.update(day, summary, filename, raw, save=False)
+            totals[0] += 1
+            totals[1] += len(blocks)
+        data_manager.manifest.save()
+        return tuple(totals)
+
+    def generate(self, data_manager, tasks_file):
+        """Полный набор: файл задач и каталог дней"""
+        tasks = self.write_tasks(tasks_file)
+        days, blocks, backups = self.write_days(data_manager)
+        return {"tasks": tasks, "days": days, "blocks": blocks, "backups": backups}